@@ -2,15 +2,31 @@
 # -*- coding: utf-8 -*-
 
 import os
+import re
 import json
 from flask import jsonify, request, Response
+from flask_socketio import join_room, leave_room, emit
 from backend.app import app, socketio
 from backend.models.game_engine import GameEngine
+from backend.models.game_registry import GameRegistry
+from backend.models.records import to_dicts
 from backend.utils.ai_call_manager import ai_call_manager
+from backend.utils.metrics import metrics
+from backend.utils.logger import get_logger
+from backend.utils.audio_cache import mimetype_for
 from backend.utils.voice_client import voice_client
 
-# 创建游戏引擎实例
-game_engine = GameEngine(socketio)
+# 单局模式游戏的Socket.IO房间，与注册表中以游戏ID命名的房间互不干扰
+DEFAULT_GAME_ROOM = "default"
+
+# 创建游戏引擎实例（兼容单局模式的/api/game接口）
+game_engine = GameEngine(socketio, room=DEFAULT_GAME_ROOM)
+game_engine.voice_synthesizer = voice_client
+
+# 多局游戏注册表（/api/games接口）
+game_registry = GameRegistry(socketio, voice_synthesizer=voice_client)
+
+logger = get_logger()
 
 # 游戏配置API
 @app.route('/api/config', methods=['GET', 'POST'])
@@ -75,83 +91,181 @@ def characters():
             return jsonify({"status": "error", "message": f"读取角色配置失败: {str(e)}"})
 
 # 游戏控制API
-@app.route('/api/game/start', methods=['POST'])
-def start_game():
-    """开始游戏"""
-    try:
-        # 加载角色配置
-        if not os.path.exists('config/characters.json'):
-            return jsonify({"status": "error", "message": "角色配置文件不存在，请先创建角色"})
+def _load_default_characters():
+    """
+    读取默认角色配置
 
-        # 加载角色到游戏引擎
-        success = game_engine.load_characters_from_config('config/characters.json')
-        if not success:
-            return jsonify({"status": "error", "message": "加载角色配置失败"})
+    Returns:
+        list: 角色字典列表，配置文件不存在时返回None
+    """
+    if not os.path.exists('config/characters.json'):
+        return None
+    with open('config/characters.json', 'r', encoding='utf-8') as f:
+        return json.load(f)
 
-        # 启动游戏
-        if game_engine.start_game():
+def _find_game(game_id):
+    """
+    查找注册表中的游戏
+
+    Returns:
+        tuple: (游戏引擎, 错误响应)，找到游戏时错误响应为None
+    """
+    engine = game_registry.get_game(game_id)
+    if not engine:
+        return None, (jsonify({"status": "error", "message": f"游戏不存在: {game_id}"}), 404)
+    return engine, None
+
+def _start(engine):
+    """启动游戏引擎"""
+    try:
+        if engine.start_game():
             return jsonify({"status": "success", "message": "游戏已开始"})
         else:
             return jsonify({"status": "error", "message": "启动游戏失败，可能游戏已经在运行"})
     except Exception as e:
         return jsonify({"status": "error", "message": f"启动游戏失败: {str(e)}"})
 
-@app.route('/api/game/pause', methods=['POST'])
-def pause_game():
-    """暂停游戏"""
+def _pause(engine):
+    """暂停游戏引擎"""
     try:
-        if game_engine.pause_game():
+        if engine.pause_game():
             return jsonify({"status": "success", "message": "游戏已暂停"})
         else:
             return jsonify({"status": "error", "message": "暂停游戏失败，可能游戏未在运行"})
     except Exception as e:
         return jsonify({"status": "error", "message": f"暂停游戏失败: {str(e)}"})
 
-@app.route('/api/game/resume', methods=['POST'])
-def resume_game():
-    """恢复游戏"""
+def _resume(engine):
+    """恢复游戏引擎"""
     try:
-        if game_engine.resume_game():
+        if engine.resume_game():
             return jsonify({"status": "success", "message": "游戏已恢复"})
         else:
             return jsonify({"status": "error", "message": "恢复游戏失败，可能游戏未被暂停"})
     except Exception as e:
         return jsonify({"status": "error", "message": f"恢复游戏失败: {str(e)}"})
 
-@app.route('/api/game/reset', methods=['POST'])
-def reset_game():
-    """重置游戏"""
+def _reset(engine):
+    """重置游戏引擎"""
     try:
-        if game_engine.reset_game():
+        if engine.reset_game():
             return jsonify({"status": "success", "message": "游戏已重置"})
         else:
             return jsonify({"status": "error", "message": "重置游戏失败"})
     except Exception as e:
         return jsonify({"status": "error", "message": f"重置游戏失败: {str(e)}"})
 
+def _state(engine):
+    """获取游戏引擎状态"""
+    try:
+        game_state = engine.get_game_state()
+        return jsonify({"status": "success", "data": game_state})
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"获取游戏状态失败: {str(e)}"})
+
+@app.route('/api/game/start', methods=['POST'])
+def start_game():
+    """开始游戏"""
+    try:
+        # 加载角色配置
+        if not os.path.exists('config/characters.json'):
+            return jsonify({"status": "error", "message": "角色配置文件不存在，请先创建角色"})
+
+        # 加载角色到游戏引擎
+        success = game_engine.load_characters_from_config('config/characters.json')
+        if not success:
+            return jsonify({"status": "error", "message": "加载角色配置失败"})
+
+        # 启动游戏
+        return _start(game_engine)
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"启动游戏失败: {str(e)}"})
+
+@app.route('/api/game/pause', methods=['POST'])
+def pause_game():
+    """暂停游戏"""
+    return _pause(game_engine)
+
+@app.route('/api/game/resume', methods=['POST'])
+def resume_game():
+    """恢复游戏"""
+    return _resume(game_engine)
+
+@app.route('/api/game/reset', methods=['POST'])
+def reset_game():
+    """重置游戏"""
+    return _reset(game_engine)
+
 @app.route('/api/game/state', methods=['GET'])
 def get_game_state():
     """获取游戏状态"""
+    return _state(game_engine)
+
+# 多局游戏API，每局游戏通过ID访问，Socket.IO消息只推送到以游戏ID命名的房间
+@app.route('/api/games', methods=['GET', 'POST'])
+def games():
+    """列出或创建游戏"""
+    if request.method == 'GET':
+        return jsonify({"status": "success", "data": game_registry.list_games(), "stats": game_registry.get_stats()})
+
     try:
-        game_state = game_engine.get_game_state()
-        return jsonify({"status": "success", "data": game_state})
+        data = request.get_json(silent=True) or {}
+        characters_data = data.get('characters') or _load_default_characters()
+        if not characters_data:
+            return jsonify({"status": "error", "message": "角色配置文件不存在，请先创建角色"})
+
+        engine = game_registry.create_game(characters_data)
+        return jsonify({"status": "success", "message": "游戏已创建", "data": {"id": engine.game.id}})
     except Exception as e:
-        return jsonify({"status": "error", "message": f"获取游戏状态失败: {str(e)}"})
+        return jsonify({"status": "error", "message": f"创建游戏失败: {str(e)}"})
 
-@app.route('/api/character/memory/<character_name>', methods=['GET'])
-def get_character_memory(character_name):
-    """获取角色记忆信息（用于调试）"""
+@app.route('/api/games/<game_id>', methods=['DELETE'])
+def delete_game(game_id):
+    """删除游戏"""
+    if game_registry.delete_game(game_id):
+        return jsonify({"status": "success", "message": "游戏已删除"})
+    return jsonify({"status": "error", "message": f"游戏不存在: {game_id}"}), 404
+
+@app.route('/api/games/<game_id>/<action>', methods=['POST'])
+def control_game(game_id, action):
+    """控制指定游戏：start/pause/resume/reset"""
+    engine, error = _find_game(game_id)
+    if error:
+        return error
+
+    handlers = {"start": _start, "pause": _pause, "resume": _resume, "reset": _reset}
+    if action not in handlers:
+        return jsonify({"status": "error", "message": f"未知的游戏操作: {action}"}), 404
+    return handlers[action](engine)
+
+@app.route('/api/games/<game_id>/state', methods=['GET'])
+def get_scoped_game_state(game_id):
+    """获取指定游戏的状态"""
+    engine, error = _find_game(game_id)
+    if error:
+        return error
+    return _state(engine)
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """以Prometheus文本格式返回耗时指标"""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+def _find_character(engine, character_name):
+    """在游戏中按名称查找角色"""
+    for char in engine.game.characters:
+        if char.name == character_name:
+            return char
+    return None
+
+def _character_memory(engine, character_name):
+    """获取角色记忆信息"""
     try:
-        if not game_engine.game:
+        if not engine.game:
             return jsonify({"status": "error", "message": "游戏未初始化"})
 
         # 查找角色
-        character = None
-        for char in game_engine.game.characters:
-            if char.name == character_name:
-                character = char
-                break
-
+        character = _find_character(engine, character_name)
         if not character:
             return jsonify({"status": "error", "message": f"未找到角色: {character_name}"})
 
@@ -161,13 +275,13 @@ def get_character_memory(character_name):
             "role": character.role,
             "alive": character.alive,
             "memory": {
-                "decisions": character.memory.get("decisions", []),
-                "observations": character.memory.get("observations", []),
-                "statements": character.memory.get("statements", []),
-                "inner_thoughts": character.memory.get("inner_thoughts", []),
-                "beliefs": character.memory.get("beliefs", {}),
+                "decisions": to_dicts(character.memory.get("decisions", [])),
+                "observations": to_dicts(character.get_observations()),
+                "statements": to_dicts(character.memory.get("statements", [])),
+                "inner_thoughts": to_dicts(character.memory.get("inner_thoughts", [])),
+                "beliefs": {name: to_dicts(beliefs) for name, beliefs in character.memory.get("beliefs", {}).items()},
                 "votes": character.memory.get("votes", []),
-                "ai_calls": ai_call_manager.get_all_ai_calls(character.name)  # 从全局管理器获取
+                "ai_calls": to_dicts(ai_call_manager.get_all_ai_calls(character.name, game_id=engine.room))  # 从全局管理器获取本局的记录
             },
             "memory_summary": character.get_memory_summary()
         }
@@ -176,11 +290,10 @@ def get_character_memory(character_name):
     except Exception as e:
         return jsonify({"status": "error", "message": f"获取角色记忆失败: {str(e)}"})
 
-@app.route('/api/character/memory/speech/<character_name>', methods=['POST'])
-def get_speech_ai_calls(character_name):
+def _speech_ai_calls(engine, character_name):
     """获取特定发言的AI调用记录"""
     try:
-        if not game_engine.game:
+        if not engine.game:
             return jsonify({"status": "error", "message": "游戏未初始化"})
 
         # 获取请求数据
@@ -191,17 +304,12 @@ def get_speech_ai_calls(character_name):
             return jsonify({"status": "error", "message": "未提供AI调用记录ID"})
 
         # 查找角色
-        character = None
-        for char in game_engine.game.characters:
-            if char.name == character_name:
-                character = char
-                break
-
+        character = _find_character(engine, character_name)
         if not character:
             return jsonify({"status": "error", "message": f"未找到角色: {character_name}"})
 
-        # 从全局AI调用记录管理器获取相关记录
-        related_ai_calls = ai_call_manager.get_ai_calls_by_ids(character_name, ai_call_ids)
+        # 从全局AI调用记录管理器获取本局的相关记录
+        related_ai_calls = ai_call_manager.get_ai_calls_by_ids(character_name, ai_call_ids, game_id=engine.room)
 
         # 返回数据
         response_data = {
@@ -209,7 +317,7 @@ def get_speech_ai_calls(character_name):
             "role": character.role,
             "alive": character.alive,
             "memory": {
-                "ai_calls": related_ai_calls
+                "ai_calls": to_dicts(related_ai_calls)
             },
             "memory_summary": character.get_memory_summary()
         }
@@ -218,22 +326,76 @@ def get_speech_ai_calls(character_name):
     except Exception as e:
         return jsonify({"status": "error", "message": f"获取发言AI调用记录失败: {str(e)}"})
 
+@app.route('/api/character/memory/<character_name>', methods=['GET'])
+def get_character_memory(character_name):
+    """获取角色记忆信息（用于调试）"""
+    return _character_memory(game_engine, character_name)
+
+@app.route('/api/character/memory/speech/<character_name>', methods=['POST'])
+def get_speech_ai_calls(character_name):
+    """获取特定发言的AI调用记录"""
+    return _speech_ai_calls(game_engine, character_name)
+
+@app.route('/api/games/<game_id>/character/memory/<character_name>', methods=['GET'])
+def get_scoped_character_memory(game_id, character_name):
+    """获取指定游戏中角色的记忆信息"""
+    engine, error = _find_game(game_id)
+    if error:
+        return error
+    return _character_memory(engine, character_name)
+
+@app.route('/api/games/<game_id>/character/memory/speech/<character_name>', methods=['POST'])
+def get_scoped_speech_ai_calls(game_id, character_name):
+    """获取指定游戏中特定发言的AI调用记录"""
+    engine, error = _find_game(game_id)
+    if error:
+        return error
+    return _speech_ai_calls(engine, character_name)
+
 # WebSocket事件
 @socketio.on('connect')
 def handle_connect():
-    """客户端连接事件"""
-    print('Client connected')
-    # 发送当前游戏状态
+    """客户端连接事件：按连接参数game加入对应游戏的房间，未指定时加入单局模式的房间"""
+    logger.info("socket.connect", "Client connected")
+    game_id = request.args.get('game')
+    # 只向刚连接的客户端发送当前游戏状态
     try:
-        game_state = game_engine.get_game_state()
-        socketio.emit('game_state', game_state)
+        _join_game_room(game_id)
     except Exception as e:
-        print(f"发送游戏状态失败: {str(e)}")
+        logger.error("socket.connect", f"发送游戏状态失败: {str(e)}")
+
+def _join_game_room(game_id):
+    """
+    加入游戏房间并向当前客户端发送该局的完整状态
+
+    Args:
+        game_id (str): 游戏ID，为空时加入单局模式的游戏
+
+    Returns:
+        bool: 游戏是否存在
+    """
+    engine = game_registry.get_game(game_id) if game_id else game_engine
+    if not engine:
+        emit('error', {"message": f"游戏不存在: {game_id}"})
+        return False
+    join_room(engine.room)
+    emit('game_state', engine.get_game_state())
+    return True
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """客户端断开连接事件"""
-    print('Client disconnected')
+    logger.info("socket.disconnect", "Client disconnected")
+
+@socketio.on('join_game')
+def handle_join_game(data):
+    """加入游戏房间，之后只接收该局游戏的推送；不带game_id时加入单局模式的游戏"""
+    _join_game_room((data or {}).get('game_id'))
+
+@socketio.on('leave_game')
+def handle_leave_game(data):
+    """离开游戏房间"""
+    leave_room((data or {}).get('game_id') or DEFAULT_GAME_ROOM)
 
 # 游戏操作事件
 @socketio.on('game_action')
@@ -250,7 +412,7 @@ def handle_game_action(data):
     elif action == 'reset':
         reset_game()
     else:
-        socketio.emit('error', {"message": f"未知的游戏操作: {action}"})
+        emit('error', {"message": f"未知的游戏操作: {action}"})
 
 @socketio.on('voice_completed')
 def handle_voice_completed(data):
@@ -259,19 +421,49 @@ def handle_voice_completed(data):
     text = data.get('text')
     timestamp = data.get('timestamp')
     
-    print(f"收到语音播放完成确认: {character} - {text[:30]}...")
+    logger.info("voice.completed", "收到语音播放完成确认: {character} - {text:.30}...", character=character, text=text)
     
-    # 通知游戏引擎语音播放完成
-    if hasattr(game_engine, 'on_voice_completed'):
-        game_engine.on_voice_completed(character, text)
+    # 通知游戏引擎语音播放完成，带game_id时转给对应的游戏
+    engine = game_registry.get_game(data.get('game_id')) if data.get('game_id') else game_engine
+    if engine and hasattr(engine, 'on_voice_completed'):
+        engine.on_voice_completed(character, text)
+
+# 预合成语音API
+@app.route('/api/voice/audio/<key>', methods=['GET'])
+def get_voice_audio(key):
+    """
+    按缓存键获取预合成的语音，voice_play消息中的audio_url指向这里；
+    正在合成时以分块传输转发已经到达的音频片段，浏览器可以边下载边播放；合成失败或超时时中断连接，
+    不会以一个截断的完整响应结束
+    返回: 音频流，未缓存时返回404，前端改用/api/voice/synthesize
+    """
+    if not re.fullmatch(r"[0-9a-f]{64}\.(wav|mp3|ogg)", key):
+        return jsonify({"error": "无效的语音键"}), 400
+    chunks, complete = voice_client.stream_audio(key)
+    if chunks is None:
+        return jsonify({"error": "语音不存在"}), 404
+    # 内容按哈希寻址，已缓存的完整音频不会变化；正在合成的音频可能失败而中断，不能被缓存
+    cache_control = 'public, max-age=31536000, immutable' if complete else 'no-store'
+    return Response(
+        chunks,
+        mimetype=mimetype_for(key),
+        headers={'Cache-Control': cache_control}
+    )
+
+# 语音统计API
+@app.route('/api/voice/stats', methods=['GET'])
+def get_voice_stats():
+    """获取语音输出格式、每段语音的平均字节数和缓存统计"""
+    return jsonify({"status": "success", "data": voice_client.get_stats()})
 
 # 语音合成API
 @app.route('/api/voice/synthesize', methods=['POST'])
 def synthesize_voice():
     """
     语音合成接口
-    请求格式: {"text": "要合成的文本", "character": "角色名称"}
-    返回: WAV音频流
+    请求格式: {"text": "要合成的文本", "character": "角色名称", "stream": false, "format": "mp3"}
+    返回: 音频流，格式默认为VOICE_FORMAT，不支持压缩格式的旧客户端可以指定format为wav；
+        stream为true时以分块传输返回，合成服务的音频片段到达后立即转发
     """
     try:
         data = request.json
@@ -284,19 +476,29 @@ def synthesize_voice():
         if not text:
             return jsonify({"error": "文本内容不能为空"}), 400
             
+        audio_format = data.get('format')
+        try:
+            mimetype = voice_client.mimetype(audio_format)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        if data.get('stream'):
+            return Response(voice_client.stream_speech(text, character_name, audio_format), mimetype=mimetype)
+
         # 调用语音合成
-        audio_data = voice_client.synthesize_speech(text, character_name)
+        audio_data = voice_client.synthesize_speech(text, character_name, audio_format)
         
         if audio_data:
             # 返回音频流
+            extension = voice_client.speech_key(text, character_name, audio_format).rsplit(".", 1)[-1]
             return Response(
                 audio_data,
-                mimetype='audio/wav',
-                headers={'Content-Disposition': 'attachment; filename=speech.wav'}
+                mimetype=mimetype,
+                headers={'Content-Disposition': f'attachment; filename=speech.{extension}'}
             )
         else:
             return jsonify({"error": "语音合成失败"}), 500
             
     except Exception as e:
-        print(f"语音合成API错误: {str(e)}")
+        logger.error("voice.synthesize", f"语音合成API错误: {str(e)}")
         return jsonify({"error": f"服务器错误: {str(e)}"}), 500
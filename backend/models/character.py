@@ -1,7 +1,14 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from datetime import datetime
+import os
+import heapq
+from collections import deque
+
+from backend.models.records import HistoryEntry, Observation, Statement, InnerThought, Belief, Decision
+
+# 每类记忆保留的最近条目数，更早的条目移入待整理队列，由记忆整理合并进摘要
+MEMORY_WINDOW = int(os.getenv("MEMORY_WINDOW", "20"))
 
 class Character:
     """角色类，代表游戏中的一个角色"""
@@ -28,13 +35,21 @@ class Character:
         self.voice = voice
         self.alive = True
         self.history = []  # 角色行为历史
+        # 游戏共享事件存储，由Game.add_character设置；公开发言和投票等共同观察到的事件只在其中保存一份
+        self.event_store = None
+        self.observation_positions = deque(maxlen=MEMORY_WINDOW)  # 私有观察记录写入时共享事件存储的长度，用于合并排序
         self.memory = {    # 角色记忆系统
-            "observations": [],     # 观察到的事件
+            "observations": deque(maxlen=MEMORY_WINDOW),    # 只有自己观察到的事件
             "beliefs": {},          # 对其他角色的看法
-            "decisions": [],        # 做出的决策
-            "statements": [],       # 发表的公开言论
-            "inner_thoughts": []    # 内心想法（不公开）
+            "decisions": [],        # 做出的决策（游戏逻辑需要完整的查验、守护记录，不截断）
+            "statements": deque(maxlen=MEMORY_WINDOW),      # 发表的公开言论
+            "inner_thoughts": deque(maxlen=MEMORY_WINDOW),  # 内心想法（不公开）
+            "summary": ""           # 更早记忆的滚动摘要
         }
+        # 移出最近窗口、等待整理进摘要的记忆文本
+        self.pending_compaction = deque(maxlen=MEMORY_WINDOW * 4)
+        # 共享事件中已经交给记忆整理的位置
+        self.shared_cursor = 0
 
     def to_dict(self):
         """
@@ -86,12 +101,7 @@ class Character:
             target (Character, optional): 行为目标. 默认为None.
             result (str, optional): 行为结果. 默认为None.
         """
-        history_entry = {
-            "action": action,
-            "target": target.name if target else None,
-            "result": result,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
+        history_entry = HistoryEntry(action, target.name if target else None, result)
         self.history.append(history_entry)
 
     def add_observation(self, event, day, phase):
@@ -103,13 +113,39 @@ class Character:
             day (int): 游戏天数
             phase (str): 游戏阶段
         """
-        observation = {
-            "event": event,
-            "day": day,
-            "phase": phase,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        self.memory["observations"].append(observation)
+        observation = Observation(event, day, phase)
+        self._remember("observations", observation)
+        self.observation_positions.append(len(self.event_store) if self.event_store is not None else 0)
+
+    def get_observations(self, count=None):
+        """
+        获取观察记录：共享事件存储中对自己可见的事件与私有观察按发生顺序合并
+
+        Args:
+            count (int, optional): 只返回最近的记录数量. 默认为None（全部）.
+
+        Returns:
+            list: 观察记录列表
+        """
+        private = list(zip(self.observation_positions, self.memory["observations"]))
+        shared = []
+        if self.event_store is not None:
+            # 从最新的事件往前读，取够数量即停止
+            for position, event in self.event_store.iter_visible(self.id, reverse=True):
+                shared.append((position, event))
+                if count and len(shared) >= count:
+                    break
+            shared.reverse()
+        if count:
+            private = private[-count:]
+
+        # 私有观察的位置是写入时共享事件的数量，位置相同时私有观察在前
+        merged = heapq.merge(
+            ((position, 0, observation) for position, observation in private),
+            ((position, 1, event) for position, event in shared)
+        )
+        observations = [observation for _, _, observation in merged]
+        return observations[-count:] if count else observations
 
     def add_statement(self, content, day, phase):
         """
@@ -120,13 +156,8 @@ class Character:
             day (int): 游戏天数
             phase (str): 游戏阶段
         """
-        statement = {
-            "content": content,
-            "day": day,
-            "phase": phase,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        self.memory["statements"].append(statement)
+        statement = Statement(content, day, phase)
+        self._remember("statements", statement)
 
     def add_inner_thought(self, content, day, phase, thought_type="general"):
         """
@@ -138,14 +169,28 @@ class Character:
             phase (str): 游戏阶段
             thought_type (str): 想法类型（如"decision_reason", "action_reason"等）
         """
-        inner_thought = {
-            "content": content,
-            "day": day,
-            "phase": phase,
-            "type": thought_type,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        self.memory["inner_thoughts"].append(inner_thought)
+        inner_thought = InnerThought(content, day, phase, thought_type)
+        self._remember("inner_thoughts", inner_thought)
+
+    def _remember(self, kind, item):
+        """
+        写入最近记忆，窗口已满时把最早的一条转为文本移入待整理队列
+
+        Args:
+            kind (str): 记忆类型，"observations"、"statements"或"inner_thoughts"
+            item: 记忆记录
+        """
+        items = self.memory[kind]
+        if len(items) == items.maxlen:
+            oldest = items[0]
+            if kind == "observations":
+                text = f"第{oldest.day}天{oldest.phase}：{oldest.event}"
+            elif kind == "statements":
+                text = f"第{oldest.day}天我发言：'{oldest.content}'"
+            else:
+                text = f"第{oldest.day}天我心里想：{oldest.content}"
+            self.pending_compaction.append(text)
+        items.append(item)
 
     def update_belief(self, target_name, belief, confidence=0.5):
         """
@@ -157,13 +202,10 @@ class Character:
             confidence (float, optional): 确信度. 默认为0.5.
         """
         if target_name not in self.memory["beliefs"]:
-            self.memory["beliefs"][target_name] = []
+            # 只有最新的看法会进入提示词
+            self.memory["beliefs"][target_name] = deque(maxlen=MEMORY_WINDOW)
 
-        belief_entry = {
-            "belief": belief,
-            "confidence": confidence,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
+        belief_entry = Belief(belief, confidence)
         self.memory["beliefs"][target_name].append(belief_entry)
 
     def add_decision(self, decision_type, target_name=None, reason=None, day=None, phase=None):
@@ -177,14 +219,7 @@ class Character:
             day (int, optional): 游戏天数. 默认为None.
             phase (str, optional): 游戏阶段. 默认为None.
         """
-        decision = {
-            "type": decision_type,
-            "target": target_name,
-            "reason": reason,
-            "day": day,
-            "phase": phase,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
+        decision = Decision(decision_type, target_name, reason, day, phase)
         self.memory["decisions"].append(decision)
 
     def get_recent_observations(self, count=5):
@@ -197,7 +232,7 @@ class Character:
         Returns:
             list: 最近的观察记录列表
         """
-        return self.memory["observations"][-count:] if self.memory["observations"] else []
+        return self.get_observations(count)
 
     def get_recent_statements(self, count=3):
         """
@@ -209,7 +244,7 @@ class Character:
         Returns:
             list: 最近的发言记录列表
         """
-        return self.memory["statements"][-count:] if self.memory["statements"] else []
+        return list(self.memory["statements"])[-count:]
 
     def get_recent_inner_thoughts(self, count=5, thought_type=None):
         """
@@ -222,10 +257,10 @@ class Character:
         Returns:
             list: 最近的内心想法记录列表
         """
-        thoughts = self.memory["inner_thoughts"]
+        thoughts = list(self.memory["inner_thoughts"])
         if thought_type:
             thoughts = [t for t in thoughts if t.get("type") == thought_type]
-        return thoughts[-count:] if thoughts else []
+        return thoughts[-count:]
 
     def get_beliefs_summary(self):
         """
@@ -254,8 +289,12 @@ class Character:
         """
         summary = []
 
-        # 添加最近的观察
-        recent_observations = self.get_recent_observations()
+        # 添加更早记忆的摘要
+        if self.memory["summary"]:
+            summary.append(f"更早的记忆摘要:\n{self.memory['summary']}\n")
+
+        # 添加最近的观察：读取整个最近窗口，移出窗口的记忆由记忆整理合并进上面的摘要，两者之间没有遗漏
+        recent_observations = self.get_recent_observations(MEMORY_WINDOW)
         if recent_observations:
             summary.append("最近观察到的事件:")
             for obs in recent_observations:
@@ -269,8 +308,8 @@ class Character:
                 confidence = "非常确信" if belief_info["confidence"] > 0.8 else "比较确信" if belief_info["confidence"] > 0.5 else "不太确定"
                 summary.append(f"- 对{target}：{belief_info['belief']}（{confidence}）")
 
-        # 添加最近的发言
-        recent_statements = self.get_recent_statements()
+        # 添加最近的发言（同样读取整个最近窗口）
+        recent_statements = self.get_recent_statements(MEMORY_WINDOW)
         if recent_statements:
             summary.append("\n我最近的发言:")
             for stmt in recent_statements:
@@ -278,6 +317,38 @@ class Character:
 
         return "\n".join(summary)
 
+    def take_compaction_batch(self, min_items=1):
+        """
+        取出等待整理进摘要的记忆：移出最近窗口的私有记忆，以及对自己可见、
+        但已不在最近MEMORY_WINDOW条之内的共享事件
+
+        Args:
+            min_items (int, optional): 数量不足时不取出，返回空列表. 默认为1.
+
+        Returns:
+            list: 记忆文本列表
+        """
+        old_positions = []
+        if self.event_store is not None:
+            positions = [
+                position for position in range(self.shared_cursor, len(self.event_store))
+                if self.event_store.is_visible(position, self.id)
+            ]
+            old_positions = positions[:-MEMORY_WINDOW] if len(positions) > MEMORY_WINDOW else []
+
+        if len(self.pending_compaction) + len(old_positions) < max(1, min_items):
+            return []
+
+        lines = []
+        for position in old_positions:
+            event = self.event_store.events[position]
+            lines.append(f"第{event.day}天{event.phase}：{event.event}")
+        if old_positions:
+            self.shared_cursor = old_positions[-1] + 1
+        lines.extend(self.pending_compaction)
+        self.pending_compaction.clear()
+        return lines
+
     def __str__(self):
         """字符串表示"""
         return f"{self.name} ({self.role})"
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+游戏事件存储
+多个角色共同观察到的事件（公开发言、投票、处决结果）只保存一份并标记可见角色，
+角色的观察记录由共享事件和角色自己的私有观察合并而成
+"""
+
+from backend.models.records import Observation
+
+
+class EventStore:
+    """只追加的共享事件存储"""
+
+    def __init__(self):
+        """初始化事件存储"""
+        self.events = []     # 事件记录，格式与角色观察记录相同
+        self.audiences = []  # 每个事件的可见角色ID集合
+        self.actors = []     # 每个事件的发起角色ID，发起者本人不把它计入观察
+        self._last_audience = frozenset()
+
+    def __len__(self):
+        return len(self.events)
+
+    def broadcast(self, event, day, phase, audience, actor=None):
+        """
+        记录一个由多个角色共同观察到的事件
+
+        Args:
+            event (str): 事件描述
+            day (int): 游戏天数
+            phase (str): 游戏阶段
+            audience (list): 观察到该事件的角色列表
+            actor: 事件发起角色，不计入其本人的观察. 默认为None.
+        """
+        audience_ids = frozenset(c.id for c in audience)
+        # 存活角色集合很少变化，相同的集合共用同一个对象
+        if audience_ids == self._last_audience:
+            audience_ids = self._last_audience
+        else:
+            self._last_audience = audience_ids
+
+        self.events.append(Observation(event, day, phase))
+        self.audiences.append(audience_ids)
+        self.actors.append(actor.id if actor else None)
+
+    def is_visible(self, position, character_id):
+        """
+        判断事件是否计入角色的观察
+
+        Args:
+            position (int): 事件位置
+            character_id: 角色ID
+
+        Returns:
+            bool: 是否可见
+        """
+        return character_id in self.audiences[position] and self.actors[position] != character_id
+
+    def iter_visible(self, character_id, reverse=False):
+        """
+        遍历角色可见的事件
+
+        Args:
+            character_id: 角色ID
+            reverse (bool, optional): 是否从最新的事件开始. 默认为False.
+
+        Yields:
+            tuple: (事件位置, 事件记录)
+        """
+        positions = range(len(self.events) - 1, -1, -1) if reverse else range(len(self.events))
+        for position in positions:
+            if self.is_visible(position, character_id):
+                yield position, self.events[position]
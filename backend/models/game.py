@@ -1,9 +1,28 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import os
+import uuid
+import heapq
 import random
+from bisect import bisect_left
 from enum import Enum
-from datetime import datetime
+
+from backend.models.event_store import EventStore
+from backend.models.records import LogEntry, to_dicts
+from backend.utils.logger import get_logger
+
+# 构建角色上下文时读取的最近日志条数
+HISTORY_WINDOW = int(os.getenv("HISTORY_WINDOW", "15"))
+
+# 只能由执行者本人看到的私有行动阶段
+SELF_ACTION_PHASES = ("seer", "witch", "guard")
+
+# 公开摘要中保留的系统消息关键词
+PUBLIC_DIGEST_KEYWORDS = (
+    "开始讨论", "开始投票", "被投票处决", "天亮了", "平安夜",
+    "在夜晚被杀害", "被毒死", "游戏开始", "游戏结束"
+)
 
 class GamePhase(Enum):
     """游戏阶段枚举"""
@@ -30,13 +49,23 @@ class GameStatus(Enum):
 class Game:
     """游戏类，负责管理游戏状态和角色"""
 
-    def __init__(self):
-        """初始化游戏"""
+    def __init__(self, game_id=None):
+        """
+        初始化游戏
+
+        Args:
+            game_id (str, optional): 游戏ID，重置游戏时沿用原ID. 默认为新生成的ID.
+        """
+        self.id = game_id or uuid.uuid4().hex  # 游戏ID
         self.characters = []  # 角色列表
         self.current_day = 0  # 当前天数
         self.phase = GamePhase.SETUP  # 当前游戏阶段
         self.status = GameStatus.WAITING  # 当前游戏状态
         self.logs = []  # 游戏日志
+        self.events = EventStore()  # 角色共同观察到的事件
+        # 按受众维护的日志位置索引，在写入日志时更新：
+        # "public"、"digest"（公开摘要）、"werewolf"，以及"seer:<名字>"等本人可见的行动
+        self.log_index = {"public": [], "digest": []}
         self.votes = {}  # 投票记录
         self.killed_at_night = None  # 夜晚被杀的角色
         self.saved_by_witch = False  # 是否被女巫救
@@ -47,9 +76,12 @@ class Game:
         self.pk_candidates = []  # PK候选人列表
         self.revotes = {}  # 重新投票记录
         self.is_revote = False  # 是否是重新投票
+        self.winner = None  # 获胜阵营（"villager"或"werewolf"）
+        self.logger = get_logger(game_id=self.id)  # 绑定本局ID的日志器，无头模式下由引擎设为静默
 
     def add_character(self, character):
         """添加角色到游戏"""
+        character.event_store = self.events
         self.characters.append(character)
 
     def assign_roles(self):
@@ -136,11 +168,13 @@ class Game:
 
         # 狼人全部出局，好人胜利
         if werewolf_count == 0:
+            self.winner = "villager"
             self.log("系统", "游戏结束，好人阵营胜利！")
             return True
 
         # 狼人数量大于等于好人，狼人胜利
         if werewolf_count >= villager_count:
+            self.winner = "werewolf"
             self.log("系统", "游戏结束，狼人阵营胜利！")
             return True
 
@@ -162,20 +196,91 @@ class Game:
                 - "action": 角色行动
             ai_call_ids (list, optional): 关联的AI调用记录ID列表. 默认为None.
         """
-        log_entry = {
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "day": self.current_day,
-            "phase": phase or self.phase.value,
-            "source": source,
-            "message": message,
-            "is_public": is_public,
-            "message_type": message_type,
-            "ai_call_ids": ai_call_ids or []
-        }
+        log_entry = LogEntry(
+            self.current_day,
+            phase or self.phase.value,
+            source,
+            message,
+            is_public,
+            message_type,
+            tuple(ai_call_ids or ())
+        )
         self.logs.append(log_entry)
+        position = len(self.logs) - 1
+        for audience in self.log_audiences(log_entry):
+            self.log_index.setdefault(audience, []).append(position)
+
+        # 输出日志，格式化在日志线程中进行
+        self.logger.info("game.log", "[{day}天-{phase}] {source}: {message}",
+                         day=self.current_day, phase=log_entry.phase, source=source, message=message)
+
+    @staticmethod
+    def log_audiences(log):
+        """
+        计算日志所属的受众索引
+
+        Args:
+            log (dict): 日志记录
+
+        Returns:
+            list: 受众名称列表，私有且不属于任何受众的日志返回空列表
+        """
+        phase = log.get("phase", "")
+        if log.get("is_public", True):
+            if log["source"] == "系统":
+                in_digest = any(keyword in log["message"] for keyword in PUBLIC_DIGEST_KEYWORDS)
+            else:
+                # 公开摘要只保留讨论阶段和投票阶段的发言
+                in_digest = phase in ("discussion", "vote")
+            return ["public", "digest"] if in_digest else ["public"]
+
+        # 狼人可以看到其他狼人的行动
+        if phase == "werewolf":
+            return ["werewolf"]
+        # 预言家、女巫和守卫只能看到自己的行动
+        if phase in SELF_ACTION_PHASES:
+            return [f"{phase}:{log['source']}"]
+        return []
+
+    @staticmethod
+    def character_audiences(character):
+        """
+        计算角色能看到的受众索引
+
+        Args:
+            character: 角色对象
+
+        Returns:
+            list: 受众名称列表
+        """
+        audiences = ["public"]
+        if character.role == "werewolf":
+            audiences.append("werewolf")
+        elif character.role in SELF_ACTION_PHASES:
+            audiences.append(f"{character.role}:{character.name}")
+        return audiences
+
+    def get_visible_logs(self, character=None, window=None, audiences=None):
+        """
+        读取最近window条日志中对角色可见的部分，只访问索引中落在窗口内的位置
+
+        Args:
+            character: 角色对象，为None时只返回公开日志. 默认为None.
+            window (int, optional): 日志窗口大小. 默认为HISTORY_WINDOW.
+            audiences (list, optional): 直接指定受众索引，优先于character. 默认为None.
+
+        Returns:
+            list: 按时间顺序排列的日志记录
+        """
+        if audiences is None:
+            audiences = self.character_audiences(character) if character else ["public"]
+        start = max(0, len(self.logs) - (window or HISTORY_WINDOW))
 
-        # 打印日志（可选）
-        print(f"[{log_entry['timestamp']}] [{self.current_day}天-{log_entry['phase']}] {source}: {message}")
+        windows = []
+        for audience in audiences:
+            positions = self.log_index.get(audience, [])
+            windows.append(positions[bisect_left(positions, start):])
+        return [self.logs[position] for position in heapq.merge(*windows)]
 
     def get_alive_characters(self):
         """获取所有存活的角色"""
@@ -195,9 +300,11 @@ class Game:
     def to_dict(self):
         """将游戏转换为字典"""
         return {
+            "id": self.id,
             "characters": [c.to_dict() for c in self.characters],
             "phase": self.phase.value,
             "status": self.status.value,
             "current_day": self.current_day,
-            "logs": self.logs
+            "winner": self.winner,
+            "logs": to_dicts(self.logs)
         }
@@ -1,65 +1,190 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import os
 import time
+import uuid
 import threading
 import json
 import random
 import asyncio
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 from backend.models.game import Game, GamePhase, GameStatus
 from backend.models.character import Character
+from backend.models.records import to_dicts
 from backend.utils.ai_client import get_ai_client
 from backend.utils.prompt_templates import *  # 导入提示词模板
 from backend.utils.memory_manager import MemoryManager  # 导入记忆管理器
-from backend.utils.voice_client import voice_client  # 导入语音客户端
+from backend.utils.memory_summarizer import MemorySummarizer
+from backend.utils.context_builder import ContextBuilder, CONTEXT_BUDGET_TOKENS, estimate_tokens, fit_text
+from backend.utils.prompt_layout import render_prompt, is_stable_layout, profile_text, role_description
+from backend.utils.metrics import metrics
+from backend.utils.audio_cache import mimetype_for
+
+# 无头模式下是否丢弃日志
+LOG_HEADLESS_QUIET = os.getenv("LOG_HEADLESS_QUIET", "1") == "1"
+
+# 公开发言提示词中内心分析要点的token上限
+INNER_DECISION_TOKENS = int(os.getenv("INNER_DECISION_TOKENS", "500"))
+
+# 同一阶段内互不依赖的AI决策共用的线程池（所有游戏引擎共享）
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "16"))
+_ai_executor = None
+_ai_executor_lock = threading.Lock()
+
+
+def get_ai_executor():
+    """
+    获取并发AI调用使用的线程池
+
+    Returns:
+        ThreadPoolExecutor: 线程池
+    """
+    global _ai_executor
+    with _ai_executor_lock:
+        if _ai_executor is None:
+            _ai_executor = ThreadPoolExecutor(max_workers=AI_MAX_CONCURRENCY, thread_name_prefix="ai-call")
+        return _ai_executor
+
+
+def _reset_ai_executor_after_fork():
+    """fork出的子进程（如批量对局的进程池）不会继承线程，需要重新创建线程池"""
+    global _ai_executor, _ai_executor_lock
+    _ai_executor = None
+    _ai_executor_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_ai_executor_after_fork)
 
 class GameEngine:
     """游戏引擎类，负责管理游戏流程和AI交互"""
 
-    def __init__(self, socketio=None):
+    def __init__(self, socketio=None, headless=False, room=None):
         """
         初始化游戏引擎
 
         Args:
             socketio: SocketIO实例，用于实时通信
+            headless (bool, optional): 无头模式，跳过所有等待、前端推送和语音确认，
+                用于批量模拟. 默认为False.
+            room (str, optional): Socket.IO房间，设置后只向该房间推送消息. 默认为None（广播）.
         """
         self.game = Game()
-        self.socketio = socketio
+        self.headless = headless
+        self.socketio = None if headless else socketio
+        self.room = room
         self.game_thread = None
+        # 由游戏注册表提供的线程池，设置后游戏循环在线程池中运行而不是单独创建线程
+        self.executor = None
+        self.game_future = None
+        self.created_at = time.time()
+        self.finished_at = None
         self.running = False
         self.ai_clients = {}  # 存储角色的AI客户端
+        # 讨论阶段是否在语音播放期间预生成下一位角色的发言
+        self.pipeline_discussion = os.getenv("DISCUSSION_PIPELINE", "1") == "1"
+        self.discussion_stats = {"prefetched": 0, "prefetch_hits": 0, "prefetch_stale": 0}
+        # 狼人行动开始时提前发起的预言家查验：(预言家, 可查验目标, Future)
+        self.pending_seer_check = None
+        # 更早的角色记忆定期整理进摘要；MEMORY_SUMMARY_MODEL可指定一个更便宜的模型，默认使用角色自己的模型
+        self.memory_summarizer = MemorySummarizer() if os.getenv("MEMORY_SUMMARY", "1") == "1" else None
+        self.summary_client = None
+        # 角色上下文组装统计，以及每个角色最近一次组装的报告
+        self.context_stats = {"built": 0, "truncated": 0, "dropped": 0, "tokens": 0}
+        self.context_reports = {}
+        # game_update增量推送状态：序号、已推送的日志条数和角色字段
+        self.update_lock = threading.Lock()
+        self.update_seq = 0
+        self.sent_log_count = 0
+        self.sent_characters = {}
         
         # 语音完成相关属性
         self.voice_completion_event = None
         self.expected_voice_completion = None
+        # 语音预合成客户端（提供presynthesize和audio_url），由服务端注入，未设置时前端收到voice_play后再请求合成
+        self.voice_synthesizer = None
+        # 无头模式下默认丢弃日志，LOG_HEADLESS_QUIET=0时保留
+        self.log_quiet = headless and LOG_HEADLESS_QUIET
+        self.game.logger.quiet = self.log_quiet
         # 全局AI调用记录管理器
         self.ai_call_manager = {}
 
-    def load_characters_from_config(self, config_file):
+    @property
+    def logger(self):
+        """当前对局的日志器"""
+        return self.game.logger
+
+    def set_log_quiet(self, quiet):
+        """
+        设置是否丢弃本局的日志，无头批量模拟时使用
+
+        Args:
+            quiet (bool): 是否静默
+        """
+        self.log_quiet = quiet
+        self.game.logger.quiet = quiet
+        for ai_client in list(self.ai_clients.values()) + [self.summary_client]:
+            if ai_client:
+                ai_client.logger.quiet = quiet
+
+    def load_characters_from_config(self, config_file, client_factory=None):
         """
         从配置文件加载角色
 
         Args:
             config_file (str): 配置文件路径
+            client_factory (callable, optional): 根据模型名称创建AI客户端的函数. 默认为get_ai_client.
         """
         try:
             with open(config_file, 'r', encoding='utf-8') as f:
                 characters_data = json.load(f)
 
+            return self.load_characters(characters_data, client_factory)
+        except Exception as e:
+            self.logger.error("engine.config", f"加载角色配置失败: {str(e)}")
+            return False
+
+    def load_characters(self, characters_data, client_factory=None):
+        """
+        从角色字典列表加载角色
+
+        Args:
+            characters_data (list): 与config/characters.json格式相同的角色字典列表
+            client_factory (callable, optional): 根据模型名称创建AI客户端的函数. 默认为get_ai_client.
+
+        Returns:
+            bool: 是否加载成功
+        """
+        client_factory = client_factory or get_ai_client
+        try:
             for data in characters_data:
                 character = Character.from_dict(data)
                 self.game.add_character(character)
                 # 为每个角色创建AI客户端
-                ai_client = get_ai_client(character.model)
+                ai_client = client_factory(character.model)
+                ai_client.game_id = self.game.id
+                ai_client.room = self.room
+                # 无头模式下不向前端推送模型调用状态
+                ai_client.emit_status = not self.headless
+                ai_client.logger = self.logger.bind(model=ai_client.model_name)
                 self.ai_clients[character.id] = ai_client
                 # 将AI客户端的调用记录合并到全局管理器中
                 self.ai_call_manager.update(ai_client.ai_call_records)
 
+            summary_model = os.getenv("MEMORY_SUMMARY_MODEL")
+            if self.memory_summarizer and summary_model:
+                self.summary_client = client_factory(summary_model)
+                self.summary_client.game_id = self.game.id
+                self.summary_client.room = self.room
+                self.summary_client.emit_status = not self.headless
+                self.summary_client.logger = self.logger.bind(model=self.summary_client.model_name)
+
             return True
         except Exception as e:
-            print(f"加载角色配置失败: {str(e)}")
+            self.logger.error("engine.config", f"加载角色配置失败: {str(e)}")
             return False
 
     def start_game(self):
@@ -70,15 +195,42 @@ class GameEngine:
         try:
             self.game.start_game()
             self.running = True
-            # 在新线程中运行异步游戏循环
-            self.game_thread = threading.Thread(target=self._run_async_game_loop)
-            self.game_thread.daemon = True
-            self.game_thread.start()
+            self._launch_game_loop()
             return True
         except Exception as e:
-            print(f"启动游戏失败: {str(e)}")
+            self.logger.error("engine.start", f"启动游戏失败: {str(e)}")
             return False
 
+    def run_headless(self):
+        """
+        以无头模式同步运行一局完整游戏，直到游戏结束
+
+        Returns:
+            Game: 结束后的游戏对象
+        """
+        if not self.headless:
+            self.log_quiet = LOG_HEADLESS_QUIET
+        self.headless = True
+        self.socketio = None
+        # 无头模式下不向前端推送模型调用状态
+        for ai_client in self.ai_clients.values():
+            ai_client.emit_status = False
+        self.set_log_quiet(self.log_quiet)
+
+        self.game.start_game()
+        self.running = True
+        self._run_async_game_loop()
+        return self.game
+
+    def _launch_game_loop(self):
+        """在后台运行异步游戏循环：有共享线程池时提交到线程池，否则创建新线程"""
+        if self.executor:
+            self.game_future = self.executor.submit(self._run_async_game_loop)
+        else:
+            self.game_thread = threading.Thread(target=self._run_async_game_loop)
+            self.game_thread.daemon = True
+            self.game_thread.start()
+
     def _run_async_game_loop(self):
         """在新线程中运行异步游戏循环"""
         loop = asyncio.new_event_loop()
@@ -87,6 +239,8 @@ class GameEngine:
             loop.run_until_complete(self.game_loop())
         finally:
             loop.close()
+            if self.game.status == GameStatus.FINISHED:
+                self.finished_at = time.time()
 
     def pause_game(self):
         """暂停游戏"""
@@ -105,10 +259,8 @@ class GameEngine:
 
         self.game.status = GameStatus.RUNNING
         self.running = True
-        # 在新线程中运行游戏循环
-        self.game_thread = threading.Thread(target=self.game_loop)
-        self.game_thread.daemon = True
-        self.game_thread.start()
+        # 在后台重新运行异步游戏循环
+        self._launch_game_loop()
         self.emit_game_update("游戏已恢复")
         return True
 
@@ -118,7 +270,11 @@ class GameEngine:
         if self.game_thread and self.game_thread.is_alive():
             self.game_thread.join(timeout=1.0)
 
-        self.game = Game()
+        # 沿用原游戏ID，注册表、Socket.IO房间和限流器中的对局标识保持不变
+        self.game = Game(self.game.id)
+        self.game.logger.quiet = self.log_quiet
+        self.finished_at = None
+        self.pending_seer_check = None
         self.emit_game_update("游戏已重置")
         return True
 
@@ -136,40 +292,71 @@ class GameEngine:
 
             # 进入下一阶段
             next_phase = self.game.next_phase()
+            if next_phase == GamePhase.END:
+                # next_phase会同时把状态置为FINISHED，需要在这里结束循环
+                self.running = False
+                self.emit_game_update("游戏结束")
+                break
             self.emit_game_update(f"进入{next_phase.value}阶段")
 
+            # 每天入夜时整理角色记忆
+            if next_phase == GamePhase.NIGHT:
+                self.compact_memories()
+
             # 根据阶段设置等待时间
             if next_phase in [GamePhase.NIGHT, GamePhase.DAWN]:
-                await asyncio.sleep(2)  # 短暂过渡
+                await self.pause(2)  # 短暂过渡
             elif next_phase == GamePhase.DISCUSSION:
-                await asyncio.sleep(5)  # 讨论阶段较长
+                await self.pause(5)  # 讨论阶段较长
             else:
-                await asyncio.sleep(3)  # 其他阶段
+                await self.pause(3)  # 其他阶段
+
+    def compact_memories(self):
+        """整理存活角色的早期记忆，无头模式下同步执行以保证批量模拟可复现，否则在后台执行"""
+        if not self.memory_summarizer:
+            return
+        executor = None if self.headless else get_ai_executor()
+        for character in self.game.get_alive_characters():
+            ai_client = self.summary_client or self.ai_clients.get(character.id)
+            if ai_client:
+                self.memory_summarizer.maybe_compact(character, ai_client, executor)
+
+    async def pause(self, seconds):
+        """
+        阶段之间的等待，无头模式下直接跳过
+
+        Args:
+            seconds (float): 等待秒数
+        """
+        if self.headless:
+            return
+        await asyncio.sleep(seconds)
 
     async def handle_current_phase(self):
-        """处理当前游戏阶段"""
+        """处理当前游戏阶段，并按阶段统计处理耗时"""
         phase = self.game.phase
 
-        if phase == GamePhase.NIGHT:
-            self.handle_night_phase()
-        elif phase == GamePhase.WEREWOLF:
-            self.handle_werewolf_phase()
-        elif phase == GamePhase.SEER:
-            self.handle_seer_phase()
-        elif phase == GamePhase.WITCH:
-            self.handle_witch_phase()
-        elif phase == GamePhase.GUARD:
-            self.handle_guard_phase()
-        elif phase == GamePhase.DAWN:
-            self.handle_dawn_phase()
-        elif phase == GamePhase.DISCUSSION:
-            await self.handle_discussion_phase()
-        elif phase == GamePhase.VOTE:
-            self.handle_vote_phase()
-        elif phase == GamePhase.PK:
-            self.handle_pk_phase()
-        elif phase == GamePhase.REVOTE:
-            self.handle_revote_phase()
+        with metrics.timer("werewolf_phase_seconds", phase=phase.value):
+            if phase == GamePhase.NIGHT:
+                self.handle_night_phase()
+            elif phase == GamePhase.WEREWOLF:
+                self.handle_werewolf_phase()
+            elif phase == GamePhase.SEER:
+                self.handle_seer_phase()
+            elif phase == GamePhase.WITCH:
+                self.handle_witch_phase()
+            elif phase == GamePhase.GUARD:
+                self.handle_guard_phase()
+            elif phase == GamePhase.DAWN:
+                self.handle_dawn_phase()
+            elif phase == GamePhase.DISCUSSION:
+                await self.handle_discussion_phase()
+            elif phase == GamePhase.VOTE:
+                self.handle_vote_phase()
+            elif phase == GamePhase.PK:
+                await self.handle_pk_phase()
+            elif phase == GamePhase.REVOTE:
+                self.handle_revote_phase()
 
     def handle_night_phase(self):
         """处理夜晚阶段"""
@@ -183,7 +370,10 @@ class GameEngine:
         self.game.protected_by_guard = None
 
     def handle_werewolf_phase(self):
-        """处理狼人行动阶段"""
+        """处理狼人行动阶段，预言家的查验与狼人的讨论同时进行"""
+        # 狼人的行动是私有日志，不影响预言家的上下文，查验决策可以提前在线程池中发起
+        self.pending_seer_check = self.submit_seer_check()
+
         werewolves = self.game.get_werewolves()
         if not werewolves:
             return
@@ -209,7 +399,8 @@ class GameEngine:
                     context += f"- {target_name}：{votes}票\n"
 
             # 使用新的提示词模板
-            prompt = WEREWOLF_KILL_TEMPLATE.format(
+            prompt = render_prompt(
+                "werewolf_kill", werewolf,
                 alive_players=', '.join([c.name for c in self.game.get_alive_characters()]),
                 werewolf_teammates=', '.join(werewolf_teammates) if werewolf_teammates else "没有其他狼人",
                 targets=', '.join([c.name for c in targets]),
@@ -237,7 +428,7 @@ class GameEngine:
                     # 如果无法解析或没有找到匹配的目标，随机选择一个
                     if not target:
                         target = random.choice(targets)
-                        print(f"警告: {werewolf.name}的击杀决策'{kill_decision}'无法解析，随机选择了{target.name}")
+                        self.logger.warning("engine.decision", f"{werewolf.name}的击杀决策'{kill_decision}'无法解析，随机选择了{target.name}")
 
                     # 记录狼人投票
                     if target.name not in wolf_votes:
@@ -252,7 +443,7 @@ class GameEngine:
                     if ai_call_id:
                         self.game.log(werewolf.name, f"参与击杀决策，选择{target.name}", "werewolf", False, "action", [ai_call_id])
             except Exception as e:
-                print(f"生成狼人决策失败: {str(e)}")
+                self.logger.error("engine.ai", f"生成狼人决策失败: {str(e)}")
 
         # 确定最终击杀目标（得票最多的）
         if wolf_votes:
@@ -270,17 +461,21 @@ class GameEngine:
 
         self.emit_game_update("狼人正在行动")
 
-    def handle_seer_phase(self):
-        """处理预言家行动阶段"""
+    def prepare_seer_check(self):
+        """
+        构造预言家的查验提示词
+
+        Returns:
+            tuple: (预言家, 可查验目标列表, 提示词)，预言家不在场、已死亡或没有目标时返回None
+        """
         seer = self.game.get_character_by_role("seer")
         if not seer or not seer.alive:
-            # 不要公开说"预言家不在场或已死亡"
-            return
+            return None
 
         # 获取所有存活的角色（除了预言家自己）
         targets = [c for c in self.game.get_alive_characters() if c.id != seer.id]
         if not targets:
-            return
+            return None
 
         # 构建预言家的上下文信息
         context = self.build_character_context(seer)
@@ -304,22 +499,47 @@ class GameEngine:
             context += "\n你还没有查验过以下玩家：" + ", ".join([t.name for t in unchecked_targets]) + "\n"
 
         # 使用新的提示词模板
-        prompt = SEER_CHECK_TEMPLATE.format(
+        prompt = render_prompt(
+            "seer_check", seer,
             alive_players=', '.join([c.name for c in self.game.get_alive_characters()]),
             targets=', '.join([t.name for t in unchecked_targets]),
             context=context
         )
+        return seer, unchecked_targets, prompt
 
-        try:
-            ai_client = self.ai_clients.get(seer.id)
-            if ai_client:
-                # 获取预言家的查验决策
-                check_decision = ai_client.generate_response(prompt, seer, "seer_check", "seer_check").strip()
+    def submit_seer_check(self):
+        """
+        在线程池中提前发起预言家的查验决策
 
-                # 获取AI调用记录ID
-                ai_call_id = None
-                if hasattr(seer, 'memory') and 'latest_ai_call_id' in seer.memory:
-                    ai_call_id = seer.memory['latest_ai_call_id']
+        Returns:
+            tuple: (预言家, 可查验目标列表, Future)，不需要查验时返回None
+        """
+        prepared = self.prepare_seer_check()
+        if not prepared or not self.ai_clients.get(prepared[0].id):
+            return None
+        seer, unchecked_targets, prompt = prepared
+        return seer, unchecked_targets, self.submit_ai_decision(seer, prompt, "seer_check", "seer_check")
+
+    def handle_seer_phase(self):
+        """处理预言家行动阶段，优先使用狼人行动阶段提前发起的查验决策"""
+        pending, self.pending_seer_check = self.pending_seer_check, None
+        if pending:
+            seer, unchecked_targets, future = pending
+        else:
+            prepared = self.prepare_seer_check()
+            if not prepared:
+                # 不要公开说"预言家不在场或已死亡"
+                return
+            seer, unchecked_targets, prompt = prepared
+            future = None
+
+        try:
+            if future is not None:
+                check_decision, ai_call_id = future.result()
+            else:
+                check_decision, ai_call_id = self.request_ai_decision(seer, prompt, "seer_check", "seer_check")
+            if check_decision is not None:
+                check_decision = check_decision.strip()
 
                 # 解析查验决策，找到对应的目标角色
                 target = None
@@ -331,7 +551,7 @@ class GameEngine:
                 # 如果无法解析或没有找到匹配的目标，随机选择一个
                 if not target:
                     target = random.choice(unchecked_targets)
-                    print(f"警告: {seer.name}的查验决策'{check_decision}'无法解析，随机选择了{target.name}")
+                    self.logger.warning("engine.decision", f"{seer.name}的查验决策'{check_decision}'无法解析，随机选择了{target.name}")
 
                 # 执行查验
                 is_werewolf = target.role == "werewolf"
@@ -342,10 +562,9 @@ class GameEngine:
                 self.game.log(seer.name, f"预言家查验了{target.name}，结果是{result}", "seer", False, "action", ai_call_ids)
 
                 # 更新预言家记忆（不生成详细理由）
-                simple_reason = f"查验结果：{result}"
                 MemoryManager.update_seer_memory(seer, self.game, target, result)
         except Exception as e:
-            print(f"生成预言家决策失败: {str(e)}")
+            self.logger.error("engine.ai", f"生成预言家决策失败: {str(e)}")
 
         self.emit_game_update("预言家正在行动")
 
@@ -367,7 +586,8 @@ class GameEngine:
             context += f"\n今晚{killed.name}被狼人杀害了。你可以选择使用解药救活他，或者不使用解药。\n"
 
             # 使用新的提示词模板
-            save_prompt = WITCH_SAVE_TEMPLATE.format(
+            save_prompt = render_prompt(
+                "witch_save", witch,
                 alive_players=', '.join([c.name for c in self.game.get_alive_characters()]),
                 killed=killed.name,
                 context=context
@@ -401,12 +621,13 @@ class GameEngine:
                         self.game.log(witch.name, f"女巫决定不使用解药", "witch", False, "action", ai_call_ids)
                         MemoryManager.update_witch_memory(witch, self.game, killed, False)
             except Exception as e:
-                print(f"生成女巫救人决策失败: {str(e)}")
+                self.logger.error("engine.ai", f"生成女巫救人决策失败: {str(e)}")
 
         # 女巫决定是否使用毒药
         if not self.game.witch_used_poison:
             # 使用新的提示词模板
-            poison_prompt = WITCH_POISON_TEMPLATE.format(
+            poison_prompt = render_prompt(
+                "witch_poison", witch,
                 alive_players=', '.join([c.name for c in self.game.get_alive_characters()]),
                 context=context
             )
@@ -438,10 +659,10 @@ class GameEngine:
                             # 安全检查：确保女巫不会毒死预言家或其他好人阵营的关键角色
                             if target.role == "seer":
                                 self.game.log("系统", "女巫犹豫了，决定不使用毒药")
-                                print(f"警告: 女巫试图毒死预言家{target.name}，系统阻止了这一行为")
+                                self.logger.warning("engine.decision", f"女巫试图毒死预言家{target.name}，系统阻止了这一行为")
                             elif target.role != "werewolf" and random.random() < 0.8:  # 80%的概率阻止毒死好人
                                 self.game.log("系统", "女巫犹豫了，决定不使用毒药")
-                                print(f"警告: 女巫试图毒死好人{target.name}，系统阻止了这一行为")
+                                self.logger.warning("engine.decision", f"女巫试图毒死好人{target.name}，系统阻止了这一行为")
                             else:
                                 self.game.poisoned_by_witch = target
                                 self.game.witch_used_poison = True  # 标记毒药已使用
@@ -461,7 +682,7 @@ class GameEngine:
                         self.game.log(witch.name, f"女巫决定不使用毒药", "witch", False, "action", ai_call_ids)
                         MemoryManager.update_witch_memory(witch, self.game, None, False, None)
             except Exception as e:
-                print(f"生成女巫毒人决策失败: {str(e)}")
+                self.logger.error("engine.ai", f"生成女巫毒人决策失败: {str(e)}")
                 # 出错时也要记录女巫的行动，避免环节缺失
                 self.game.log(witch.name, f"女巫决定不使用毒药", "witch", False, "action")
 
@@ -483,7 +704,8 @@ class GameEngine:
         context = self.build_character_context(guard)
 
         # 使用新的提示词模板
-        prompt = GUARD_PROTECT_TEMPLATE.format(
+        prompt = render_prompt(
+            "guard_protect", guard,
             alive_players=', '.join([c.name for c in self.game.get_alive_characters()]),
             targets=', '.join([c.name for c in targets]),
             context=context
@@ -510,7 +732,7 @@ class GameEngine:
                 # 如果无法解析或没有找到匹配的目标，随机选择一个
                 if not target:
                     target = random.choice(targets)
-                    print(f"警告: {guard.name}的保护决策'{protect_decision}'无法解析，随机选择了{target.name}")
+                    self.logger.warning("engine.decision", f"{guard.name}的保护决策'{protect_decision}'无法解析，随机选择了{target.name}")
 
                 # 检查是否连续两晚保护同一个人
                 last_protect = None
@@ -524,7 +746,7 @@ class GameEngine:
                     other_targets = [t for t in targets if t.name != target.name]
                     if other_targets:
                         target = random.choice(other_targets)
-                        print(f"守卫不能连续两晚保护同一个人，改为保护{target.name}")
+                        self.logger.info("engine.decision", f"守卫不能连续两晚保护同一个人，改为保护{target.name}")
 
                 self.game.protected_by_guard = target
                 ai_call_ids = [ai_call_id] if ai_call_id else []
@@ -533,7 +755,7 @@ class GameEngine:
                 # 更新守卫记忆（不生成详细理由）
                 MemoryManager.update_guard_memory(guard, self.game, target)
         except Exception as e:
-            print(f"生成守卫决策失败: {str(e)}")
+            self.logger.error("engine.ai", f"生成守卫决策失败: {str(e)}")
 
         self.emit_game_update("守卫正在行动")
 
@@ -602,54 +824,155 @@ class GameEngine:
                 ordered_alive.append(character)
 
         # 每个角色按新顺序发表言论（双阶段策略）
-        for character in ordered_alive:
-            # 构建角色的上下文信息
-            context = self.build_character_context(character)
-
+        # 流水线：当前角色的语音播放期间，提前为下一位角色生成内心决策和公开发言；
+        # 轮到下一位时若游戏日志在预生成之后又有新内容，说明预生成时看到的记录不完整，需要重新生成
+        prefetched = None
+        for index, character in enumerate(ordered_alive):
             try:
                 ai_client = self.ai_clients.get(character.id)
                 if ai_client:
-                    # 收集这次发言相关的AI调用记录ID
-                    speech_ai_call_ids = []
-                    
-                    # 第一阶段：内心决策分析
-                    inner_decision = self.generate_inner_decision(character, context, alive_characters, ai_client)
-                    # 获取内心决策的AI调用记录ID
-                    if hasattr(character, 'memory') and 'latest_ai_call_id' in character.memory:
-                        speech_ai_call_ids.append(character.memory['latest_ai_call_id'])
-                    
-                    # 第二阶段：基于内心决策的公开发言
-                    public_speech = self.generate_public_speech(character, context, alive_characters, inner_decision, ai_client)
-                    # 获取公开发言的AI调用记录ID
-                    if hasattr(character, 'memory') and 'latest_ai_call_id' in character.memory:
-                        speech_ai_call_ids.append(character.memory['latest_ai_call_id'])
-
-                    # 记录角色发言到游戏日志（公开发言），关联AI调用记录
-                    self.game.log(character.name, public_speech, message_type="public_statement", ai_call_ids=speech_ai_call_ids)
-                    self.emit_game_update(f"{character.name}发言: {public_speech}")
-                    
-                    # 通知前端播放语音
-                    self.emit_voice_play(character.name, public_speech)
-
-                    # 更新角色记忆
-                    MemoryManager.update_discussion_memory(character, self.game, public_speech, alive_characters)
-
-                    # 为其他角色添加观察记录
-                    for observer in alive_characters:
-                        if observer.id != character.id:
-                            observer.add_observation(
-                                f"{character.name}说：{public_speech}",
-                                self.game.current_day,
-                                "discussion"
-                            )
-
-                    # 等待语音播放完成 - 通过WebSocket确认
-                    await self.wait_for_voice_completion(character.name)
+                    speech = await self.take_prefetched_speech(prefetched, character, alive_characters, ai_client)
+                    prefetched = None
+                    self.commit_speech(character, speech, alive_characters)
+
+                    # 在等待语音播放时预生成下一位角色的发言
+                    next_character = ordered_alive[index + 1] if index + 1 < len(ordered_alive) else None
+                    next_client = self.ai_clients.get(next_character.id) if next_character else None
+                    if self.pipeline_discussion and next_client:
+                        self.discussion_stats["prefetched"] += 1
+                        # 上下文和日志版本在创建任务时立即确定，而不是等任务开始运行
+                        prefetched = (next_character, asyncio.create_task(self.prepare_speech(
+                            next_character, alive_characters, next_client, stream=False,
+                            context=self.build_character_context(next_character),
+                            log_version=len(self.game.logs)
+                        )))
+
+                    # 等待语音播放完成 - 通过WebSocket确认（无头模式下跳过）
+                    if not self.headless:
+                        await self.wait_for_voice_completion(character.name)
             except Exception as e:
-                print(f"生成角色发言失败: {str(e)}")
+                self.logger.error("engine.ai", f"生成角色发言失败: {str(e)}")
                 self.game.log(character.name, "（发言系统故障）")
 
-    def generate_inner_decision(self, character, context, alive_characters, ai_client):
+    async def take_prefetched_speech(self, prefetched, character, alive_characters, ai_client):
+        """
+        获取角色的发言：预生成的结果仍然有效时直接使用，否则重新生成
+
+        Args:
+            prefetched (tuple): (角色, 预生成任务)，没有预生成时为None
+            character: 当前发言的角色
+            alive_characters: 存活角色列表
+            ai_client: AI客户端
+
+        Returns:
+            dict: prepare_speech返回的发言数据
+        """
+        if prefetched and prefetched[0] is character:
+            try:
+                speech = await prefetched[1]
+            except Exception as e:
+                self.logger.info("engine.discussion", f"预生成发言失败，重新生成: {str(e)}")
+                speech = None
+
+            if speech and speech["log_version"] == len(self.game.logs):
+                self.discussion_stats["prefetch_hits"] += 1
+                return speech
+            if speech:
+                self.discussion_stats["prefetch_stale"] += 1
+                self.logger.info("engine.discussion", f"{character.name}的预生成发言已过期，重新生成")
+
+        return await self.prepare_speech(character, alive_characters, ai_client)
+
+    async def prepare_speech(self, character, alive_characters, ai_client, stream=True, context=None, log_version=None):
+        """
+        生成角色的内心决策和公开发言，不修改游戏状态，可以提前执行
+
+        Args:
+            character: 角色对象
+            alive_characters: 存活角色列表
+            ai_client: AI客户端
+            stream (bool, optional): 是否向前端流式推送发言，预生成时关闭. 默认为True.
+            context (str, optional): 角色上下文信息. 默认为当前构建.
+            log_version (int, optional): 构建上下文时的日志条数. 默认为当前日志条数.
+
+        Returns:
+            dict: 包含内心决策、公开发言、AI调用记录ID以及生成时的日志版本
+        """
+        if log_version is None:
+            log_version = len(self.game.logs)
+        # 构建角色的上下文信息
+        if context is None:
+            context = self.build_character_context(character)
+
+        # 收集这次发言相关的AI调用记录ID
+        speech_ai_call_ids = []
+
+        # 第一阶段：内心决策分析
+        inner_decision = await self.generate_inner_decision(character, context, alive_characters, ai_client)
+        # 获取内心决策的AI调用记录ID
+        if hasattr(character, 'memory') and 'latest_ai_call_id' in character.memory:
+            speech_ai_call_ids.append(character.memory['latest_ai_call_id'])
+
+        # 第二阶段：基于内心决策的公开发言
+        public_speech = await self.generate_public_speech(
+            character, context, alive_characters,
+            inner_decision or "（内心分析失败，将基于基础信息发言）",
+            ai_client, stream
+        )
+        # 获取公开发言的AI调用记录ID
+        if hasattr(character, 'memory') and 'latest_ai_call_id' in character.memory:
+            speech_ai_call_ids.append(character.memory['latest_ai_call_id'])
+
+        # 发言生成后立即提交语音预合成，轮到该角色时音频通常已经就绪
+        self.presynthesize_voice(character.name, public_speech)
+
+        return {
+            "inner_decision": inner_decision,
+            "public_speech": public_speech,
+            "ai_call_ids": speech_ai_call_ids,
+            "log_version": log_version
+        }
+
+    def commit_speech(self, character, speech, alive_characters):
+        """
+        把生成好的发言写入游戏日志和角色记忆，并通知前端
+
+        Args:
+            character: 角色对象
+            speech (dict): prepare_speech返回的发言数据
+            alive_characters: 存活角色列表
+        """
+        public_speech = speech["public_speech"]
+
+        # 将内心决策记录为内心想法
+        if speech["inner_decision"]:
+            character.add_inner_thought(
+                f"讨论前的内心分析：{speech['inner_decision']}",
+                self.game.current_day,
+                "discussion",
+                "pre_speech_analysis"
+            )
+
+        # 记录角色发言到游戏日志（公开发言），关联AI调用记录
+        self.game.log(character.name, public_speech, message_type="public_statement", ai_call_ids=speech["ai_call_ids"])
+        self.emit_game_update(f"{character.name}发言: {public_speech}")
+
+        # 通知前端播放语音
+        self.emit_voice_play(character.name, public_speech)
+
+        # 更新角色记忆
+        MemoryManager.update_discussion_memory(character, self.game, public_speech, alive_characters)
+
+        # 为其他角色添加观察记录
+        self.game.events.broadcast(
+            f"{character.name}说：{public_speech}",
+            self.game.current_day,
+            "discussion",
+            alive_characters,
+            actor=character
+        )
+
+    async def generate_inner_decision(self, character, context, alive_characters, ai_client):
         """
         生成角色的内心决策分析
         
@@ -660,39 +983,26 @@ class GameEngine:
             ai_client: AI客户端
             
         Returns:
-            str: 内心决策分析结果
+            str: 内心决策分析结果，生成失败时返回None
         """
-        # 获取角色特定的内心决策指导
-        role_inner_guidance = ROLE_INNER_DECISION_GUIDANCE.get(character.role, ROLE_INNER_DECISION_GUIDANCE["villager"])
-        
-        # 构建内心决策提示词
-        inner_prompt = DISCUSSION_INNER_DECISION_TEMPLATE.format(
+        # 构建内心决策提示词，角色特定的内心决策指导按提示词布局放入系统提示词或用户提示词
+        inner_prompt = render_prompt(
+            "inner_decision", character,
             day=self.game.current_day,
             alive_players=', '.join([c.name for c in alive_characters]),
             dead_players=', '.join([c.name for c in self.game.characters if not c.alive]),
-            context=context,
-            role_name=character.name,
-            role_inner_guidance=role_inner_guidance
+            context=context
         )
         
         try:
             # 生成内心决策
-            inner_decision = ai_client.generate_response(inner_prompt, character, "inner_decision")
-            
-            # 将内心决策记录为内心想法
-            character.add_inner_thought(
-                f"讨论前的内心分析：{inner_decision}",
-                self.game.current_day,
-                "discussion",
-                "pre_speech_analysis"
-            )
-            
-            return inner_decision
+            # 内心想法在发言提交时才写入记忆，预生成的结果可能被丢弃
+            return await ai_client.generate_response_async(inner_prompt, character, "inner_decision")
         except Exception as e:
-            print(f"生成内心决策失败: {str(e)}")
-            return "（内心分析失败，将基于基础信息发言）"
+            self.logger.error("engine.ai", f"生成内心决策失败: {str(e)}")
+            return None
 
-    def generate_public_speech(self, character, context, alive_characters, inner_decision, ai_client):
+    async def generate_public_speech(self, character, context, alive_characters, inner_decision, ai_client, stream=True):
         """
         基于内心决策生成公开发言
         
@@ -702,31 +1012,35 @@ class GameEngine:
             alive_characters: 存活角色列表
             inner_decision: 内心决策分析结果
             ai_client: AI客户端
+            stream (bool, optional): 是否向前端流式推送发言. 默认为True.
             
         Returns:
             str: 公开发言内容
         """
-        # 获取角色特定的讨论指导
-        role_guidance = ROLE_DISCUSSION_GUIDANCE.get(character.role, ROLE_DISCUSSION_GUIDANCE["villager"])
-        
-        # 构建内心决策摘要（截取关键部分，避免提示词过长）
-        inner_decision_summary = f"你的内心分析要点：\n{inner_decision[:500]}{'...' if len(inner_decision) > 500 else ''}"
+        # 构建内心决策摘要（按token预算截取开头的要点，避免提示词过长）
+        inner_decision_summary = f"你的内心分析要点：\n{fit_text(inner_decision, INNER_DECISION_TOKENS)}"
         
         # 构建公开发言提示词
-        speech_prompt = DISCUSSION_PUBLIC_SPEECH_TEMPLATE.format(
+        speech_prompt = render_prompt(
+            "public_speech", character,
             inner_decision_summary=inner_decision_summary,
             day=self.game.current_day,
             alive_players=', '.join([c.name for c in alive_characters]),
-            dead_players=', '.join([c.name for c in self.game.characters if not c.alive]),
-            role_specific_guidance=role_guidance
+            dead_players=', '.join([c.name for c in self.game.characters if not c.alive])
         )
         
         try:
-            # 生成公开发言
-            public_speech = ai_client.generate_response(speech_prompt, character, "public_speech")
+            # 生成公开发言；有前端连接时使用流式输出，边生成边推送给前端
+            on_delta = None
+            if stream and self.socketio:
+                speech_id = f"speech_{character.id}_{uuid.uuid4().hex[:8]}"
+                on_delta = lambda delta: self.emit_speech_delta(speech_id, character.name, delta)
+            public_speech = await ai_client.generate_response_async(speech_prompt, character, "public_speech", on_delta=on_delta)
+            if on_delta:
+                self.emit_speech_delta(speech_id, character.name, "", done=True)
             return public_speech
         except Exception as e:
-            print(f"生成公开发言失败: {str(e)}")
+            self.logger.error("engine.ai", f"生成公开发言失败: {str(e)}")
             return "（发言系统故障，无法生成有效发言）"
 
     def handle_vote_phase(self):
@@ -743,36 +1057,36 @@ class GameEngine:
         # 清空投票记录
         self.game.votes = {}
 
-        # 每个角色进行投票
+        # 先为每个投票者构建提示词，投票决策互不依赖，可以并发请求
+        vote_requests = []
+        vote_targets = []
         for voter in alive_characters:
             # 可投票的目标（除了自己）
             targets = [c for c in alive_characters if c.id != voter.id]
+            vote_targets.append(targets)
 
             # 构建角色的上下文信息
             context = self.build_character_context(voter)
 
-            # 获取角色特定的投票指导
-            role_guidance = ROLE_VOTE_GUIDANCE.get(voter.role, ROLE_VOTE_GUIDANCE["villager"])
-
-            # 使用新的提示词模板
-            prompt = VOTE_TEMPLATE.format(
+            # 使用新的提示词模板，角色特定的投票指导按提示词布局放入系统提示词或用户提示词
+            prompt = render_prompt(
+                "vote", voter,
                 day=self.game.current_day,
                 alive_players=', '.join([c.name for c in alive_characters]),
                 targets=', '.join([c.name for c in targets]),
-                context=context,
-                role_specific_guidance=role_guidance
+                context=context
             )
+            vote_requests.append((voter, prompt, "vote", "vote"))
 
-            try:
-                ai_client = self.ai_clients.get(voter.id)
-                if ai_client:
-                    # 获取AI的投票决策
-                    vote_decision = ai_client.generate_response(prompt, voter, "vote", "vote").strip()
+        vote_results = self.request_ai_decisions(vote_requests)
 
-                    # 获取AI调用记录ID
-                    ai_call_id = None
-                    if hasattr(voter, 'memory') and 'latest_ai_call_id' in voter.memory:
-                        ai_call_id = voter.memory['latest_ai_call_id']
+        # 按座位顺序应用投票结果，保证日志和观察记录的顺序稳定
+        for voter, targets, (vote_decision, ai_call_id, error) in zip(alive_characters, vote_targets, vote_results):
+            try:
+                if error:
+                    raise error
+                if vote_decision is not None:
+                    vote_decision = vote_decision.strip()
 
                     # 解析投票决策，找到对应的目标角色
                     target = None
@@ -784,14 +1098,14 @@ class GameEngine:
                     # 如果无法解析或没有找到匹配的目标，随机选择一个
                     if not target:
                         target = random.choice(targets)
-                        print(f"警告: {voter.name}的投票决策'{vote_decision}'无法解析，随机选择了{target.name}")
+                        self.logger.warning("engine.decision", f"{voter.name}的投票决策'{vote_decision}'无法解析，随机选择了{target.name}")
 
                     # 狼人不应该投票给狼人同伴（除非是为了伪装）
                     if voter.role == "werewolf" and target.role == "werewolf" and random.random() < 0.8:  # 80%的概率阻止狼人互投
                         non_werewolf_targets = [t for t in targets if t.role != "werewolf"]
                         if non_werewolf_targets:
                             target = random.choice(non_werewolf_targets)
-                            print(f"警告: 狼人{voter.name}试图投票给狼人同伴{target.name}，系统调整为投票给{target.name}")
+                            self.logger.warning("engine.decision", f"狼人{voter.name}试图投票给狼人同伴{target.name}，系统调整为投票给{target.name}")
 
                     # 记录投票
                     if target.id not in self.game.votes:
@@ -807,16 +1121,16 @@ class GameEngine:
                     MemoryManager.update_vote_memory(voter, self.game, target, simple_reason)
 
                     # 为其他角色添加观察记录（只记录投票行为，不包含理由）
-                    for observer in alive_characters:
-                        if observer.id != voter.id:
-                            observer.add_observation(
-                                f"{voter.name}投票给了{target.name}",
-                                self.game.current_day,
-                                "vote"
-                            )
+                    self.game.events.broadcast(
+                        f"{voter.name}投票给了{target.name}",
+                        self.game.current_day,
+                        "vote",
+                        alive_characters,
+                        actor=voter
+                    )
 
             except Exception as e:
-                print(f"生成投票决策失败: {str(e)}")
+                self.logger.error("engine.ai", f"生成投票决策失败: {str(e)}")
                 # 出错时随机选择
                 target = random.choice(targets)
                 if target.id not in self.game.votes:
@@ -855,12 +1169,12 @@ class GameEngine:
                     self.emit_game_update(f"{voted_character.name}被投票处决，得票{max_votes}票")
 
                 # 为所有角色添加观察记录
-                for character in alive_characters:
-                    character.add_observation(
-                        f"{voted_character.name}被投票处决，得票{max_votes}票",
-                        self.game.current_day,
-                        "vote_result"
-                    )
+                self.game.events.broadcast(
+                    f"{voted_character.name}被投票处决，得票{max_votes}票",
+                    self.game.current_day,
+                    "vote_result",
+                    alive_characters
+                )
 
                 # 如果被处决的是猎人，触发猎人技能
                 if voted_character.role == "hunter":
@@ -881,7 +1195,8 @@ class GameEngine:
         context = self.build_character_context(hunter)
 
         # 使用新的提示词模板
-        prompt = HUNTER_SKILL_TEMPLATE.format(
+        prompt = render_prompt(
+            "hunter_skill", hunter,
             alive_players=', '.join([c.name for c in targets]),
             context=context
         )
@@ -902,19 +1217,92 @@ class GameEngine:
                 # 如果无法解析或没有找到匹配的目标，随机选择一个
                 if not target:
                     target = random.choice(targets)
-                    print(f"警告: {hunter.name}的技能决策'{skill_decision}'无法解析，随机选择了{target.name}")
+                    self.logger.warning("engine.decision", f"{hunter.name}的技能决策'{skill_decision}'无法解析，随机选择了{target.name}")
 
                 target.alive = False
                 self.game.log(hunter.name, f"猎人带走了{target.name}")
                 self.emit_game_update(f"猎人带走了{target.name}")
         except Exception as e:
-            print(f"生成猎人决策失败: {str(e)}")
+            self.logger.error("engine.ai", f"生成猎人决策失败: {str(e)}")
             # 出错时随机选择
             target = random.choice(targets)
             target.alive = False
             self.game.log(hunter.name, f"猎人带走了{target.name}")
             self.emit_game_update(f"猎人带走了{target.name}")
 
+    def request_ai_decision(self, character, prompt, call_type, action_type=None):
+        """
+        同步获取单个角色的AI决策
+
+        Args:
+            character: 角色对象
+            prompt (str): 提示词
+            call_type (str): 调用类型
+            action_type (str, optional): 行为类型. 默认为None.
+
+        Returns:
+            tuple: (决策文本, AI调用记录ID)，角色没有AI客户端时决策文本为None
+        """
+        ai_client = self.ai_clients.get(character.id)
+        if not ai_client:
+            return None, None
+
+        decision = ai_client.generate_response(prompt, character, call_type, action_type)
+        ai_call_id = None
+        if hasattr(character, 'memory') and 'latest_ai_call_id' in character.memory:
+            ai_call_id = character.memory['latest_ai_call_id']
+        return decision, ai_call_id
+
+    def submit_ai_decision(self, character, prompt, call_type, action_type=None):
+        """
+        在线程池中异步发起单个角色的AI决策
+
+        Returns:
+            Future: 结果为(决策文本, AI调用记录ID)
+        """
+        return get_ai_executor().submit(self.request_ai_decision, character, prompt, call_type, action_type)
+
+    def request_ai_decisions(self, decision_requests):
+        """
+        并发获取多个互不依赖的AI决策，结果按请求顺序返回
+
+        每个角色在一批请求中最多出现一次，因此各自的latest_ai_call_id不会互相覆盖。
+
+        Args:
+            decision_requests (list): (角色, 提示词, 调用类型, 行为类型)元组列表
+
+        Returns:
+            list: 与请求顺序一致的(决策文本, AI调用记录ID, 异常)元组列表
+        """
+        if len(decision_requests) <= 1:
+            futures = None
+        else:
+            futures = [self.submit_ai_decision(*request) for request in decision_requests]
+
+        results = []
+        for index, request in enumerate(decision_requests):
+            try:
+                if futures is None:
+                    decision, ai_call_id = self.request_ai_decision(*request)
+                else:
+                    decision, ai_call_id = futures[index].result()
+                results.append((decision, ai_call_id, None))
+            except Exception as e:
+                results.append((None, None, e))
+        return results
+
+    def get_role_inner_guidance(self, role):
+        """
+        获取角色特定的内心决策指导
+
+        Args:
+            role (str): 角色身份
+
+        Returns:
+            str: 内心决策指导
+        """
+        return ROLE_INNER_DECISION_GUIDANCE.get(role, ROLE_INNER_DECISION_GUIDANCE["villager"])
+
     def build_character_context(self, character):
         """
         构建角色的上下文信息
@@ -925,36 +1313,53 @@ class GameEngine:
         Returns:
             str: 角色上下文信息
         """
-        # 基本角色信息
-        context = f"你的角色信息：\n- 姓名：{character.name}\n- 性别：{character.gender}\n- 性格：{character.style}\n"
-
-        # 添加角色特定信息（只有自己知道自己的身份）
-        if character.role == "werewolf":
-            context += ROLE_DESCRIPTIONS["werewolf"] + "\n"
-        elif character.role == "seer":
-            context += ROLE_DESCRIPTIONS["seer"] + "\n"
-        elif character.role == "witch":
-            context += ROLE_DESCRIPTIONS["witch"] + "\n"
-        elif character.role == "guard":
-            context += ROLE_DESCRIPTIONS["guard"] + "\n"
+        # 按角色所用模型的上下文预算组装，各部分按优先级选入，超出预算时截断或丢弃低优先级的部分
+        ai_client = self.ai_clients.get(character.id)
+        budget = ai_client.context_budget() if ai_client else CONTEXT_BUDGET_TOKENS
+        profile = profile_text(character.name, character.gender, character.style)
+        description = role_description(character.role)  # 只有自己知道自己的身份
+        if is_stable_layout():
+            # 角色信息和身份说明已放在系统提示词的固定前缀中，这里只扣除它们占用的预算
+            builder = ContextBuilder(max(0, budget - estimate_tokens(profile + description)))
         else:
-            context += ROLE_DESCRIPTIONS["villager"] + "\n"
+            builder = ContextBuilder(budget)
+            builder.add("profile", profile, 100, required=True)
+            builder.add("role", description, 90, required=True)
 
         # 添加角色特定的上下文信息
         role_context = MemoryManager.get_role_specific_context(character, self.game)
-        if role_context:
-            context += role_context
+        builder.add("role_context", role_context, 80, keep="head")
 
         # 添加角色记忆摘要（只包含自己的观察和决策）
         memory_summary = character.get_memory_summary()
         if memory_summary:
-            context += f"\n你的记忆：\n{memory_summary}\n"
+            builder.add("memory", f"\n你的记忆：\n{memory_summary}\n", 60, keep="head", header="\n你的记忆：\n")
 
-        # 添加公开信息（根据角色身份决定能看到的信息）
-        context += self.get_character_visible_context(character)
+        # 添加公开信息（根据角色身份决定能看到的信息），放不下时保留最近的日志
+        builder.add("history", self.get_character_visible_context(character), 70, keep="tail", header="\n游戏历史：\n")
 
+        context, report = builder.build()
+        self._record_context_report(character, report)
         return context
 
+    def _record_context_report(self, character, report):
+        """
+        记录上下文组装报告，有内容被截断或丢弃时打印
+
+        Args:
+            character: 角色对象
+            report (dict): ContextBuilder.build返回的报告
+        """
+        self.context_reports[character.name] = report
+        self.context_stats["built"] += 1
+        self.context_stats["tokens"] += report["tokens"]
+        self.context_stats["truncated"] += int(bool(report["truncated"]))
+        self.context_stats["dropped"] += int(bool(report["dropped"]))
+        if report["truncated"] or report["dropped"]:
+            self.logger.warning("engine.context", "{character}的上下文超出预算({tokens}/{budget} tokens)，截断: {truncated}，丢弃: {dropped}",
+                                character=character.name, tokens=report["tokens"], budget=report["budget"],
+                                truncated=report["truncated"], dropped=report["dropped"])
+
     def emit_game_update(self, message):
         """
         发送游戏更新消息
@@ -962,11 +1367,77 @@ class GameEngine:
         Args:
             message (str): 更新消息
         """
+        if self.headless:
+            return
         if self.socketio:
-            game_state = self.game.to_dict()
-            game_state["message"] = message
-            self.socketio.emit('game_update', game_state)
-        print(f"游戏更新: {message}")
+            with metrics.timer("werewolf_game_update_seconds", stage="build"):
+                delta = self.build_game_delta(message)
+            with metrics.timer("werewolf_game_update_seconds", stage="emit"):
+                self.socketio.emit('game_update', delta, room=self.room)
+        self.logger.info("game.update", "游戏更新: {message}", message=message)
+
+    def build_game_delta(self, message):
+        """
+        构造增量游戏更新：只包含上次推送之后新增的日志和发生变化的角色，
+        客户端发现序号不连续时通过get_game_state获取快照重新同步
+
+        Args:
+            message (str): 更新消息
+
+        Returns:
+            dict: 增量更新，字段包括:
+                - game_id: 游戏ID，客户端丢弃不属于当前游戏的更新
+                - seq: 更新序号，每次推送加1
+                - log_offset: new_logs中第一条日志在完整日志中的位置，客户端先截断到该位置再追加
+                - new_logs: 新增的日志
+                - character_changes: 字段发生变化的角色；角色列表本身变化时改为完整的characters
+        """
+        with self.update_lock:
+            self.update_seq += 1
+            logs = self.game.logs
+            # 游戏重置后日志变短，从头重新推送
+            log_offset = self.sent_log_count if self.sent_log_count <= len(logs) else 0
+            characters = [c.to_dict() for c in self.game.characters]
+
+            delta = {
+                "game_id": self.game.id,
+                "seq": self.update_seq,
+                "message": message,
+                "status": self.game.status.value,
+                "phase": self.game.phase.value,
+                "current_day": self.game.current_day,
+                "winner": self.game.winner,
+                "log_offset": log_offset,
+                "new_logs": to_dicts(logs[log_offset:])
+            }
+            if [c["id"] for c in characters] != list(self.sent_characters):
+                delta["characters"] = characters
+            else:
+                delta["character_changes"] = [c for c in characters if self.sent_characters[c["id"]] != c]
+
+            self.sent_log_count = len(logs)
+            self.sent_characters = {c["id"]: c for c in characters}
+            return delta
+
+    def emit_speech_delta(self, speech_id, character_name, delta, done=False):
+        """
+        推送流式发言的增量文本，完整发言仍由game_update写入日志
+
+        Args:
+            speech_id (str): 本次发言的ID
+            character_name (str): 角色名称
+            delta (str): 新生成的文本
+            done (bool, optional): 发言是否生成完毕. 默认为False.
+        """
+        if self.headless or not self.socketio:
+            return
+        self.socketio.emit('speech_delta', {
+            "game_id": self.game.id,
+            "speech_id": speech_id,
+            "character": character_name,
+            "delta": delta,
+            "done": done
+        }, room=self.room)
 
     def emit_voice_play(self, character_name, text):
         """
@@ -976,14 +1447,37 @@ class GameEngine:
             character_name (str): 角色名称
             text (str): 要播放的文本
         """
+        if self.headless:
+            return
         if self.socketio:
             voice_data = {
                 "character": character_name,
                 "text": text,
                 "message_id": f"voice_{character_name}_{int(time.time())}"
             }
-            self.socketio.emit('voice_play', voice_data)
-        print(f"语音播放: {character_name} - {text[:50]}...")
+            voice_data.update(self.presynthesize_voice(character_name, text))
+            self.socketio.emit('voice_play', voice_data, room=self.room)
+        self.logger.info("voice.play", "语音播放: {character} - {text:.50}...", character=character_name, text=text)
+
+    def presynthesize_voice(self, character_name, text):
+        """
+        提交语音预合成，同一段语音只合成一次
+
+        Args:
+            character_name (str): 角色名称
+            text (str): 要合成的文本
+
+        Returns:
+            dict: voice_play消息的音频字段（audio_url和audio_mimetype），无头模式、未配置语音合成或提交失败时为空
+        """
+        if self.headless or self.voice_synthesizer is None or not text:
+            return {}
+        try:
+            key = self.voice_synthesizer.presynthesize(text, character_name)
+            return {"audio_url": self.voice_synthesizer.audio_url(key), "audio_mimetype": mimetype_for(key)}
+        except Exception as e:
+            self.logger.warning("voice.presynthesize", f"提交语音预合成失败: {str(e)}", character=character_name)
+            return {}
 
     async def wait_for_voice_completion(self, character_name):
         """
@@ -995,14 +1489,18 @@ class GameEngine:
         # 使用事件等待机制，等待语音播放完成
         self.voice_completion_event = asyncio.Event()
         self.expected_voice_completion = character_name
+        start = time.perf_counter()
+        outcome = "completed"
         
         try:
             # 等待语音完成事件，最多等待10秒
             await asyncio.wait_for(self.voice_completion_event.wait(), timeout=10.0)
-            print(f"{character_name}的语音播放完成，继续下一个角色")
+            self.logger.info("voice.wait", "{character}的语音播放完成，继续下一个角色", character=character_name)
         except asyncio.TimeoutError:
-            print(f"{character_name}的语音播放超时，继续下一个角色")
+            outcome = "timeout"
+            self.logger.warning("voice.wait", "{character}的语音播放超时，继续下一个角色", character=character_name)
         finally:
+            metrics.observe("werewolf_voice_wait_seconds", time.perf_counter() - start, outcome=outcome)
             self.voice_completion_event = None
             self.expected_voice_completion = None
 
@@ -1016,17 +1514,61 @@ class GameEngine:
         """
         if (self.voice_completion_event and 
             self.expected_voice_completion == character_name):
-            print(f"收到{character_name}的语音完成确认")
+            self.logger.info("voice.completed", "收到{character}的语音完成确认", character=character_name)
             self.voice_completion_event.set()
 
     def get_game_state(self):
         """
-        获取当前游戏状态
+        获取当前游戏状态快照
+
+        Returns:
+            dict: 游戏状态字典，game_id为游戏ID，seq为快照对应的最近一次game_update序号
+        """
+        with self.update_lock:
+            game_state = self.game.to_dict()
+            game_state["game_id"] = self.game.id
+            game_state["seq"] = self.update_seq
+            return game_state
+
+    def get_game_summary(self):
+        """
+        获取游戏结果摘要，用于批量模拟统计
 
         Returns:
-            dict: 游戏状态字典
+            dict: 包含获胜阵营、天数、死亡角色和AI调用统计的字典
         """
-        return self.game.to_dict()
+        ai_calls = {}
+        for character in self.game.characters:
+            ai_client = self.ai_clients.get(character.id)
+            if not ai_client:
+                continue
+            stats = ai_calls.setdefault(character.model, {"total": 0, "success": 0, "error": 0})
+            for key, value in ai_client.call_stats.items():
+                stats[key] = stats.get(key, 0) + value
+            for key, value in ai_client.token_stats.items():
+                stats[key] = stats.get(key, 0) + value
+
+        return {
+            "winner": self.game.winner,
+            "days": self.game.current_day,
+            "characters": [
+                {
+                    "name": c.name,
+                    "role": c.role,
+                    "model": c.model,
+                    "alive": c.alive
+                }
+                for c in self.game.characters
+            ],
+            "deaths": [
+                {"name": c.name, "role": c.role, "model": c.model}
+                for c in self.game.characters if not c.alive
+            ],
+            "ai_calls": ai_calls,
+            "discussion": dict(self.discussion_stats),
+            "memory": self.memory_summarizer.get_stats() if self.memory_summarizer else {},
+            "context": dict(self.context_stats)
+        }
 
     def get_character_visible_context(self, character):
         """
@@ -1040,10 +1582,9 @@ class GameEngine:
         """
         context = "\n游戏历史：\n"
 
-        for log in self.game.logs[-15:]:
-            # 根据角色身份和日志类型决定是否可见
-            if self.is_log_visible_to_character(log, character):
-                context += f"- {log['source']}：{log['message']}\n"
+        # 按角色身份读取对应的日志索引，不再逐条判断可见性
+        for log in self.game.get_visible_logs(character):
+            context += f"- {log['source']}：{log['message']}\n"
 
         return context
 
@@ -1058,34 +1599,9 @@ class GameEngine:
         Returns:
             bool: 是否可见
         """
-        # 如果是公开日志，所有人都能看到
-        if log.get("is_public", True):
-            return True
-
-        # 如果是私有日志，只有特定角色能看到
-        log_phase = log.get("phase", "")
-        log_source = log.get("source", "")
-
-        # 狼人可以看到其他狼人的行动
-        if character.role == "werewolf" and log_phase == "werewolf":
-            return True
-
-        # 预言家只能看到自己的查验结果
-        if character.role == "seer" and log_phase == "seer" and log_source == character.name:
-            return True
-
-        # 女巫只能看到自己的行动
-        if character.role == "witch" and log_phase == "witch" and log_source == character.name:
-            return True
-
-        # 守卫只能看到自己的行动
-        if character.role == "guard" and log_phase == "guard" and log_source == character.name:
-            return True
-
-        # 其他情况都不可见
-        return False
+        return bool(set(Game.log_audiences(log)) & set(Game.character_audiences(character)))
 
-    def handle_pk_phase(self):
+    async def handle_pk_phase(self):
         """处理PK发言阶段"""
         self.game.log("系统", "开始PK发言")
         self.emit_game_update("开始PK发言")
@@ -1115,15 +1631,14 @@ class GameEngine:
                 
             try:
                 # 使用PK发言模板
-                from backend.utils.prompt_templates import PK_SPEECH_TEMPLATE
-                prompt = PK_SPEECH_TEMPLATE.format(
+                prompt = render_prompt(
+                    "pk_speech", character,
                     alive_players=", ".join([c.name for c in alive_characters]),
-                    context=context,
-                    role_inner_guidance=self.get_role_inner_guidance(character.role)
+                    context=context
                 )
                 
-                ai_call_id = ai_client.generate_response(prompt, character, "pk_speech")
-                speech = ai_client.generate_response(prompt, character, "pk_speech", ai_call_id).strip()
+                speech, ai_call_id = self.request_ai_decision(character, prompt, "pk_speech", "pk_speech")
+                speech = speech.strip()
                 
                 # 记录发言，关联AI调用记录
                 ai_call_ids = [ai_call_id] if ai_call_id else []
@@ -1137,10 +1652,10 @@ class GameEngine:
                 MemoryManager.add_character_statement(character, speech, self.game)
                 
                 # 发言间隔
-                time.sleep(8)
+                await self.pause(8)
                 
             except Exception as e:
-                print(f"生成{character.name}的PK发言失败: {str(e)}")
+                self.logger.error("engine.ai", f"生成{character.name}的PK发言失败: {str(e)}")
                 fallback_speech = f"我是{character.name}，请大家相信我。"
                 self.game.log(character.name, fallback_speech, "pk", True, "speech")
                 self.emit_game_update(f"{character.name}发言: {fallback_speech}")
@@ -1192,29 +1707,31 @@ class GameEngine:
             self.game.log("系统", "没有有效PK候选人")
             return
         
-        # 每个投票者进行投票（除PK候选人外）
+        # 每个投票者进行投票（除PK候选人外），决策互不依赖，并发请求
+        voters = [voter for voter in voters if self.ai_clients.get(voter.id)]
+        revote_requests = []
         for voter in voters:
             # 构建角色的上下文信息
             context = self.build_character_context(voter)
-            
-            # 生成AI投票决策
-            ai_client = self.ai_clients.get(voter.id)
-            if not ai_client:
-                continue
-                
+
+            # 使用重新投票模板
+            prompt = render_prompt(
+                "revote", voter,
+                alive_players=", ".join([c.name for c in alive_characters]),
+                targets=", ".join([t.name for t in targets]),
+                context=context
+            )
+            revote_requests.append((voter, prompt, "revote", "revote"))
+
+        revote_results = self.request_ai_decisions(revote_requests)
+
+        # 按座位顺序应用投票结果
+        for voter, (vote_decision, ai_call_id, error) in zip(voters, revote_results):
             try:
-                # 使用重新投票模板
-                from backend.utils.prompt_templates import REVOTE_TEMPLATE
-                prompt = REVOTE_TEMPLATE.format(
-                    alive_players=", ".join([c.name for c in alive_characters]),
-                    targets=", ".join([t.name for t in targets]),
-                    context=context,
-                    role_inner_guidance=self.get_role_inner_guidance(voter.role)
-                )
-                
-                ai_call_id = ai_client.generate_response(prompt, voter, "revote")
-                vote_decision = ai_client.generate_response(prompt, voter, "revote", ai_call_id).strip()
-                
+                if error:
+                    raise error
+                vote_decision = vote_decision.strip()
+
                 # 解析投票决策
                 target = None
                 for t in targets:
@@ -1225,7 +1742,7 @@ class GameEngine:
                 # 如果无法解析，随机选择
                 if not target:
                     target = random.choice(targets)
-                    print(f"警告: {voter.name}的重新投票决策'{vote_decision}'无法解析，随机选择了{target.name}")
+                    self.logger.warning("engine.decision", f"{voter.name}的重新投票决策'{vote_decision}'无法解析，随机选择了{target.name}")
                 
                 # 记录投票
                 if target.id not in self.game.revotes:
@@ -1238,7 +1755,7 @@ class GameEngine:
                 self.emit_game_update(f"{voter.name}投票给了{target.name}")
                 
             except Exception as e:
-                print(f"生成{voter.name}的重新投票决策失败: {str(e)}")
+                self.logger.error("engine.ai", f"生成{voter.name}的重新投票决策失败: {str(e)}")
                 # 出错时随机投票
                 target = random.choice(targets)
                 if target.id not in self.game.revotes:
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+游戏注册表
+一个服务进程同时托管多局游戏：按游戏ID管理GameEngine实例，所有游戏循环在有界线程池中运行，
+结束超过TTL的游戏会被自动清理
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.models.game_engine import GameEngine
+from backend.utils.logger import get_logger
+from backend.utils.ai_call_manager import ai_call_manager
+
+logger = get_logger()
+
+
+class GameRegistry:
+    """游戏注册表"""
+
+    def __init__(self, socketio=None, max_workers=None, ttl=None, voice_synthesizer=None):
+        """
+        初始化游戏注册表
+
+        Args:
+            socketio: SocketIO实例，每局游戏只向以游戏ID命名的房间推送消息
+            max_workers (int, optional): 同时运行的游戏循环数量上限，超出的游戏排队等待. 默认读取GAME_MAX_WORKERS环境变量.
+            ttl (float, optional): 游戏结束后保留的秒数. 默认读取GAME_TTL环境变量.
+            voice_synthesizer (optional): 语音预合成客户端，注入到非无头模式的游戏中. 默认为None.
+        """
+        self.socketio = socketio
+        self.voice_synthesizer = voice_synthesizer
+        self.max_workers = max_workers or int(os.getenv("GAME_MAX_WORKERS", "8"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("GAME_TTL", "3600"))
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="game-loop")
+        self.lock = threading.Lock()
+        self.games = {}
+
+    def create_game(self, characters_data, client_factory=None, headless=False):
+        """
+        创建一局新游戏并加载角色
+
+        Args:
+            characters_data (list): 与config/characters.json格式相同的角色字典列表
+            client_factory (callable, optional): 根据模型名称创建AI客户端的函数. 默认为get_ai_client.
+            headless (bool, optional): 是否以无头模式运行（不推送、不等待语音）. 默认为False.
+
+        Returns:
+            GameEngine: 新建的游戏引擎
+        """
+        self.evict_expired()
+
+        engine = GameEngine(self.socketio, headless=headless)
+        engine.room = engine.game.id
+        engine.executor = self.executor
+        engine.voice_synthesizer = self.voice_synthesizer
+        if not engine.load_characters(characters_data, client_factory):
+            raise ValueError("加载角色配置失败")
+
+        with self.lock:
+            self.games[engine.game.id] = engine
+        logger.info("registry.create", "创建游戏: {game_id}", game_id=engine.game.id)
+        return engine
+
+    def get_game(self, game_id):
+        """
+        获取游戏引擎
+
+        Args:
+            game_id (str): 游戏ID
+
+        Returns:
+            GameEngine: 游戏引擎，不存在时返回None
+        """
+        with self.lock:
+            return self.games.get(game_id)
+
+    def list_games(self):
+        """
+        列出所有游戏的概要信息
+
+        Returns:
+            list: 游戏概要字典列表，按创建时间排序
+        """
+        self.evict_expired()
+        with self.lock:
+            engines = sorted(self.games.values(), key=lambda e: e.created_at)
+
+        return [
+            {
+                "id": engine.game.id,
+                "status": engine.game.status.value,
+                "phase": engine.game.phase.value,
+                "current_day": engine.game.current_day,
+                "winner": engine.game.winner,
+                "players": len(engine.game.characters),
+                "alive": len(engine.game.get_alive_characters()),
+                "created_at": engine.created_at,
+                "finished_at": engine.finished_at
+            }
+            for engine in engines
+        ]
+
+    def delete_game(self, game_id):
+        """
+        停止并删除游戏
+
+        Args:
+            game_id (str): 游戏ID
+
+        Returns:
+            bool: 是否删除成功
+        """
+        with self.lock:
+            engine = self.games.pop(game_id, None)
+        if not engine:
+            return False
+
+        # 游戏循环在当前阶段结束后退出
+        engine.running = False
+        ai_call_manager.clear_records(game_id=game_id)
+        logger.info("registry.delete", "删除游戏: {game_id}", game_id=game_id)
+        return True
+
+    def evict_expired(self, now=None):
+        """
+        清理结束时间超过TTL的游戏
+
+        Args:
+            now (float, optional): 当前时间戳. 默认为time.time().
+
+        Returns:
+            list: 被清理的游戏ID列表
+        """
+        now = now or time.time()
+        with self.lock:
+            expired = [
+                game_id for game_id, engine in self.games.items()
+                if engine.finished_at and now - engine.finished_at > self.ttl
+            ]
+            for game_id in expired:
+                del self.games[game_id]
+
+        for game_id in expired:
+            ai_call_manager.clear_records(game_id=game_id)
+            logger.info("registry.expire", "游戏已过期，清理: {game_id}", game_id=game_id)
+        return expired
+
+    def get_stats(self):
+        """
+        获取注册表统计
+
+        Returns:
+            dict: 各状态的游戏数量和线程池大小
+        """
+        with self.lock:
+            statuses = [engine.game.status.value for engine in self.games.values()]
+        return {
+            "games": len(statuses),
+            "by_status": {status: statuses.count(status) for status in set(statuses)},
+            "max_workers": self.max_workers,
+            "ttl": self.ttl
+        }
+
+    def shutdown(self):
+        """停止所有游戏并关闭线程池"""
+        with self.lock:
+            game_ids = list(self.games)
+        for game_id in game_ids:
+            self.delete_game(game_id)
+        self.executor.shutdown(wait=False)
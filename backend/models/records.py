@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+紧凑记录类型
+游戏日志、角色记忆和AI调用记录数量巨大，使用__slots__类代替字典：
+时间戳以数字形式保存，读取timestamp字段时才格式化；阶段和类型等取值有限的字符串统一驻留，
+所有记录共享同一个字符串对象。记录支持按键读取（record["day"]、record.get("phase")），
+需要序列化时调用to_dict
+"""
+
+import sys
+import time
+from datetime import datetime
+
+
+def _intern(value):
+    """驻留取值有限的字符串字段"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Record:
+    """记录基类，子类通过__slots__声明字段，FIELDS声明序列化字段及顺序"""
+
+    __slots__ = ("created_at",)
+    FIELDS = ()
+    INTERNED = ()
+
+    def __init__(self, *values, created_at=None, **fields):
+        """
+        初始化记录
+
+        Args:
+            *values: 按__slots__顺序给出的字段值
+            created_at (float, optional): 创建时间戳. 默认为当前时间.
+            **fields: 按名称给出的字段值
+        """
+        self.created_at = created_at or time.time()
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+        for name, value in fields.items():
+            setattr(self, name, value)
+        for name in self.INTERNED:
+            setattr(self, name, _intern(getattr(self, name)))
+
+    @property
+    def timestamp(self):
+        """格式化的创建时间"""
+        return datetime.fromtimestamp(self.created_at).strftime("%Y-%m-%d %H:%M:%S")
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def get(self, key, default=None):
+        """与dict.get相同"""
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def keys(self):
+        """字段名称"""
+        return self.FIELDS
+
+    def to_dict(self):
+        """
+        转换为字典
+
+        Returns:
+            dict: 与原字典格式相同的记录
+        """
+        return {key: getattr(self, key) for key in self.FIELDS}
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return type(self) is type(other) and self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = object.__hash__
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+def to_dicts(records):
+    """
+    把记录列表转换为字典列表
+
+    Args:
+        records (list): 记录列表
+
+    Returns:
+        list: 字典列表
+    """
+    return [record.to_dict() for record in records]
+
+
+class LogEntry(Record):
+    """游戏日志"""
+
+    __slots__ = ("day", "phase", "source", "message", "is_public", "message_type", "ai_call_ids")
+    FIELDS = ("timestamp",) + __slots__
+    INTERNED = ("phase", "source", "message_type")
+
+
+class Observation(Record):
+    """角色观察到的事件"""
+
+    __slots__ = ("event", "day", "phase")
+    FIELDS = __slots__ + ("timestamp",)
+    INTERNED = ("phase",)
+
+
+class Statement(Record):
+    """角色的公开言论"""
+
+    __slots__ = ("content", "day", "phase")
+    FIELDS = __slots__ + ("timestamp",)
+    INTERNED = ("phase",)
+
+
+class InnerThought(Record):
+    """角色的内心想法"""
+
+    __slots__ = ("content", "day", "phase", "type")
+    FIELDS = __slots__ + ("timestamp",)
+    INTERNED = ("phase", "type")
+
+
+class Decision(Record):
+    """角色做出的决策"""
+
+    __slots__ = ("type", "target", "reason", "day", "phase")
+    FIELDS = __slots__ + ("timestamp",)
+    INTERNED = ("type", "phase")
+
+
+class Belief(Record):
+    """角色对其他角色的看法"""
+
+    __slots__ = ("belief", "confidence")
+    FIELDS = __slots__ + ("timestamp",)
+
+
+class HistoryEntry(Record):
+    """角色行为历史"""
+
+    __slots__ = ("action", "target", "result")
+    FIELDS = __slots__ + ("timestamp",)
+
+
+class AICallRecord(Record):
+    """AI调用记录，提示词只保存引用，序列化时才组装成input字典"""
+
+    __slots__ = ("call_id", "model", "call_type", "action_type", "system_prompt", "user_prompt",
+                 "output", "character", "role", "status", "cached")
+    FIELDS = ("call_id", "timestamp", "model", "call_type", "action_type", "input",
+              "output", "character", "role", "status", "cached")
+    INTERNED = ("model", "call_type", "action_type", "role", "status")
+
+    @property
+    def input(self):
+        """调用输入"""
+        return {"system_prompt": self.system_prompt, "user_prompt": self.user_prompt}
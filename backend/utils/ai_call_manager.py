@@ -3,9 +3,11 @@
 
 """
 AI调用记录管理器
-用于管理所有角色的AI调用记录，独立于角色记忆系统
+用于管理所有角色的AI调用记录，独立于角色记忆系统；记录按（游戏、角色）区分，同时进行的多局游戏中的同名角色互不干扰
 """
 
+import threading
+
 class AICallManager:
     """AI调用记录管理器，单例模式"""
     
@@ -14,66 +16,75 @@ class AICallManager:
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(AICallManager, cls).__new__(cls)
+            # (游戏ID, 角色名称) -> AI调用记录列表
             cls._instance.ai_call_records = {}
+            cls._instance.lock = threading.Lock()
         return cls._instance
     
-    def get_ai_calls_by_ids(self, character_name, call_ids):
+    def get_ai_calls_by_ids(self, character_name, call_ids, game_id=None):
         """
         根据调用ID获取AI调用记录
         
         Args:
             character_name: 角色名称
             call_ids: AI调用记录ID列表
+            game_id: 游戏ID（即游戏的Socket.IO房间），默认为None
             
         Returns:
             list: AI调用记录列表
         """
-        if character_name not in self.ai_call_records:
-            return []
-        
-        character_calls = self.ai_call_records[character_name]
-        return [call for call in character_calls if call["call_id"] in call_ids]
+        with self.lock:
+            character_calls = self.ai_call_records.get((game_id, character_name), [])
+            return [call for call in character_calls if call["call_id"] in call_ids]
     
-    def get_all_ai_calls(self, character_name):
+    def get_all_ai_calls(self, character_name, game_id=None):
         """
         获取角色的所有AI调用记录
         
         Args:
             character_name: 角色名称
+            game_id: 游戏ID（即游戏的Socket.IO房间），默认为None
             
         Returns:
             list: AI调用记录列表
         """
-        return self.ai_call_records.get(character_name, [])
+        with self.lock:
+            return list(self.ai_call_records.get((game_id, character_name), []))
     
-    def add_ai_call_record(self, character_name, record):
+    def add_ai_call_record(self, character_name, record, game_id=None):
         """
         添加AI调用记录
         
         Args:
             character_name: 角色名称
             record: AI调用记录
+            game_id: 游戏ID（即游戏的Socket.IO房间），默认为None
         """
-        if character_name not in self.ai_call_records:
-            self.ai_call_records[character_name] = []
-        
-        self.ai_call_records[character_name].append(record)
-        
-        # 只保留最近30次调用记录
-        if len(self.ai_call_records[character_name]) > 30:
-            self.ai_call_records[character_name] = self.ai_call_records[character_name][-30:]
+        key = (game_id, character_name)
+        with self.lock:
+            records = self.ai_call_records.setdefault(key, [])
+            records.append(record)
+            
+            # 只保留最近30次调用记录
+            if len(records) > 30:
+                self.ai_call_records[key] = records[-30:]
     
-    def clear_records(self, character_name=None):
+    def clear_records(self, character_name=None, game_id=None):
         """
         清空AI调用记录
         
         Args:
-            character_name: 角色名称，如果为None则清空所有记录
+            character_name: 角色名称，如果为None则清空该局游戏的所有记录
+            game_id: 游戏ID，与character_name都为None时清空所有记录
         """
-        if character_name is None:
-            self.ai_call_records.clear()
-        else:
-            self.ai_call_records.pop(character_name, None)
+        with self.lock:
+            if character_name is None and game_id is None:
+                self.ai_call_records.clear()
+            elif character_name is None:
+                for key in [key for key in self.ai_call_records if key[0] == game_id]:
+                    del self.ai_call_records[key]
+            else:
+                self.ai_call_records.pop((game_id, character_name), None)
 
 # 全局实例
 ai_call_manager = AICallManager()
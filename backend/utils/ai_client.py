@@ -3,38 +3,412 @@
 
 import os
 import json
-import requests
+import time
 import uuid
+import asyncio
+import threading
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from openai import OpenAI
+from backend.models.records import AICallRecord
 from backend.utils.ai_call_manager import ai_call_manager
+from backend.utils.http_pool import get_session, get_openai_client
+from backend.utils.response_cache import response_cache, make_cache_key
+from backend.utils.rate_limiter import rate_limiter_registry
+from backend.utils.resilience import resilience_policy
+from backend.utils.context_builder import CONTEXT_BUDGET_TOKENS
+from backend.utils.prompt_layout import is_stable_layout, static_prefix
+from backend.utils.metrics import metrics
+from backend.utils.logger import get_logger
 
 # 加载环境变量
 load_dotenv()
 
+# generate_response_async使用的线程池，阻塞的HTTP调用在这里执行，不占用事件循环
+AI_ASYNC_WORKERS = int(os.getenv("AI_ASYNC_WORKERS", "32"))
+_async_executor = ThreadPoolExecutor(max_workers=AI_ASYNC_WORKERS, thread_name_prefix="ai-async")
+
+
+def _reset_async_executor_after_fork():
+    """fork出的子进程不会继承线程，需要重新创建线程池"""
+    global _async_executor
+    _async_executor = ThreadPoolExecutor(max_workers=AI_ASYNC_WORKERS, thread_name_prefix="ai-async")
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_async_executor_after_fork)
+
+# 当前线程正在进行的一次请求尝试的token用量；重试和对冲的每次尝试各自累计，只有最终采用的尝试计入统计
+_attempt_usage = threading.local()
+
+
+def dashscope_delta(event):
+    """
+    解析阿里百炼增量输出事件中的文本
+
+    Args:
+        event (dict): SSE事件数据
+
+    Returns:
+        str: 新增文本
+    """
+    if "output" not in event:
+        raise Exception(f"API返回错误: {event.get('message', '未知错误')}")
+    choices = event["output"].get("choices", [])
+    if choices:
+        return choices[0].get("message", {}).get("content", "")
+    return event["output"].get("text", "")
+
+
+def openai_delta(event):
+    """
+    解析OpenAI格式流式事件中的文本
+
+    Args:
+        event (dict): SSE事件数据
+
+    Returns:
+        str: 新增文本
+    """
+    choices = event.get("choices") or [{}]
+    return choices[0].get("delta", {}).get("content") or ""
+
+
+def parse_usage(usage):
+    """
+    读取响应usage字段中的输入、前缀缓存命中和输出token数，
+    兼容阿里百炼（input_tokens）、OpenAI/方舟（prompt_tokens_details.cached_tokens）和DeepSeek（prompt_cache_hit_tokens）
+
+    Args:
+        usage: usage字段，可以是字典或OpenAI SDK的对象
+
+    Returns:
+        dict: input_tokens、cached_tokens和output_tokens，usage为空时返回None
+    """
+    if not usage:
+        return None
+    if not isinstance(usage, dict):
+        usage = usage.model_dump() if hasattr(usage, "model_dump") else vars(usage)
+    details = usage.get("prompt_tokens_details") or {}
+    return {
+        "input_tokens": usage.get("input_tokens") or usage.get("prompt_tokens") or 0,
+        "cached_tokens": details.get("cached_tokens") or usage.get("prompt_cache_hit_tokens") or 0,
+        "output_tokens": usage.get("output_tokens") or usage.get("completion_tokens") or 0
+    }
+
+
+class StreamInterruptedError(Exception):
+    """流式输出在推送部分内容后中断，不能再重试（前端已经收到了部分增量）"""
+
+
+def iter_sse_data(response):
+    """
+    逐条读取Server-Sent Events响应中的data字段
+
+    Args:
+        response (requests.Response): 以stream=True发起的响应
+
+    Yields:
+        str: 每个事件的data内容
+    """
+    # SSE响应通常不声明字符集，requests会按ISO-8859-1解码，这里强制使用UTF-8
+    response.encoding = 'utf-8'
+    for line in response.iter_lines(decode_unicode=True):
+        if line and line.startswith("data:"):
+            yield line[5:].strip()
+
 class AIClient:
     """AI模型客户端基类"""
 
+    # 服务名称，用于错误日志
+    service_name = "AI"
+    # 服务商标识，与模型名称一起决定共享的限流器
+    provider = "generic"
+    # 调用失败时返回的兜底发言
+    fallback_text = "我认为我们应该仔细分析每个人的发言..."
+    # 模型上下文窗口和单次输出上限（token）
+    context_window = 8192
+    max_output_tokens = 500
+    # 后台调用类型：在游戏循环之外执行（如记忆整理），不覆盖角色的latest_ai_call_id，也不推送模型调用状态
+    background_call_types = frozenset({"memory_summary"})
+
     def __init__(self):
         """初始化AI客户端"""
         # 用于存储AI调用记录的独立存储，不放在角色记忆中
         self.ai_call_records = {}
+        # 是否向前端推送模型调用状态（无头模式下关闭）
+        self.emit_status = True
+        # 调用次数统计，用于批量模拟报告
+        self.call_stats = {"total": 0, "success": 0, "error": 0}
+        # 服务端返回的token用量，cached_tokens为命中前缀缓存的输入token数
+        self.token_stats = {"input_tokens": 0, "cached_tokens": 0, "output_tokens": 0}
+        # 调用次数和token用量可能被多个线程同时更新（并发决策、对冲请求、后台记忆整理）
+        self.stats_lock = threading.Lock()
+        self.model_name = "unknown"
+        self.temperature = 0.7
+        # 所属对局ID，限流器据此在多局之间公平调度
+        self.game_id = None
+        # 推送模型调用状态的Socket.IO房间，为None时广播
+        self.room = None
+        # 日志器，游戏引擎加载角色时替换为绑定对局上下文的日志器
+        self.logger = get_logger()
+
+    def output_tokens(self, call_type):
+        """
+        单次调用的输出token上限
+
+        Args:
+            call_type (str): 调用类型
+
+        Returns:
+            int: 输出token上限
+        """
+        return self.max_output_tokens
+
+    def context_budget(self):
+        """
+        角色上下文可用的token预算：不超过CONTEXT_BUDGET_TOKENS，并为输出留出空间
+
+        Returns:
+            int: token预算
+        """
+        return max(0, min(CONTEXT_BUDGET_TOKENS, self.context_window - self.max_output_tokens))
+
+    def build_system_prompt(self, character, call_type="general"):
+        """
+        构建角色的系统提示词；稳定前缀布局下追加角色信息和调用类型的固定指导，
+        同一角色、身份和调用类型的系统提示词逐字节相同，便于服务端前缀缓存命中
+
+        Args:
+            character (Character): 角色对象，可以为None
+            call_type (str, optional): 调用类型. 默认为"general".
+
+        Returns:
+            str: 系统提示词
+        """
+        if not character:
+            return "你是狼人杀游戏中的一名角色。"
+
+        system_prompt = f"你是一名叫{character.name}的{character.gender}性角色，性格{character.style}。"
+        if character.role == "werewolf":
+            system_prompt += "你是一名狼人，你的目标是消灭所有好人。"
+        elif character.role == "seer":
+            system_prompt += "你是一名预言家，你可以查验玩家的身份。"
+        elif character.role == "witch":
+            system_prompt += "你是一名女巫，你有一瓶解药和一瓶毒药。"
+        elif character.role == "villager":
+            system_prompt += "你是一名普通村民，你的目标是找出并消灭所有狼人。"
+        if is_stable_layout():
+            system_prompt += static_prefix(character, call_type)
+        return system_prompt
+
+    def _record_usage(self, usage):
+        """
+        累计服务端响应中的token用量
+
+        Args:
+            usage: 响应的usage字段，可以是字典或OpenAI SDK的对象，为空时忽略
+        """
+        tokens = parse_usage(usage)
+        if not tokens:
+            return
+        attempt = getattr(_attempt_usage, "tokens", None)
+        if attempt is not None:
+            # 容错策略中的一次尝试，等确定采用哪次尝试的结果后再计入
+            for key, value in tokens.items():
+                attempt[key] = attempt.get(key, 0) + value
+            return
+        self._add_usage(tokens)
+
+    def _add_usage(self, tokens):
+        """
+        把token用量计入统计
+
+        Args:
+            tokens (dict): input_tokens、cached_tokens和output_tokens
+        """
+        with self.stats_lock:
+            for key, value in tokens.items():
+                self.token_stats[key] += value
 
-    def generate_response(self, prompt, character=None):
+    def _stage(self, stage, call_type):
+        """
+        统计AI调用某一步骤耗时的上下文管理器
+
+        Args:
+            stage (str): 步骤名称：queue、network、parse、first_token或total
+            call_type (str): 调用类型
+
+        Returns:
+            contextmanager: 计时上下文
+        """
+        return metrics.timer("werewolf_ai_call_seconds", model=self.model_name, call_type=call_type, stage=stage)
+
+    def _send_request(self, system_prompt, prompt, call_type, character=None):
+        """
+        向模型服务发送请求并解析响应，由子类实现
+
+        Args:
+            system_prompt (str): 系统提示词
+            prompt (str): 用户提示词
+            call_type (str): 调用类型
+            character (Character, optional): 角色对象. 默认为None.
+
+        Returns:
+            str: 模型生成的文本，失败时抛出异常
+        """
+        raise NotImplementedError("子类必须实现此方法")
+
+    def _send_stream_request(self, system_prompt, prompt, call_type, character=None):
+        """
+        以流式方式发送请求，逐段返回生成的文本；不支持流式输出的客户端一次性返回完整响应
+
+        Args:
+            system_prompt (str): 系统提示词
+            prompt (str): 用户提示词
+            call_type (str): 调用类型
+            character (Character, optional): 角色对象. 默认为None.
+
+        Yields:
+            str: 新生成的文本片段
+        """
+        yield self._send_request(system_prompt, prompt, call_type, character)
+
+    def _collect_stream(self, system_prompt, prompt, call_type, character, on_delta):
+        """
+        读取流式响应，把每个片段交给on_delta并拼接出完整文本
+
+        Returns:
+            str: 完整响应
+        """
+        chunks = []
+        start = time.perf_counter()
+        try:
+            with self._stage("network", call_type):
+                for chunk in self._send_stream_request(system_prompt, prompt, call_type, character):
+                    if chunk:
+                        if not chunks:
+                            metrics.observe("werewolf_ai_call_seconds", time.perf_counter() - start,
+                                            model=self.model_name, call_type=call_type, stage="first_token")
+                        chunks.append(chunk)
+                        on_delta(chunk)
+        except Exception as e:
+            if chunks:
+                raise StreamInterruptedError(f"流式输出中断: {str(e)}") from e
+            raise
+        return "".join(chunks)
+
+    def generate_response(self, prompt, character=None, call_type="general", action_type=None, on_delta=None, fallback=True):
         """
         生成AI响应
 
         Args:
             prompt (str): 提示词
             character (Character, optional): 角色对象. 默认为None.
+            call_type (str): 调用类型，用于调试
+            action_type (str): 行为类型，用于关联特定行为
+            on_delta (callable, optional): 设置后使用流式输出，每收到一段新文本就调用一次. 默认为None.
+            fallback (bool, optional): 调用失败时是否返回兜底发言，为False时抛出异常. 默认为True.
+
+        Returns:
+            str: AI生成的完整响应，调用失败时返回兜底发言
+        """
+        system_prompt = self.build_system_prompt(character, call_type)
+
+        # 查询响应缓存（仅对启用缓存的调用类型生效），命中时同样记录调用以保证调试界面可用
+        cache_key = None
+        if response_cache.is_enabled(call_type):
+            cache_key = make_cache_key(system_prompt, prompt, self.model_name, self.temperature)
+            cached_response = response_cache.get(cache_key, call_type)
+            if cached_response is not None:
+                self._record_ai_call(character, system_prompt, prompt, cached_response, self.model_name, call_type, "success", action_type, cached=True)
+                if on_delta:
+                    on_delta(cached_response)
+                return cached_response
+
+        # 发送调用开始状态
+        if character and call_type not in self.background_call_types:
+            self._emit_model_call_status(character, call_type, "loading", "")
+
+        try:
+            ai_response = self._request_with_policy(system_prompt, prompt, call_type, character, on_delta)
+            if not ai_response:
+                raise Exception("API返回了空响应")
+
+            if cache_key:
+                response_cache.put(cache_key, ai_response)
+
+            # 记录成功的AI调用
+            self._record_ai_call(character, system_prompt, prompt, ai_response, self.model_name, call_type, "success", action_type)
+            return ai_response
+        except Exception as e:
+            self.logger.error("ai.error", "{service}API调用失败: {error}，模型: {model}",
+                              service=self.service_name, error=str(e), model=self.model_name, call_type=call_type)
+            fallback_response = f"这是{character.name if character else '某角色'}的回应：{self.fallback_text}"
+            self._record_ai_call(character, system_prompt, prompt, f"[{self.service_name}API调用失败] {fallback_response}", self.model_name, call_type, "error", action_type)
+            if not fallback:
+                raise
+            return fallback_response
+
+    def _request_with_policy(self, system_prompt, prompt, call_type, character=None, on_delta=None):
+        """
+        完成一次逻辑调用：临时性错误重试、慢请求对冲和熔断由容错策略统一处理，每次尝试都占用一个限流配额
+
+        Args:
+            system_prompt (str): 系统提示词
+            prompt (str): 用户提示词
+            call_type (str): 调用类型
+            character (Character, optional): 角色对象. 默认为None.
+            on_delta (callable, optional): 流式输出回调. 默认为None.
+
+        Returns:
+            str: 最终采用的响应，所有尝试都失败时抛出最后一个异常
+        """
+        limiter = rate_limiter_registry.get(self.provider, self.model_name)
+
+        def send():
+            # 每次尝试单独累计token用量，与响应一起返回
+            _attempt_usage.tokens = {}
+            try:
+                queued = time.perf_counter()
+                with limiter.slot(self.game_id):
+                    metrics.observe("werewolf_ai_call_seconds", time.perf_counter() - queued,
+                                    model=self.model_name, call_type=call_type, stage="queue")
+                    if on_delta:
+                        response = self._collect_stream(system_prompt, prompt, call_type, character, on_delta)
+                    else:
+                        response = self._send_request(system_prompt, prompt, call_type, character)
+                return response, _attempt_usage.tokens
+            finally:
+                _attempt_usage.tokens = None
+
+        with self._stage("total", call_type):
+            response, tokens = resilience_policy.call(self.provider, self.model_name, send, hedge=on_delta is None)
+        # 只统计最终采用的尝试，被丢弃的对冲请求不重复计入
+        if tokens:
+            self._add_usage(tokens)
+        return response
+
+    async def generate_response_async(self, prompt, character=None, call_type="general", action_type=None, on_delta=None):
+        """
+        异步生成AI响应，阻塞的网络请求在线程池中执行，不会阻塞调用方的事件循环
+
+        Args:
+            prompt (str): 提示词
+            character (Character, optional): 角色对象. 默认为None.
+            call_type (str): 调用类型，用于调试
+            action_type (str): 行为类型，用于关联特定行为
+            on_delta (callable, optional): 流式输出回调，在线程池线程中调用. 默认为None.
 
         Returns:
             str: AI生成的响应
         """
-        raise NotImplementedError("子类必须实现此方法")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _async_executor, self.generate_response, prompt, character, call_type, action_type, on_delta
+        )
 
-    def _record_ai_call(self, character, system_prompt, user_prompt, response, model_name, call_type="general", status="success", action_type=None):
+    def _record_ai_call(self, character, system_prompt, user_prompt, response, model_name, call_type="general", status="success", action_type=None, cached=False):
         """
         记录AI调用信息
 
@@ -47,31 +421,38 @@ class AIClient:
             call_type: 调用类型
             status: 调用状态 (success/error)
             action_type: 行为类型，用于关联特定行为
+            cached: 响应是否来自缓存
             
         Returns:
             str: AI调用记录的唯一ID
         """
+        with self.stats_lock:
+            self.call_stats["total"] += 1
+            self.call_stats["error" if status == "error" else "success"] += 1
+
         if character:
             call_id = str(uuid.uuid4())
-            ai_call_record = {
-                "call_id": call_id,
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "model": model_name,
-                "call_type": call_type,
-                "action_type": action_type,  # 新增字段，用于关联特定行为
-                "input": {
-                    "system_prompt": system_prompt,
-                    "user_prompt": user_prompt
-                },
-                "output": response,
-                "character": character.name,
-                "role": character.role,
-                "status": status
-            }
+            ai_call_record = AICallRecord(
+                call_id=call_id,
+                model=model_name,
+                call_type=call_type,
+                action_type=action_type,  # 用于关联特定行为
+                system_prompt=system_prompt,
+                user_prompt=user_prompt,
+                output=response,
+                character=character.name,
+                role=character.role,
+                status=status,
+                cached=cached
+            )
 
             # 使用全局AI调用记录管理器
-            ai_call_manager.add_ai_call_record(character.name, ai_call_record)
+            ai_call_manager.add_ai_call_record(character.name, ai_call_record, game_id=self.room)
             
+            # 后台调用与游戏循环并发执行，不能覆盖游戏循环随后读取的latest_ai_call_id
+            if call_type in self.background_call_types:
+                return call_id
+
             # 仍然在character.memory中记录最新的AI调用ID，用于关联
             if hasattr(character, 'memory'):
                 character.memory["latest_ai_call_id"] = call_id
@@ -94,6 +475,8 @@ class AIClient:
             status: 调用状态 (success/error/loading)
             response_text: 响应文本
         """
+        if not self.emit_status:
+            return
         try:
             # 导入socketio (这里用延迟导入避免循环依赖)
             from backend.app import socketio
@@ -114,15 +497,24 @@ class AIClient:
                 'status_text': status_text,
                 'model': character.model,
                 'timestamp': datetime.now().strftime("%H:%M:%S")
-            })
+            }, room=self.room)
         except Exception as e:
-            print(f"推送模型调用状态失败: {str(e)}")
+            self.logger.warning("ai.status", f"推送模型调用状态失败: {str(e)}")
 
 class DeepseekClient(AIClient):
     """Deepseek模型客户端 - 通过阿里百炼服务调用"""
 
-    def __init__(self, model_name="deepseek-chat"):
-        """初始化Deepseek客户端"""
+    fallback_text = "根据当前情况，我认为我们应该仔细思考..."
+    context_window = 65536
+
+    def __init__(self, model_name="deepseek-chat", base_url=None):
+        """
+        初始化Deepseek客户端
+
+        Args:
+            model_name (str): 模型名称
+            base_url (str, optional): 服务地址，用于指向本地模拟服务器. 默认读取DASHSCOPE_BASE_URL/DEEPSEEK_BASE_URL环境变量.
+        """
         super().__init__()
         # 优先使用阿里百炼API调用DeepSeek模型
         self.api_key = os.getenv("DASHSCOPE_API_KEY") or os.getenv("QWEN_API_KEY")
@@ -132,65 +524,45 @@ class DeepseekClient(AIClient):
             if not self.api_key:
                 raise ValueError("未设置DASHSCOPE_API_KEY、QWEN_API_KEY或DEEPSEEK_API_KEY环境变量")
             self.use_dashscope = False
-            self.api_url = "https://api.deepseek.com/v1/chat/completions"
+            base_url = base_url or os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+            self.api_url = f"{base_url.rstrip('/')}/v1/chat/completions"
+            self.service_name = "DeepSeek官方"
+            self.provider = "deepseek"
         else:
             self.use_dashscope = True
-            self.api_url = "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation"
+            base_url = base_url or os.getenv("DASHSCOPE_BASE_URL", "https://dashscope.aliyuncs.com")
+            self.api_url = f"{base_url.rstrip('/')}/api/v1/services/aigc/text-generation/generation"
+            self.service_name = "阿里百炼"
+            self.provider = "dashscope"
 
         self.model_name = model_name  # 支持不同的DeepSeek模型
 
-    def generate_response(self, prompt, character=None, call_type="general", action_type=None):
-        """
-        生成Deepseek模型响应
-
-        Args:
-            prompt (str): 提示词
-            character (Character, optional): 角色对象. 默认为None.
-            call_type (str): 调用类型，用于调试
-            action_type (str): 行为类型，用于关联特定行为
-
-        Returns:
-            str: AI生成的响应
-        """
-        # 构建角色提示词
-        if character:
-            system_prompt = f"你是一名叫{character.name}的{character.gender}性角色，性格{character.style}。"
-            if character.role == "werewolf":
-                system_prompt += "你是一名狼人，你的目标是消灭所有好人。"
-            elif character.role == "seer":
-                system_prompt += "你是一名预言家，你可以查验玩家的身份。"
-            elif character.role == "witch":
-                system_prompt += "你是一名女巫，你有一瓶解药和一瓶毒药。"
-
-            elif character.role == "villager":
-                system_prompt += "你是一名普通村民，你的目标是找出并消灭所有狼人。"
-        else:
-            system_prompt = "你是狼人杀游戏中的一名角色。"
-
         # 根据服务类型选择模型名称映射
         if self.use_dashscope:
             # 阿里百炼服务中的DeepSeek模型名称
             model_mapping = {
                 "deepseek-r1": "deepseek-r1",
-                "deepseek-v3": "deepseek-v3", 
+                "deepseek-v3": "deepseek-v3",
                 "deepseek-chat": "deepseek-v3"
             }
         else:
             # DeepSeek官方API的模型名称
             model_mapping = {
                 "deepseek-r1": "deepseek-reasoner",
-                "deepseek-v3": "deepseek-chat", 
+                "deepseek-v3": "deepseek-chat",
                 "deepseek-chat": "deepseek-chat"
             }
-        
+
         # 使用映射后的模型名称
-        actual_model = model_mapping.get(self.model_name, "deepseek-v3" if self.use_dashscope else "deepseek-chat")
-        
+        self.actual_model = model_mapping.get(self.model_name, "deepseek-v3" if self.use_dashscope else "deepseek-chat")
+
+    def _build_request(self, system_prompt, prompt):
+        """构建Deepseek请求数据和请求头"""
         # 根据服务类型构建请求数据
         if self.use_dashscope:
             # 阿里百炼API格式
             data = {
-                "model": actual_model,
+                "model": self.actual_model,
                 "input": {
                     "messages": [
                         {"role": "system", "content": system_prompt},
@@ -198,123 +570,106 @@ class DeepseekClient(AIClient):
                     ]
                 },
                 "parameters": {
-                    "temperature": 0.7,
-                    "max_tokens": 500,
+                    "temperature": self.temperature,
+                    "max_tokens": self.max_output_tokens,
                     "result_format": "message"
                 }
             }
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
         else:
             # DeepSeek官方API格式
             data = {
-                "model": actual_model,
+                "model": self.actual_model,
                 "messages": [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": prompt}
                 ],
-                "temperature": 0.7,
-                "max_tokens": 500
-            }
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
+                "temperature": self.temperature,
+                "max_tokens": self.max_output_tokens
             }
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        return data, headers
 
-        # 发送调用开始状态
-        if character:
-            self._emit_model_call_status(character, call_type, "loading", "")
-        
-        try:
-            response = requests.post(self.api_url, headers=headers, json=data, timeout=30)
+    def _send_request(self, system_prompt, prompt, call_type, character=None):
+        """发送Deepseek请求并解析响应"""
+        data, headers = self._build_request(system_prompt, prompt)
+        with self._stage("network", call_type):
+            response = get_session(self.api_url).post(self.api_url, headers=headers, json=data, timeout=30)
             response.raise_for_status()
+
+        with self._stage("parse", call_type):
             result = response.json()
-            
+            self._record_usage(result.get("usage"))
+
             # 根据服务类型解析响应
             if self.use_dashscope:
                 # 阿里百炼API响应格式
                 if "output" not in result:
                     raise Exception("阿里百炼API返回格式错误：缺少output字段")
-                
+
                 output = result["output"]
                 choices = output.get("choices", [])
                 if choices:
-                    ai_response = choices[0].get("message", {}).get("content", "")
-                else:
-                    ai_response = output.get("text", "")
-            else:
-                # DeepSeek官方API响应格式
-                if "choices" not in result or not result["choices"]:
-                    raise Exception("DeepSeek API返回格式错误：缺少choices字段")
-                
-                ai_response = result["choices"][0]["message"]["content"]
-            
-            if not ai_response:
-                raise Exception("API返回了空响应")
+                    return choices[0].get("message", {}).get("content", "")
+                return output.get("text", "")
 
-            # 记录成功的AI调用
-            self._record_ai_call(character, system_prompt, prompt, ai_response, self.model_name, call_type, "success", action_type)
+            # DeepSeek官方API响应格式
+            if "choices" not in result or not result["choices"]:
+                raise Exception("DeepSeek API返回格式错误：缺少choices字段")
+            return result["choices"][0]["message"]["content"]
 
-            return ai_response
-        except requests.exceptions.RequestException as e:
-            service_name = "阿里百炼" if self.use_dashscope else "DeepSeek官方"
-            print(f"{service_name} API网络请求失败: {str(e)}")
-            print(f"使用服务: {service_name}, 模型: {actual_model}")
-            print(f"请求数据: {data}")
-            fallback_response = f"这是{character.name if character else '某角色'}的回应：根据当前情况，我认为我们应该仔细思考..."
-            self._record_ai_call(character, system_prompt, prompt, f"[{service_name}网络错误] {fallback_response}", self.model_name, call_type, "error", action_type)
-            return fallback_response
-        except Exception as e:
-            service_name = "阿里百炼" if self.use_dashscope else "DeepSeek官方"
-            print(f"{service_name} API调用失败: {str(e)}")
-            print(f"使用服务: {service_name}, 模型: {actual_model}")
-            fallback_response = f"这是{character.name if character else '某角色'}的回应：根据当前情况，我认为我们应该仔细思考..."
-            self._record_ai_call(character, system_prompt, prompt, f"[{service_name}API调用失败] {fallback_response}", self.model_name, call_type, "error", action_type)
-            return fallback_response
+    def _send_stream_request(self, system_prompt, prompt, call_type, character=None):
+        """以SSE流式发送Deepseek请求，逐段返回生成的文本"""
+        data, headers = self._build_request(system_prompt, prompt)
+        if self.use_dashscope:
+            headers["X-DashScope-SSE"] = "enable"
+            data["parameters"]["incremental_output"] = True
+        else:
+            data["stream"] = True
+            data["stream_options"] = {"include_usage": True}
+
+        # 阿里百炼每个事件都带有累计用量，OpenAI格式只在最后一个事件中给出，只记录最后一次
+        usage = None
+        with get_session(self.api_url).post(self.api_url, headers=headers, json=data, timeout=30, stream=True) as response:
+            response.raise_for_status()
+            for payload in iter_sse_data(response):
+                if payload == "[DONE]":
+                    break
+                event = json.loads(payload)
+                usage = event.get("usage") or usage
+                yield dashscope_delta(event) if self.use_dashscope else openai_delta(event)
+        self._record_usage(usage)
 
 class QwenClient(AIClient):
     """通义千问模型客户端"""
 
-    def __init__(self, model_name="qwen-turbo-latest"):
-        """初始化通义千问客户端"""
+    service_name = "通义千问"
+    provider = "dashscope"
+    context_window = 131072
+
+    def __init__(self, model_name="qwen-turbo-latest", base_url=None):
+        """
+        初始化通义千问客户端
+
+        Args:
+            model_name (str): 模型名称
+            base_url (str, optional): 服务地址，用于指向本地模拟服务器. 默认读取DASHSCOPE_BASE_URL环境变量.
+        """
         super().__init__()
         self.api_key = os.getenv("DASHSCOPE_API_KEY")
         if not self.api_key:
             raise ValueError("未设置DASHSCOPE_API_KEY环境变量")
 
-        self.api_url = "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation"
+        base_url = base_url or os.getenv("DASHSCOPE_BASE_URL", "https://dashscope.aliyuncs.com")
+        self.api_url = f"{base_url.rstrip('/')}/api/v1/services/aigc/text-generation/generation"
         self.model_name = model_name  # 支持不同的Qwen模型
+        if model_name.startswith("qwen-max"):
+            self.context_window = 32768
 
-    def generate_response(self, prompt, character=None, call_type="general", action_type=None):
-        """
-        生成通义千问模型响应
-
-        Args:
-            prompt (str): 提示词
-            character (Character, optional): 角色对象. 默认为None.
-            call_type (str): 调用类型，用于调试
-            action_type (str): 行为类型，用于关联特定行为
-
-        Returns:
-            str: AI生成的响应
-        """
-        # 构建角色提示词
-        if character:
-            system_prompt = f"你是一名叫{character.name}的{character.gender}性角色，性格{character.style}。"
-            if character.role == "werewolf":
-                system_prompt += "你是一名狼人，你的目标是消灭所有好人。"
-            elif character.role == "seer":
-                system_prompt += "你是一名预言家，你可以查验玩家的身份。"
-            elif character.role == "witch":
-                system_prompt += "你是一名女巫，你有一瓶解药和一瓶毒药。"
-
-            elif character.role == "villager":
-                system_prompt += "你是一名普通村民，你的目标是找出并消灭所有狼人。"
-        else:
-            system_prompt = "你是狼人杀游戏中的一名角色。"
-
+    def _build_request(self, system_prompt, prompt):
+        """构建通义千问请求数据和请求头"""
         # 构建请求数据 - 使用指定的Qwen模型
         data = {
             "model": self.model_name,
@@ -325,75 +680,80 @@ class QwenClient(AIClient):
                 ]
             },
             "parameters": {
-                "temperature": 0.7,
-                "max_tokens": 500,
+                "temperature": self.temperature,
+                "max_tokens": self.max_output_tokens,
                 "result_format": "message"
             }
         }
 
-        # 发送请求
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}"
         }
+        return data, headers
 
-        try:
-            response = requests.post(self.api_url, headers=headers, json=data)
+    def _send_request(self, system_prompt, prompt, call_type, character=None):
+        """发送通义千问请求并解析响应"""
+        data, headers = self._build_request(system_prompt, prompt)
+        with self._stage("network", call_type):
+            response = get_session(self.api_url).post(self.api_url, headers=headers, json=data, timeout=60)
             response.raise_for_status()
+
+        with self._stage("parse", call_type):
             result = response.json()
-            
+            self._record_usage(result.get("usage"))
+
             # 检查响应是否包含error字段
             if "error" in result:
                 error_msg = result.get('error', {}).get('message', '未知错误')
                 raise Exception(f"API返回错误: {error_msg}")
-            
+
             # 解析正常响应
             output = result.get("output", {})
             choices = output.get("choices", [])
             if choices:
-                ai_response = choices[0].get("message", {}).get("content", "")
-            else:
-                ai_response = output.get("text", "")
-            
-            if not ai_response:
-                raise Exception("API返回了空响应")
-
-            # 记录AI调用
-            self._record_ai_call(character, system_prompt, prompt, ai_response, self.model_name, call_type, "success", action_type)
-
-            return ai_response
-        except requests.exceptions.RequestException as e:
-            print(f"通义千问API网络请求失败: {str(e)}")
-            fallback_response = f"这是{character.name if character else '某角色'}的回应：我认为我们应该仔细分析每个人的发言..."
-
-            # 记录失败的调用
-            self._record_ai_call(character, system_prompt, prompt, f"[API调用失败] {fallback_response}", self.model_name, call_type, "error", action_type)
-
-            return fallback_response
-        except Exception as e:
-            print(f"通义千问API调用失败: {str(e)}")
-            fallback_response = f"这是{character.name if character else '某角色'}的回应：我认为我们应该仔细分析每个人的发言..."
-
-            # 记录失败的调用
-            self._record_ai_call(character, system_prompt, prompt, f"[API调用失败] {fallback_response}", self.model_name, call_type, "error", action_type)
-
-            return fallback_response
+                return choices[0].get("message", {}).get("content", "")
+            return output.get("text", "")
+
+    def _send_stream_request(self, system_prompt, prompt, call_type, character=None):
+        """以SSE流式发送通义千问请求，逐段返回生成的文本"""
+        data, headers = self._build_request(system_prompt, prompt)
+        headers["X-DashScope-SSE"] = "enable"
+        data["parameters"]["incremental_output"] = True
+
+        # 每个事件都带有累计用量，只记录最后一次
+        usage = None
+        with get_session(self.api_url).post(self.api_url, headers=headers, json=data, timeout=60, stream=True) as response:
+            response.raise_for_status()
+            for payload in iter_sse_data(response):
+                event = json.loads(payload)
+                usage = event.get("usage") or usage
+                yield dashscope_delta(event)
+        self._record_usage(usage)
 
 class DoubaoClient(AIClient):
     """豆包模型客户端（火山方舟 - 使用OpenAI SDK）"""
 
-    def __init__(self, model_name="doubao-seed-1-6-250615"):
-        """初始化豆包客户端"""
+    service_name = "豆包"
+    provider = "ark"
+    context_window = 262144
+
+    def __init__(self, model_name="doubao-seed-1-6-250615", base_url=None):
+        """
+        初始化豆包客户端
+
+        Args:
+            model_name (str): 模型名称
+            base_url (str, optional): 服务地址（包含/api/v3），用于指向本地模拟服务器. 默认读取ARK_BASE_URL环境变量.
+        """
         super().__init__()
         self.api_key = os.getenv("ARK_API_KEY")
         if not self.api_key:
             raise ValueError("未设置ARK_API_KEY环境变量")
 
-        # 使用OpenAI客户端连接火山方舟
-        self.client = OpenAI(
-            base_url="https://ark.cn-beijing.volces.com/api/v3",
-            api_key=self.api_key
-        )
+        # 使用OpenAI客户端连接火山方舟，同一端点的所有角色共享一个连接池
+        self.base_url = base_url or os.getenv("ARK_BASE_URL", "https://ark.cn-beijing.volces.com/api/v3")
+        self.client = get_openai_client(self.base_url, self.api_key)
         
         # 豆包模型名称映射（兼容旧格式）
         self.model_mapping = {
@@ -409,69 +769,57 @@ class DoubaoClient(AIClient):
         # 获取实际的模型名称
         self.model_name = self.model_mapping.get(model_name, model_name)
 
-    def generate_response(self, prompt, character=None, call_type="general", action_type=None):
-        """
-        生成豆包模型响应
+    def output_tokens(self, call_type):
+        """内心决策只需要要点，限制为300个token"""
+        return 300 if call_type == "inner_decision" else self.max_output_tokens
 
-        Args:
-            prompt (str): 提示词
-            character (Character, optional): 角色对象. 默认为None.
-            call_type (str): 调用类型，用于调试
-            action_type (str): 行为类型，用于关联特定行为
-
-        Returns:
-            str: AI生成的响应
-        """
-        # 构建角色提示词
-        if character:
-            system_prompt = f"你是一名叫{character.name}的{character.gender}性角色，性格{character.style}。"
-            if character.role == "werewolf":
-                system_prompt += "你是一名狼人，你的目标是消灭所有好人。"
-            elif character.role == "seer":
-                system_prompt += "你是一名预言家，你可以查验玩家的身份。"
-            elif character.role == "witch":
-                system_prompt += "你是一名女巫，你有一瓶解药和一瓶毒药。"
-            elif character.role == "villager":
-                system_prompt += "你是一名普通村民，你的目标是找出并消灭所有狼人。"
-        else:
-            system_prompt = "你是狼人杀游戏中的一名角色。"
+    def _send_request(self, system_prompt, prompt, call_type, character=None):
+        """通过OpenAI SDK发送豆包请求并解析响应"""
+        # 针对inner_decision调用增加超时时间和token限制
+        timeout_duration = 90 if call_type == "inner_decision" else 45
+        max_tokens = self.output_tokens(call_type)
 
-        # 发送调用开始状态
-        if character:
-            self._emit_model_call_status(character, call_type, "loading", "")
-            
-        try:
-            # 针对inner_decision调用增加超时时间和token限制
-            timeout_duration = 90 if call_type == "inner_decision" else 45
-            max_tokens = 300 if call_type == "inner_decision" else 500
-            
-            # 使用OpenAI SDK调用火山方舟API
+        # 使用OpenAI SDK调用火山方舟API，响应解析在SDK内部完成，计入网络耗时
+        with self._stage("network", call_type):
             response = self.client.chat.completions.create(
                 model=self.model_name,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.7,
+                temperature=self.temperature,
                 max_tokens=max_tokens,
                 timeout=timeout_duration
             )
-            
-            # 获取AI响应
-            ai_response = response.choices[0].message.content
-            if not ai_response:
-                raise Exception("API返回了空响应")
-
-            # 记录AI调用
-            self._record_ai_call(character, system_prompt, prompt, ai_response, self.model_name, call_type, "success", action_type)
 
-            return ai_response
-            
-        except Exception as e:
-            print(f"豆包API调用失败: {str(e)}")
-            fallback_response = f"这是{character.name if character else '某角色'}的回应：我认为我们应该仔细分析每个人的发言..."
-            self._record_ai_call(character, system_prompt, prompt, f"[API调用失败] {fallback_response}", self.model_name, call_type, "error", action_type)
-            return fallback_response
+        # 获取AI响应
+        self._record_usage(response.usage)
+        return response.choices[0].message.content
+
+    def _send_stream_request(self, system_prompt, prompt, call_type, character=None):
+        """通过OpenAI SDK以stream=True发送豆包请求，逐段返回生成的文本"""
+        timeout_duration = 90 if call_type == "inner_decision" else 45
+        max_tokens = self.output_tokens(call_type)
+
+        stream = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=self.temperature,
+            max_tokens=max_tokens,
+            timeout=timeout_duration,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        # 用量在最后一个不含choices的片段中返回
+        usage = None
+        for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            if chunk.choices:
+                yield chunk.choices[0].delta.content or ""
+        self._record_usage(usage)
 
 def get_ai_client(model_name):
     """
@@ -492,5 +840,5 @@ def get_ai_client(model_name):
         return DoubaoClient(model_name)
     else:
         # 默认使用通义千问客户端
-        print(f"未知模型 {model_name}，使用默认的通义千问客户端")
+        get_logger().warning("ai.model", f"未知模型 {model_name}，使用默认的通义千问客户端")
         return QwenClient("qwen-turbo-latest")
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+语音音频缓存
+按（文本、音色、模型、音频格式）的内容哈希把合成好的音频保存在磁盘上，重复的系统播报、回放和重连的观众直接读取缓存，
+不再调用语音合成；内存中维护文件大小索引，超过容量上限时按最近最少使用淘汰，不需要重新扫描目录
+
+环境变量:
+    AUDIO_DIR: 音频缓存目录，默认为./data/audio
+    AUDIO_CACHE_MAX_MB: 缓存容量上限（MB），默认为200
+"""
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+# 缓存文件扩展名 -> mimetype
+MIMETYPES = {
+    "wav": "audio/wav",
+    "mp3": "audio/mpeg",
+    "ogg": "audio/ogg",
+}
+
+
+def audio_key(text, voice, model, audio_format, extension):
+    """
+    计算音频的缓存键
+
+    Args:
+        text (str): 合成的文本
+        voice (str): 音色
+        model (str): 语音合成模型
+        audio_format (str): 输出格式名，包含采样率和码率，如OGG_OPUS_24KHZ_MONO_32KBPS
+        extension (str): 文件扩展名
+
+    Returns:
+        str: 十六进制的SHA-256摘要加扩展名，同时也是缓存文件名
+    """
+    content = "\x00".join((model, voice, audio_format, text))
+    return f"{hashlib.sha256(content.encode('utf-8')).hexdigest()}.{extension}"
+
+
+def mimetype_for(key):
+    """
+    根据缓存键的扩展名获取mimetype
+
+    Args:
+        key (str): 缓存键
+
+    Returns:
+        str: mimetype，未知扩展名时返回application/octet-stream
+    """
+    return MIMETYPES.get(key.rsplit(".", 1)[-1], "application/octet-stream")
+
+
+class AudioCache:
+    """磁盘音频缓存，索引在内存中，按总大小做LRU淘汰"""
+
+    def __init__(self, audio_dir=None, max_bytes=None):
+        """
+        初始化缓存，启动时扫描一次目录建立索引
+
+        Args:
+            audio_dir (str, optional): 缓存目录. 默认读取AUDIO_DIR环境变量.
+            max_bytes (int, optional): 容量上限（字节）. 默认读取AUDIO_CACHE_MAX_MB环境变量.
+        """
+        self.audio_dir = audio_dir or os.getenv("AUDIO_DIR", "./data/audio")
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("AUDIO_CACHE_MAX_MB", "200")) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # 键（即文件名） -> 文件大小，顺序即使用顺序，最近使用的在末尾
+        self.index = OrderedDict()
+        self.total_bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        os.makedirs(self.audio_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        """扫描目录，按修改时间从旧到新建立索引，并按容量上限淘汰"""
+        entries = []
+        for name in os.listdir(self.audio_dir):
+            if name.rsplit(".", 1)[-1] not in MIMETYPES:
+                continue
+            try:
+                stat = os.stat(os.path.join(self.audio_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name, stat.st_size))
+        entries.sort()
+        with self.lock:
+            for _, key, size in entries:
+                self.index[key] = size
+                self.total_bytes += size
+            self._evict()
+
+    def path(self, key):
+        """
+        获取缓存文件路径
+
+        Args:
+            key (str): 音频键
+
+        Returns:
+            str: 文件路径
+        """
+        return os.path.join(self.audio_dir, key)
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.index
+
+    def get(self, key):
+        """
+        读取缓存的音频
+
+        Args:
+            key (str): 音频键
+
+        Returns:
+            bytes: 音频数据，未命中时返回None
+        """
+        with self.lock:
+            if key not in self.index:
+                self.stats["misses"] += 1
+                return None
+            self.index.move_to_end(key)
+        try:
+            with open(self.path(key), "rb") as f:
+                data = f.read()
+        except OSError:
+            # 文件被外部删除，从索引中移除
+            with self.lock:
+                size = self.index.pop(key, None)
+                if size is not None:
+                    self.total_bytes -= size
+                self.stats["misses"] += 1
+            return None
+        with self.lock:
+            self.stats["hits"] += 1
+        return data
+
+    def put(self, key, data):
+        """
+        写入音频，先写临时文件再重命名，读取方不会看到写了一半的文件
+
+        Args:
+            key (str): 音频键
+            data (bytes): 音频数据
+        """
+        path = self.path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        with self.lock:
+            old_size = self.index.pop(key, None)
+            if old_size is not None:
+                self.total_bytes -= old_size
+            self.index[key] = len(data)
+            self.total_bytes += len(data)
+            self._evict()
+
+    def _evict(self):
+        """按最近最少使用淘汰，直到总大小不超过上限；调用方持有锁，最近写入的一项总是保留"""
+        while self.total_bytes > self.max_bytes and len(self.index) > 1:
+            key, size = self.index.popitem(last=False)
+            self.total_bytes -= size
+            self.stats["evictions"] += 1
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+
+    def get_stats(self):
+        """
+        获取缓存统计
+
+        Returns:
+            dict: 条目数、总大小、命中、未命中和淘汰次数
+        """
+        with self.lock:
+            return {"entries": len(self.index), "bytes": self.total_bytes, **self.stats}
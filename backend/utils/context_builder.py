@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按token预算组装提示词上下文
+各部分按优先级选入，放不下的部分按行截断或整体丢弃，并给出丢弃了哪些内容的报告；
+token数在本地估算，不调用分词器
+"""
+
+import os
+
+# 角色上下文的目标token数，实际预算还受模型上下文窗口限制
+CONTEXT_BUDGET_TOKENS = int(os.getenv("CONTEXT_BUDGET_TOKENS", "2500"))
+
+
+def estimate_tokens(text):
+    """
+    估算文本的token数：中日韩字符每个约1个token，其他字符约4个一个token
+
+    Args:
+        text (str): 文本
+
+    Returns:
+        int: 估算的token数
+    """
+    if not text:
+        return 0
+    wide = sum(1 for ch in text if ord(ch) > 0x2E7F)
+    return wide + (len(text) - wide + 3) // 4
+
+
+def fit_text(text, max_tokens, keep="head", marker="..."):
+    """
+    把文本截断到token预算以内
+
+    Args:
+        text (str): 文本
+        max_tokens (int): token预算
+        keep (str, optional): "head"保留开头，"tail"保留结尾. 默认为"head".
+        marker (str, optional): 截断处的标记. 默认为"...".
+
+    Returns:
+        str: 截断后的文本，未超出预算时原样返回
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max(0, max_tokens - estimate_tokens(marker))
+
+    # 二分查找能放下的最长字符数
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        piece = text[:middle] if keep == "head" else text[len(text) - middle:]
+        if estimate_tokens(piece) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    if keep == "head":
+        return text[:low] + marker
+    return marker + text[len(text) - low:]
+
+
+class ContextBuilder:
+    """上下文组装器"""
+
+    def __init__(self, budget):
+        """
+        初始化上下文组装器
+
+        Args:
+            budget (int): token预算
+        """
+        self.budget = budget
+        self.sections = []
+
+    def add(self, name, text, priority, required=False, keep=None, header=""):
+        """
+        添加一个上下文部分
+
+        Args:
+            name (str): 部分名称，用于报告
+            text (str): 内容，可按行截断时每行是一个条目
+            priority (int): 优先级，数值越大越先选入
+            required (bool, optional): 是否必须保留，即使超出预算. 默认为False.
+            keep (str, optional): 放不下时按行截断："head"保留开头的行，"tail"保留最近的行；
+                为None时整体丢弃. 默认为None.
+            header (str, optional): 截断时保留的标题行. 默认为"".
+        """
+        if text:
+            self.sections.append({
+                "name": name, "text": text, "priority": priority,
+                "required": required, "keep": keep, "header": header
+            })
+        return self
+
+    def _truncate_lines(self, section, budget):
+        """按行截断，返回放得下的文本，一行都放不下时返回空字符串"""
+        body = section["text"][len(section["header"]):] if section["text"].startswith(section["header"]) else section["text"]
+        lines = body.splitlines(keepends=True)
+        used = estimate_tokens(section["header"])
+        kept = []
+        ordered = lines if section["keep"] == "head" else reversed(lines)
+        for line in ordered:
+            cost = estimate_tokens(line)
+            if used + cost > budget:
+                break
+            kept.append(line)
+            used += cost
+        if not any(line.strip() for line in kept):
+            return ""
+        if section["keep"] == "tail":
+            kept.reverse()
+        return section["header"] + "".join(kept)
+
+    def build(self):
+        """
+        按优先级把各部分放入预算，输出时保持添加顺序
+
+        Returns:
+            tuple: (上下文文本, 报告)，报告包括预算、估算用量、截断和丢弃的部分名称
+        """
+        remaining = self.budget
+        chosen = {}
+        report = {"budget": self.budget, "tokens": 0, "truncated": [], "dropped": []}
+
+        order = sorted(range(len(self.sections)), key=lambda i: (not self.sections[i]["required"], -self.sections[i]["priority"]))
+        for index in order:
+            section = self.sections[index]
+            cost = estimate_tokens(section["text"])
+            if cost <= remaining or section["required"]:
+                chosen[index] = section["text"]
+                remaining -= cost
+                continue
+            text = self._truncate_lines(section, remaining) if section["keep"] else ""
+            if text:
+                chosen[index] = text
+                remaining -= estimate_tokens(text)
+                report["truncated"].append(section["name"])
+            else:
+                report["dropped"].append(section["name"])
+
+        context = "".join(chosen[i] for i in sorted(chosen))
+        report["tokens"] = estimate_tokens(context)
+        return context, report
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+HTTP连接池管理
+每个服务端点共享一个保持长连接的requests.Session（以及OpenAI SDK客户端），
+避免每次模型调用都重新进行TCP和TLS握手
+"""
+
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from openai import OpenAI
+
+# 每个端点的最大连接数，应不小于同时进行的模型调用数量
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+
+_sessions = {}
+_openai_clients = {}
+_lock = threading.Lock()
+
+
+def _endpoint_key(url):
+    """
+    获取URL对应的端点（协议+主机+端口）
+
+    Args:
+        url (str): 请求地址
+
+    Returns:
+        str: 端点标识
+    """
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def get_session(url):
+    """
+    获取端点共享的HTTP会话
+
+    Args:
+        url (str): 请求地址，同一主机的地址共享一个会话
+
+    Returns:
+        requests.Session: 带连接池的会话
+    """
+    key = _endpoint_key(url)
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount(key, adapter)
+            _sessions[key] = session
+        return session
+
+
+def get_openai_client(base_url, api_key):
+    """
+    获取端点共享的OpenAI SDK客户端（SDK内部使用httpx连接池）
+
+    Args:
+        base_url (str): 服务地址
+        api_key (str): API密钥
+
+    Returns:
+        OpenAI: OpenAI客户端
+    """
+    key = (base_url, api_key)
+    with _lock:
+        client = _openai_clients.get(key)
+        if client is None:
+            # 重试由resilience模块统一处理，关闭SDK自带的重试以免次数叠加
+            client = OpenAI(base_url=base_url, api_key=api_key, max_retries=0)
+            _openai_clients[key] = client
+        return client
+
+
+def _reset_after_fork():
+    """子进程不能复用父进程的连接，fork后清空连接池"""
+    global _lock
+    _sessions.clear()
+    _openai_clients.clear()
+    _lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
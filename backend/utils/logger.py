@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+结构化日志
+记录日志时只把（时间、级别、事件名、消息模板、字段、对局上下文）放入队列，消息格式化和写入输出都在后台线程中完成，
+不阻塞游戏流程；支持级别过滤、按事件名采样和绑定对局上下文，静默模式（无头运行）下在入队之前直接丢弃
+
+环境变量:
+    LOG_LEVEL: 最低输出级别，debug/info/warning/error，默认为info
+    LOG_FORMAT: text或json，默认为text
+    LOG_SAMPLE: 按事件名采样，如"game.log=0.1,game.update=0.5"表示只输出十分之一和一半
+    LOG_QUEUE_SIZE: 队列上限，写入跟不上时丢弃新日志并计数，默认为10000
+    LOG_QUIET: 为1时丢弃所有日志
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import threading
+from datetime import datetime
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+LEVEL_NAMES = {value: name.upper() for name, value in LEVELS.items()}
+
+
+def parse_sample_rates(spec):
+    """
+    解析采样配置
+
+    Args:
+        spec (str): 形如"game.log=0.1,game.update=0.5"的配置
+
+    Returns:
+        dict: 事件名 -> 采样率
+    """
+    rates = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            event, rate = item.split("=", 1)
+            rates[event.strip()] = float(rate)
+    return rates
+
+
+class StructuredLogger:
+    """队列化的结构化日志器，单例模式"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(StructuredLogger, cls).__new__(cls)
+            cls._instance._init()
+        return cls._instance
+
+    def _init(self):
+        """初始化日志器，默认从环境变量读取配置"""
+        self.level = LEVELS.get(os.getenv("LOG_LEVEL", "info").lower(), LEVELS["info"])
+        self.format = os.getenv("LOG_FORMAT", "text").lower()
+        self.quiet = os.getenv("LOG_QUIET", "0") == "1"
+        self.sample_rates = parse_sample_rates(os.getenv("LOG_SAMPLE", ""))
+        self.stream = None  # 为None时写入当前的sys.stdout
+        self._reset_worker()
+
+    def _reset_worker(self):
+        """创建队列和采样计数，后台线程在第一次记录日志时启动"""
+        self.queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+        self.lock = threading.Lock()
+        self.worker = None
+        self.sample_counters = {}
+        self.stats = {"written": 0, "dropped": 0, "sampled_out": 0}
+
+    def configure(self, level=None, format=None, quiet=None, sample_rates=None, stream=None):
+        """
+        更新日志配置
+
+        Args:
+            level (str, optional): 最低输出级别
+            format (str, optional): text或json
+            quiet (bool, optional): 是否丢弃所有日志
+            sample_rates (dict, optional): 事件名 -> 采样率
+            stream (file, optional): 输出目标，默认为sys.stdout
+        """
+        if level is not None:
+            self.level = LEVELS[level.lower()]
+        if format is not None:
+            self.format = format
+        if quiet is not None:
+            self.quiet = quiet
+        if sample_rates is not None:
+            with self.lock:
+                self.sample_rates = dict(sample_rates)
+                self.sample_counters = {}
+        if stream is not None:
+            self.stream = stream
+
+    def enabled(self, level):
+        """是否会输出该级别的日志，调用方可以据此跳过构造字段的开销"""
+        return not self.quiet and LEVELS[level] >= self.level
+
+    def _sampled(self, event):
+        """
+        按采样率决定是否保留，使用计数而非随机数，不影响游戏使用的随机数序列
+
+        Returns:
+            bool: 是否保留
+        """
+        rate = self.sample_rates.get(event)
+        if rate is None or rate >= 1:
+            return True
+        with self.lock:
+            count = self.sample_counters.get(event, 0)
+            self.sample_counters[event] = count + 1
+        keep = rate > 0 and int(count * rate) != int((count + 1) * rate)
+        if not keep:
+            self.stats["sampled_out"] += 1
+        return keep
+
+    def log(self, level, event, message=None, context=None, /, **fields):
+        """
+        记录一条日志，只入队，不做格式化
+
+        Args:
+            level (str): 级别
+            event (str): 事件名，如game.log、ai.error
+            message (str, optional): 消息模板，在后台线程中用字段格式化. 默认为None.
+            context (dict, optional): 对局上下文，如game_id. 默认为None.
+            **fields: 结构化字段，前面的参数只能按位置传入，字段可以使用message等同名键
+        """
+        if self.quiet or LEVELS[level] < self.level or not self._sampled(event):
+            return
+        if self.worker is None:
+            self._start_worker()
+        try:
+            self.queue.put_nowait((time.time(), LEVELS[level], event, message, context, fields))
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def _start_worker(self):
+        """启动后台写入线程"""
+        with self.lock:
+            if self.worker is None:
+                self.worker = threading.Thread(target=self._run, name="structured-logger", daemon=True)
+                self.worker.start()
+
+    def _run(self):
+        """后台线程：格式化并写入日志"""
+        while True:
+            record = self.queue.get()
+            try:
+                if record is not None:
+                    stream = self.stream or sys.stdout
+                    stream.write(self.format_record(*record) + "\n")
+                    self.stats["written"] += 1
+                    if self.queue.empty():
+                        stream.flush()
+            except Exception:
+                pass
+            finally:
+                self.queue.task_done()
+
+    def format_record(self, created, level, event, message, context, fields):
+        """
+        格式化一条日志
+
+        Returns:
+            str: text格式为"[时间] 级别 事件 上下文: 消息 字段"，json格式为一行JSON
+        """
+        if message is not None and fields:
+            try:
+                message = message.format(**fields)
+            except (KeyError, IndexError, ValueError, TypeError):
+                pass
+        timestamp = datetime.fromtimestamp(created).strftime("%Y-%m-%d %H:%M:%S")
+        if self.format == "json":
+            data = {"ts": timestamp, "level": LEVEL_NAMES[level], "event": event}
+            data.update(context or {})
+            data.update(fields)
+            if message is not None:
+                data["msg"] = message
+            return json.dumps(data, ensure_ascii=False, default=str)
+
+        scope = "".join(f" {key}={value}" for key, value in (context or {}).items())
+        line = f"[{timestamp}] {LEVEL_NAMES[level]:<7} {event}{scope}"
+        if message is not None:
+            return f"{line}: {message}"
+        return line + "".join(f" {key}={value}" for key, value in fields.items())
+
+    def flush(self, timeout=5.0):
+        """
+        等待队列中的日志写完
+
+        Args:
+            timeout (float, optional): 最长等待秒数. 默认为5.
+        """
+        if self.worker is None:
+            return
+        deadline = time.time() + timeout
+        while self.queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.01)
+
+    def get_stats(self):
+        """
+        获取日志统计
+
+        Returns:
+            dict: 已写入、因队列满丢弃和被采样掉的条数
+        """
+        return dict(self.stats)
+
+    def bind(self, **context):
+        """
+        创建绑定上下文的日志器
+
+        Args:
+            **context: 上下文字段，如game_id
+
+        Returns:
+            BoundLogger: 绑定上下文的日志器
+        """
+        return BoundLogger(self, context)
+
+
+class BoundLogger:
+    """绑定对局上下文的日志器；quiet为True时丢弃该对局的所有日志"""
+
+    __slots__ = ("logger", "context", "quiet")
+
+    def __init__(self, logger, context):
+        self.logger = logger
+        self.context = context
+        self.quiet = False
+
+    def bind(self, **context):
+        """在当前上下文的基础上再绑定字段"""
+        bound = BoundLogger(self.logger, {**self.context, **context})
+        bound.quiet = self.quiet
+        return bound
+
+    def log(self, level, event, message=None, /, **fields):
+        if not self.quiet:
+            self.logger.log(level, event, message, self.context, **fields)
+
+    def debug(self, event, message=None, /, **fields):
+        self.log("debug", event, message, **fields)
+
+    def info(self, event, message=None, /, **fields):
+        self.log("info", event, message, **fields)
+
+    def warning(self, event, message=None, /, **fields):
+        self.log("warning", event, message, **fields)
+
+    def error(self, event, message=None, /, **fields):
+        self.log("error", event, message, **fields)
+
+
+# 全局实例
+structured_logger = StructuredLogger()
+
+
+def get_logger(**context):
+    """
+    获取日志器
+
+    Args:
+        **context: 绑定的上下文字段
+
+    Returns:
+        BoundLogger: 日志器
+    """
+    return structured_logger.bind(**context)
+
+
+atexit.register(structured_logger.flush)
+
+
+def _reset_after_fork():
+    """子进程中后台线程不存在，重新创建队列，线程在下一次记录日志时启动"""
+    structured_logger._reset_worker()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
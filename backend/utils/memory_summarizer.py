@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+角色记忆整理
+角色只在内存中保留最近MEMORY_WINDOW条记忆，更早的记忆积累到一定数量后由模型合并进滚动摘要，
+摘要长度有上限，因此每个角色的记忆占用不随对局长度增长，而提示词中仍保留早期的关键事实
+"""
+
+import os
+import threading
+
+from backend.utils.prompt_templates import MEMORY_SUMMARY_TEMPLATE
+from backend.utils.logger import get_logger
+
+logger = get_logger()
+
+
+class MemorySummarizer:
+    """记忆整理器"""
+
+    def __init__(self, batch_size=None, max_chars=None):
+        """
+        初始化记忆整理器
+
+        Args:
+            batch_size (int, optional): 待整理记忆达到多少条时才整理. 默认读取MEMORY_COMPACT_BATCH环境变量.
+            max_chars (int, optional): 摘要长度上限. 默认读取MEMORY_SUMMARY_MAX_CHARS环境变量.
+        """
+        self.batch_size = batch_size or int(os.getenv("MEMORY_COMPACT_BATCH", "10"))
+        self.max_chars = max_chars or int(os.getenv("MEMORY_SUMMARY_MAX_CHARS", "400"))
+        self.lock = threading.Lock()
+        self.in_flight = set()
+        self.stats = {"compactions": 0, "failures": 0, "items": 0}
+
+    def maybe_compact(self, character, ai_client, executor=None):
+        """
+        待整理记忆足够时整理角色记忆；同一角色同时只有一次整理
+
+        Args:
+            character: 角色对象
+            ai_client: 用于生成摘要的AI客户端
+            executor (Executor, optional): 设置后在后台执行，否则同步执行. 默认为None.
+
+        Returns:
+            bool: 是否发起了整理
+        """
+        with self.lock:
+            if character.id in self.in_flight:
+                return False
+            lines = character.take_compaction_batch(self.batch_size)
+            if not lines:
+                return False
+            self.in_flight.add(character.id)
+
+        if executor:
+            executor.submit(self._compact, character, ai_client, lines)
+        else:
+            self._compact(character, ai_client, lines)
+        return True
+
+    def _compact(self, character, ai_client, lines):
+        """
+        把一批记忆合并进角色的摘要
+
+        Args:
+            character: 角色对象
+            ai_client: AI客户端
+            lines (list): 记忆文本列表
+        """
+        previous = character.memory["summary"]
+        try:
+            prompt = MEMORY_SUMMARY_TEMPLATE.format(
+                name=character.name,
+                previous_summary=previous or "无",
+                memories="\n".join(f"- {line}" for line in lines),
+                max_chars=self.max_chars
+            )
+            try:
+                summary = ai_client.generate_response(prompt, character, "memory_summary", fallback=False).strip()
+                failed = not summary
+            except Exception as e:
+                # 优先使用AI客户端绑定了对局上下文的日志器
+                getattr(ai_client, "logger", logger).warning("memory.summary", "{character}的记忆整理失败: {error}",
+                                                             character=character.name, error=str(e))
+                summary, failed = "", True
+
+            if failed:
+                # 模型不可用时保留最近的原文，保证摘要长度仍有上限
+                summary = "；".join(([previous] if previous else []) + lines)[-self.max_chars:]
+            character.memory["summary"] = summary[:self.max_chars]
+
+            with self.lock:
+                self.stats["compactions"] += 1
+                self.stats["failures"] += int(failed)
+                self.stats["items"] += len(lines)
+        finally:
+            with self.lock:
+                self.in_flight.discard(character.id)
+
+    def get_stats(self):
+        """
+        获取整理统计
+
+        Returns:
+            dict: 整理次数、失败次数和整理的记忆条数
+        """
+        with self.lock:
+            return dict(self.stats)
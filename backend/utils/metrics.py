@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+运行耗时指标
+游戏阶段、AI调用（排队、网络、解析）、语音合成、等待语音播放和推送游戏更新的耗时按指标名和标签聚合为直方图，
+可以输出Prometheus文本格式，也可以生成快照在进程之间传递、相减和合并，供批量对局报告使用
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+# 直方图桶上限（秒），覆盖从毫秒级的序列化到分钟级的慢模型调用
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# 指标说明，输出Prometheus格式时作为HELP行
+METRIC_HELP = {
+    "werewolf_phase_seconds": "游戏阶段处理耗时",
+    "werewolf_ai_call_seconds": "AI调用耗时，stage为queue(限流排队)、network(网络)、parse(解析)或total(整体)",
+    "werewolf_voice_wait_seconds": "等待前端语音播放完成的耗时",
+    "werewolf_game_update_seconds": "游戏更新推送耗时，stage为build(构造增量)或emit(序列化并发送)",
+    "werewolf_tts_seconds": "语音合成耗时，stage为first_chunk(首个音频片段)或total(整体)",
+}
+
+
+def label_key(labels):
+    """
+    标签字典转换为稳定的字符串键，同时也是Prometheus格式的标签部分
+
+    Args:
+        labels (dict): 标签
+
+    Returns:
+        str: 形如model="qwen",stage="total"的字符串，按标签名排序
+    """
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in sorted(labels.items()))
+
+
+def _escape(value):
+    """转义Prometheus标签值中的特殊字符"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """耗时直方图注册表，单例模式"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(MetricsRegistry, cls).__new__(cls)
+            cls._instance._init()
+        return cls._instance
+
+    def _init(self):
+        """初始化注册表"""
+        self.lock = threading.Lock()
+        self.buckets = DEFAULT_BUCKETS
+        # 指标名 -> 标签键 -> {"labels", "count", "sum", "buckets"}，buckets为各桶的非累计计数，最后一项为+Inf
+        self.histograms = {}
+
+    def observe(self, name, seconds, **labels):
+        """
+        记录一次耗时
+
+        Args:
+            name (str): 指标名
+            seconds (float): 耗时（秒）
+            **labels: 标签，如model、call_type、phase、stage
+        """
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                index = i
+                break
+        key = label_key(labels)
+        with self.lock:
+            series = self.histograms.setdefault(name, {}).get(key)
+            if series is None:
+                series = {"labels": dict(labels), "count": 0, "sum": 0.0, "buckets": [0] * (len(self.buckets) + 1)}
+                self.histograms[name][key] = series
+            series["count"] += 1
+            series["sum"] += seconds
+            series["buckets"][index] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        统计代码块耗时的上下文管理器，代码块抛出异常时同样记录
+
+        Args:
+            name (str): 指标名
+            **labels: 标签
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """
+        获取当前所有直方图的副本，可以pickle和JSON序列化
+
+        Returns:
+            dict: 指标名 -> 标签键 -> 直方图数据
+        """
+        with self.lock:
+            return {
+                name: {
+                    key: {"labels": dict(s["labels"]), "count": s["count"], "sum": s["sum"], "buckets": list(s["buckets"])}
+                    for key, s in series.items()
+                }
+                for name, series in self.histograms.items()
+            }
+
+    def reset(self):
+        """清空所有指标"""
+        with self.lock:
+            self.histograms = {}
+
+    def render_prometheus(self):
+        """
+        以Prometheus文本格式输出所有直方图
+
+        Returns:
+            str: Prometheus exposition格式文本
+        """
+        lines = []
+        for name, series in sorted(self.snapshot().items()):
+            lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, s in sorted(series.items()):
+                prefix = f"{key}," if key else ""
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), s["buckets"]):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+                labels = f"{{{key}}}" if key else ""
+                lines.append(f"{name}_sum{labels} {s['sum']:.6f}")
+                lines.append(f"{name}_count{labels} {s['count']}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+def diff_snapshots(after, before):
+    """
+    计算两个快照之间新增的观测，用于统计单局游戏（进程池中同一进程会连续运行多局）
+
+    Args:
+        after (dict): 较新的快照
+        before (dict): 较早的快照
+
+    Returns:
+        dict: 只包含有新增观测的直方图
+    """
+    result = {}
+    for name, series in after.items():
+        for key, s in series.items():
+            old = before.get(name, {}).get(key)
+            count = s["count"] - (old["count"] if old else 0)
+            if count <= 0:
+                continue
+            result.setdefault(name, {})[key] = {
+                "labels": dict(s["labels"]),
+                "count": count,
+                "sum": s["sum"] - (old["sum"] if old else 0.0),
+                "buckets": [a - b for a, b in zip(s["buckets"], old["buckets"])] if old else list(s["buckets"])
+            }
+    return result
+
+
+def merge_snapshots(snapshots):
+    """
+    合并多个快照
+
+    Args:
+        snapshots (iterable): 快照列表
+
+    Returns:
+        dict: 合并后的快照
+    """
+    merged = {}
+    for snapshot in snapshots:
+        for name, series in (snapshot or {}).items():
+            for key, s in series.items():
+                target = merged.setdefault(name, {}).get(key)
+                if target is None:
+                    merged[name][key] = {"labels": dict(s["labels"]), "count": s["count"], "sum": s["sum"], "buckets": list(s["buckets"])}
+                    continue
+                target["count"] += s["count"]
+                target["sum"] += s["sum"]
+                target["buckets"] = [a + b for a, b in zip(target["buckets"], s["buckets"])]
+    return merged
+
+
+def estimate_quantile(series, quantile, buckets=DEFAULT_BUCKETS):
+    """
+    按桶内线性插值估算分位数，与Prometheus的histogram_quantile一致；落在+Inf桶时返回最大的有限桶上限
+
+    Args:
+        series (dict): 单个直方图数据
+        quantile (float): 分位数，0到1之间
+        buckets (tuple, optional): 桶上限. 默认为DEFAULT_BUCKETS.
+
+    Returns:
+        float: 估算的分位数（秒）
+    """
+    if not series["count"]:
+        return 0.0
+    rank = quantile * series["count"]
+    cumulative = 0
+    for i, count in enumerate(series["buckets"]):
+        if cumulative + count >= rank and count:
+            if i >= len(buckets):
+                return buckets[-1]
+            lower = buckets[i - 1] if i > 0 else 0.0
+            return lower + (buckets[i] - lower) * (rank - cumulative) / count
+        cumulative += count
+    return buckets[-1]
+
+
+def summarize_snapshot(snapshot):
+    """
+    把快照整理为便于阅读的报告
+
+    Args:
+        snapshot (dict): 快照
+
+    Returns:
+        dict: 指标名 -> 标签键 -> {count, mean, p50, p95}，耗时单位为秒
+    """
+    return {
+        name: {
+            key: {
+                "count": s["count"],
+                "mean": round(s["sum"] / s["count"], 6) if s["count"] else 0.0,
+                "p50": round(estimate_quantile(s, 0.5), 6),
+                "p95": round(estimate_quantile(s, 0.95), 6)
+            }
+            for key, s in sorted(series.items())
+        }
+        for name, series in sorted(snapshot.items())
+    }
+
+
+# 全局实例
+metrics = MetricsRegistry()
+
+
+def _reset_after_fork():
+    """子进程重新创建锁；已有的观测保留，批量对局按快照差值统计每局的耗时"""
+    metrics.lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
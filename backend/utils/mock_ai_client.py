@@ -14,6 +14,11 @@ class MockAIClient(AIClient):
     def __init__(self):
         """初始化模拟AI客户端"""
         super().__init__()
+        self.model_name = "mock"
+        self.service_name = "模拟"
+        self.provider = "mock"
+        # 每个客户端使用独立的随机数生成器，并发调用时不会打乱全局随机序列
+        self.rng = random.Random(random.getrandbits(64))
         self.responses = {
             "werewolf": [
                 "我认为这个人行为很可疑，应该是好人阵营的重要角色。",
@@ -54,12 +59,14 @@ class MockAIClient(AIClient):
             ]
         }
 
-    def generate_response(self, prompt, character=None):
+    def _send_request(self, system_prompt, prompt, call_type, character=None):
         """
-        生成模拟AI响应
+        生成模拟AI响应，调用记录、统计等由基类的generate_response统一处理
 
         Args:
+            system_prompt (str): 系统提示词
             prompt (str): 提示词
+            call_type (str): 调用类型
             character (Character, optional): 角色对象. 默认为None.
 
         Returns:
@@ -68,9 +75,9 @@ class MockAIClient(AIClient):
         # 根据角色和提示词选择合适的响应
         if character and character.role:
             if "讨论阶段" in prompt:
-                return random.choice(self.responses["discussion"])
+                return self.rng.choice(self.responses["discussion"])
             elif character.role in self.responses:
-                return random.choice(self.responses[character.role])
+                return self.rng.choice(self.responses[character.role])
 
         # 默认响应
         return f"这是{character.name if character else '某角色'}的回应：我需要仔细思考当前的情况..."
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+提示词布局
+稳定前缀布局（PROMPT_LAYOUT=stable，默认）下，角色信息、身份说明和调用类型的固定策略指导都放在系统提示词中，
+同一角色、身份和调用类型的系统提示词逐字节相同；天数、存活玩家、上下文和可选目标等易变内容放在用户提示词末尾，
+这样阿里百炼、火山方舟等服务端的前缀缓存可以命中。legacy布局使用原有的完整模板
+"""
+
+import os
+from functools import lru_cache
+
+from backend.utils.prompt_templates import *  # 导入提示词模板
+
+PROMPT_LAYOUT = os.getenv("PROMPT_LAYOUT", "stable").lower()
+
+# 调用类型到（局面、固定指导、回复要求）三段模板的映射，三段依次拼接即为完整模板
+PROMPT_SECTIONS = {
+    "werewolf_kill": (WEREWOLF_KILL_STATE_TEMPLATE, WEREWOLF_KILL_GUIDANCE_TEMPLATE, WEREWOLF_KILL_REPLY_TEMPLATE),
+    "seer_check": (SEER_CHECK_STATE_TEMPLATE, SEER_CHECK_GUIDANCE_TEMPLATE, SEER_CHECK_REPLY_TEMPLATE),
+    "witch_save": (WITCH_SAVE_STATE_TEMPLATE, WITCH_SAVE_GUIDANCE_TEMPLATE, WITCH_SAVE_REPLY_TEMPLATE),
+    "witch_poison": (WITCH_POISON_STATE_TEMPLATE, WITCH_POISON_GUIDANCE_TEMPLATE, WITCH_POISON_REPLY_TEMPLATE),
+    "guard_protect": (GUARD_PROTECT_STATE_TEMPLATE, GUARD_PROTECT_GUIDANCE_TEMPLATE, GUARD_PROTECT_REPLY_TEMPLATE),
+    "hunter_skill": (HUNTER_SKILL_STATE_TEMPLATE, HUNTER_SKILL_GUIDANCE_TEMPLATE, HUNTER_SKILL_REPLY_TEMPLATE),
+    "inner_decision": (DISCUSSION_INNER_DECISION_STATE_TEMPLATE, DISCUSSION_INNER_DECISION_GUIDANCE_TEMPLATE,
+                       DISCUSSION_INNER_DECISION_REPLY_TEMPLATE),
+    "public_speech": (DISCUSSION_PUBLIC_SPEECH_STATE_TEMPLATE, DISCUSSION_PUBLIC_SPEECH_GUIDANCE_TEMPLATE,
+                      DISCUSSION_PUBLIC_SPEECH_REPLY_TEMPLATE),
+    "vote": (VOTE_STATE_TEMPLATE, VOTE_GUIDANCE_TEMPLATE, VOTE_REPLY_TEMPLATE),
+    "pk_speech": (PK_SPEECH_STATE_TEMPLATE, PK_SPEECH_GUIDANCE_TEMPLATE, PK_SPEECH_REPLY_TEMPLATE),
+    "revote": (REVOTE_STATE_TEMPLATE, REVOTE_GUIDANCE_TEMPLATE, REVOTE_REPLY_TEMPLATE),
+}
+
+# {role_specific_guidance}在不同调用类型中取自不同的角色指导
+ROLE_SPECIFIC_GUIDANCE = {
+    "public_speech": ROLE_DISCUSSION_GUIDANCE,
+    "vote": ROLE_VOTE_GUIDANCE,
+}
+
+
+def is_stable_layout():
+    """是否使用稳定前缀布局"""
+    return PROMPT_LAYOUT == "stable"
+
+
+def guidance_fields(call_type, role, name):
+    """
+    固定指导中占位符的取值，只取决于调用类型、角色身份和姓名
+
+    Args:
+        call_type (str): 调用类型
+        role (str): 角色身份
+        name (str): 角色姓名
+
+    Returns:
+        dict: 占位符取值
+    """
+    specific = ROLE_SPECIFIC_GUIDANCE.get(call_type, ROLE_DISCUSSION_GUIDANCE)
+    return {
+        "role_name": name,
+        "role_inner_guidance": ROLE_INNER_DECISION_GUIDANCE.get(role, ROLE_INNER_DECISION_GUIDANCE["villager"]),
+        "role_specific_guidance": specific.get(role, specific["villager"])
+    }
+
+
+def profile_text(name, gender, style):
+    """角色基本信息"""
+    return f"你的角色信息：\n- 姓名：{name}\n- 性别：{gender}\n- 性格：{style}\n"
+
+
+def role_description(role):
+    """角色身份说明，没有专门说明的身份使用村民的说明"""
+    return ROLE_DESCRIPTIONS.get(role, ROLE_DESCRIPTIONS["villager"]) + "\n"
+
+
+def render_prompt(call_type, character, **fields):
+    """
+    按当前布局生成用户提示词
+
+    Args:
+        call_type (str): 调用类型，必须在PROMPT_SECTIONS中
+        character: 角色对象
+        **fields: 局面相关的占位符取值
+
+    Returns:
+        str: 用户提示词；稳定前缀布局下不包含固定指导
+    """
+    state, guidance, reply = PROMPT_SECTIONS[call_type]
+    if is_stable_layout():
+        return (state + reply).format(**fields)
+    return (state + guidance + reply).format(**guidance_fields(call_type, character.role, character.name), **fields)
+
+
+@lru_cache(maxsize=4096)
+def _static_prefix(call_type, role, name, gender, style):
+    """缓存固定前缀，保证同一组参数每次返回同一个字符串"""
+    prefix = "\n\n" + profile_text(name, gender, style) + role_description(role)
+    if call_type in PROMPT_SECTIONS:
+        guidance = PROMPT_SECTIONS[call_type][1].format(**guidance_fields(call_type, role, name))
+        prefix += "\n" + guidance.strip() + "\n"
+    return prefix
+
+
+def static_prefix(character, call_type):
+    """
+    稳定前缀布局下追加到系统提示词的固定内容：角色信息、身份说明和调用类型的固定策略指导
+
+    Args:
+        character: 角色对象
+        call_type (str): 调用类型
+
+    Returns:
+        str: 固定内容，对同一角色、身份和调用类型逐字节相同
+    """
+    return _static_prefix(call_type, character.role, character.name, character.gender, character.style)
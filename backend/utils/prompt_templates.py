@@ -51,7 +51,7 @@ ROLE_DESCRIPTIONS = {
 }
 
 # 狼人阶段提示词
-WEREWOLF_KILL_TEMPLATE = """
+WEREWOLF_KILL_STATE_TEMPLATE = """
 现在是狼人杀游戏的夜晚阶段，你是一名狼人。
 当前存活的玩家有：{alive_players}
 你的狼人同伴是：{werewolf_teammates}
@@ -61,7 +61,8 @@ WEREWOLF_KILL_TEMPLATE = """
 你需要选择一名玩家作为今晚的击杀目标。请从以下玩家中选择：
 {targets}
 
-**狼人击杀策略指导**：
+"""
+WEREWOLF_KILL_GUIDANCE_TEMPLATE = """**狼人击杀策略指导**：
 1. **神职优先**：优先击杀对狼人威胁最大的神职玩家（预言家 > 女巫 > 其他神职）
 2. **信息控制**：击杀掌握关键信息的玩家，减少好人阵营的信息优势
 3. **混乱制造**：选择击杀能制造最大混乱和误导的玩家
@@ -73,13 +74,15 @@ WEREWOLF_KILL_TEMPLATE = """
 - 中优先级：可疑的神职玩家、逻辑清晰的村民
 - 低优先级：情绪化或逻辑混乱的村民
 
-请只回复你选择的玩家姓名，不要有任何其他内容。
 """
+WEREWOLF_KILL_REPLY_TEMPLATE = """请只回复你选择的玩家姓名，不要有任何其他内容。
+"""
+WEREWOLF_KILL_TEMPLATE = WEREWOLF_KILL_STATE_TEMPLATE + WEREWOLF_KILL_GUIDANCE_TEMPLATE + WEREWOLF_KILL_REPLY_TEMPLATE
 
 # WEREWOLF_KILL_REASON_TEMPLATE 已移除 - 简化游戏流程，不再生成击杀理由
 
 # 预言家阶段提示词
-SEER_CHECK_TEMPLATE = """
+SEER_CHECK_STATE_TEMPLATE = """
 现在是狼人杀游戏的夜晚阶段，你是预言家。
 当前存活的玩家有：{alive_players}
 
@@ -88,18 +91,21 @@ SEER_CHECK_TEMPLATE = """
 你需要选择一名玩家进行查验。请从以下玩家中选择：
 {targets}
 
-**预言家查验策略指导**：
+"""
+SEER_CHECK_GUIDANCE_TEMPLATE = """**预言家查验策略指导**：
 1. **首日查验**：第一天优先查验行为可疑的玩家，为后续分析提供基础
 2. **信息价值最大化**：选择能提供最多信息的玩家进行查验
 3. **避免重复查验**：不要重复查验已经查验过的玩家
 4. **关联性查验**：如果已经找到狼人，查验与该狼人互动密切的玩家
 5. **风险控制**：优先查验对好人阵营威胁最大的可疑玩家
 
-请只回复你选择查验的玩家姓名，不要有任何其他内容。
 """
+SEER_CHECK_REPLY_TEMPLATE = """请只回复你选择查验的玩家姓名，不要有任何其他内容。
+"""
+SEER_CHECK_TEMPLATE = SEER_CHECK_STATE_TEMPLATE + SEER_CHECK_GUIDANCE_TEMPLATE + SEER_CHECK_REPLY_TEMPLATE
 
 # 女巫阶段提示词
-WITCH_SAVE_TEMPLATE = """
+WITCH_SAVE_STATE_TEMPLATE = """
 现在是狼人杀游戏的夜晚阶段，你是女巫。
 当前存活的玩家有：{alive_players}
 
@@ -107,7 +113,8 @@ WITCH_SAVE_TEMPLATE = """
 
 今晚{killed}被狼人杀害了。你有一瓶解药，可以救活他。
 
-**女巫救人策略指导**：
+"""
+WITCH_SAVE_GUIDANCE_TEMPLATE = """**女巫救人策略指导**：
 1. **神职优先**：优先救预言家、女巫等关键神职玩家
 2. **信息价值**：考虑被救玩家掌握的信息对好人阵营的价值
 3. **局势评估**：评估当前好人阵营的处境，是否值得使用解药
@@ -118,10 +125,12 @@ WITCH_SAVE_TEMPLATE = """
 - 如果你认为被杀的玩家是预言家或其他关键神职，强烈建议使用解药！
 - 解药只能使用一次，必须谨慎决策！
 
-请只回复"救"或"不救"，不要有任何其他内容。
 """
+WITCH_SAVE_REPLY_TEMPLATE = """请只回复"救"或"不救"，不要有任何其他内容。
+"""
+WITCH_SAVE_TEMPLATE = WITCH_SAVE_STATE_TEMPLATE + WITCH_SAVE_GUIDANCE_TEMPLATE + WITCH_SAVE_REPLY_TEMPLATE
 
-WITCH_POISON_TEMPLATE = """
+WITCH_POISON_STATE_TEMPLATE = """
 现在是狼人杀游戏的夜晚阶段，你是女巫。
 当前存活的玩家有：{alive_players}
 
@@ -129,7 +138,8 @@ WITCH_POISON_TEMPLATE = """
 
 你有一瓶毒药，可以毒死一名玩家。
 
-请考虑以下因素：
+"""
+WITCH_POISON_GUIDANCE_TEMPLATE = """请考虑以下因素：
 1. **积极使用策略**：如果你确定某人是狼人，果断使用毒药来扭转局势
 2. 你是否非常确定某人是狼人？如果不确定，最好不要使用毒药
 3. 现在使用毒药是否值得？还是应该留到更关键的时刻？
@@ -142,15 +152,17 @@ WITCH_POISON_TEMPLATE = """
 - 如果你不确定，请选择不使用毒药
 - **不要过于保守**：毒药的价值在于使用，而不是保留
 
-如果你决定使用毒药，请回复要毒死的玩家姓名；如果决定不使用，请回复"不使用"。
 """
+WITCH_POISON_REPLY_TEMPLATE = """如果你决定使用毒药，请回复要毒死的玩家姓名；如果决定不使用，请回复"不使用"。
+"""
+WITCH_POISON_TEMPLATE = WITCH_POISON_STATE_TEMPLATE + WITCH_POISON_GUIDANCE_TEMPLATE + WITCH_POISON_REPLY_TEMPLATE
 
 # WITCH_POISON_REASON_TEMPLATE 已移除 - 简化游戏流程，不再生成毒人理由
 
 
 
 # 讨论前内心决策提示词（第一阶段：分析思考）
-DISCUSSION_INNER_DECISION_TEMPLATE = """
+DISCUSSION_INNER_DECISION_STATE_TEMPLATE = """
 现在是狼人杀游戏的讨论阶段，在发表公开言论之前，请先进行内心分析。
 
 游戏信息：
@@ -160,7 +172,8 @@ DISCUSSION_INNER_DECISION_TEMPLATE = """
 
 {context}
 
-**讨论阶段策略指导**：
+"""
+DISCUSSION_INNER_DECISION_GUIDANCE_TEMPLATE = """**讨论阶段策略指导**：
 1. **首日策略**：第一天以观察和信息收集为主，不要轻易暴露关键信息
 2. **身份保护**：如果你是神职，评估暴露身份的风险和收益
 3. **信息分析**：基于已知信息进行逻辑推理，寻找狼人的破绽
@@ -174,11 +187,13 @@ DISCUSSION_INNER_DECISION_TEMPLATE = """
 
 {role_inner_guidance}
 
-请简洁回答（不超过150字），这些分析将指导你的公开发言。
 """
+DISCUSSION_INNER_DECISION_REPLY_TEMPLATE = """请简洁回答（不超过150字），这些分析将指导你的公开发言。
+"""
+DISCUSSION_INNER_DECISION_TEMPLATE = DISCUSSION_INNER_DECISION_STATE_TEMPLATE + DISCUSSION_INNER_DECISION_GUIDANCE_TEMPLATE + DISCUSSION_INNER_DECISION_REPLY_TEMPLATE
 
 # 讨论阶段公开发言提示词（第二阶段：基于内心决策的发言）
-DISCUSSION_PUBLIC_SPEECH_TEMPLATE = """
+DISCUSSION_PUBLIC_SPEECH_STATE_TEMPLATE = """
 基于你刚才的内心分析和决策，现在请发表公开言论。
 
 {inner_decision_summary}
@@ -188,9 +203,11 @@ DISCUSSION_PUBLIC_SPEECH_TEMPLATE = """
 - 存活玩家：{alive_players}
 - 死亡玩家：{dead_players}
 
-{role_specific_guidance}
+"""
+DISCUSSION_PUBLIC_SPEECH_GUIDANCE_TEMPLATE = """{role_specific_guidance}
 
-请以你的角色身份发表一段简短的发言（不超过100字），表达你的看法、怀疑或辩解。
+"""
+DISCUSSION_PUBLIC_SPEECH_REPLY_TEMPLATE = """请以你的角色身份发表一段简短的发言（不超过100字），表达你的看法、怀疑或辩解。
 你的发言应该：
 1. 符合你刚才制定的发言策略
 2. 有逻辑性和说服力
@@ -198,6 +215,7 @@ DISCUSSION_PUBLIC_SPEECH_TEMPLATE = """
 
 注意：你的发言将被所有存活玩家听到，请谨慎选择要透露的信息。
 """
+DISCUSSION_PUBLIC_SPEECH_TEMPLATE = DISCUSSION_PUBLIC_SPEECH_STATE_TEMPLATE + DISCUSSION_PUBLIC_SPEECH_GUIDANCE_TEMPLATE + DISCUSSION_PUBLIC_SPEECH_REPLY_TEMPLATE
 
 # 角色特定的讨论指导
 ROLE_DISCUSSION_GUIDANCE = {
@@ -282,7 +300,7 @@ ROLE_INNER_DECISION_GUIDANCE = {
 }
 
 # 投票阶段提示词
-VOTE_TEMPLATE = """
+VOTE_STATE_TEMPLATE = """
 现在是狼人杀游戏的投票阶段，请根据你的角色和游戏情况决定投票给谁。
 
 游戏信息：
@@ -291,7 +309,8 @@ VOTE_TEMPLATE = """
 
 {context}
 
-**投票阶段策略指导**：
+"""
+VOTE_GUIDANCE_TEMPLATE = """**投票阶段策略指导**：
 1. **逻辑合理**：你的投票可以基于你的发言和大家的讨论给出威胁最大的角色
 3. **团队协作**：如果你是好人，支持可信的神职玩家的意见
 4. **风险评估**：考虑投票结果对己方阵营的影响
@@ -299,11 +318,13 @@ VOTE_TEMPLATE = """
 
 {role_specific_guidance}
 
-你需要投票处决一名玩家。请从以下玩家中选择一名你认为最可疑的：
+"""
+VOTE_REPLY_TEMPLATE = """你需要投票处决一名玩家。请从以下玩家中选择一名你认为最可疑的：
 {targets}
 
 请只回复你要投票的玩家姓名，不要有任何其他内容。
 """
+VOTE_TEMPLATE = VOTE_STATE_TEMPLATE + VOTE_GUIDANCE_TEMPLATE + VOTE_REPLY_TEMPLATE
 
 # 角色特定的投票指导
 ROLE_VOTE_GUIDANCE = {
@@ -335,7 +356,7 @@ ROLE_VOTE_GUIDANCE = {
 # VOTE_REASON_TEMPLATE 已移除 - 简化游戏流程，不再生成投票理由
 
 # 守卫阶段提示词
-GUARD_PROTECT_TEMPLATE = """
+GUARD_PROTECT_STATE_TEMPLATE = """
 现在是狼人杀游戏的夜晚阶段，你是守卫。
 当前存活的玩家有：{alive_players}
 
@@ -344,23 +365,27 @@ GUARD_PROTECT_TEMPLATE = """
 你需要选择一名玩家进行保护。请从以下玩家中选择：
 {targets}
 
-请考虑以下因素：
+"""
+GUARD_PROTECT_GUIDANCE_TEMPLATE = """请考虑以下因素：
 1. 优先保护可能的神职玩家（如预言家、女巫）
 2. 考虑保护对好人阵营重要的玩家
 3. 避免连续两晚保护同一个人
 4. 根据当前局势判断谁最需要保护
 
-请只回复你选择保护的玩家姓名，不要有任何其他内容。
 """
+GUARD_PROTECT_REPLY_TEMPLATE = """请只回复你选择保护的玩家姓名，不要有任何其他内容。
+"""
+GUARD_PROTECT_TEMPLATE = GUARD_PROTECT_STATE_TEMPLATE + GUARD_PROTECT_GUIDANCE_TEMPLATE + GUARD_PROTECT_REPLY_TEMPLATE
 
 # 猎人技能提示词
-HUNTER_SKILL_TEMPLATE = """
+HUNTER_SKILL_STATE_TEMPLATE = """
 现在是狼人杀游戏中，你是猎人，即将被投票处决或死亡。
 当前存活的玩家有：{alive_players}
 
 {context}
 
-作为猎人，你可以在死亡时发动技能，带走一名玩家。
+"""
+HUNTER_SKILL_GUIDANCE_TEMPLATE = """作为猎人，你可以在死亡时发动技能，带走一名玩家。
 
 请考虑以下因素：
 1. 优先选择你认为是狼人的玩家
@@ -368,17 +393,20 @@ HUNTER_SKILL_TEMPLATE = """
 3. 考虑对游戏局势的影响
 4. 根据你掌握的信息做出明智选择
 
-请只回复你选择带走的玩家姓名，不要有任何其他内容。
 """
+HUNTER_SKILL_REPLY_TEMPLATE = """请只回复你选择带走的玩家姓名，不要有任何其他内容。
+"""
+HUNTER_SKILL_TEMPLATE = HUNTER_SKILL_STATE_TEMPLATE + HUNTER_SKILL_GUIDANCE_TEMPLATE + HUNTER_SKILL_REPLY_TEMPLATE
 
 # PK发言提示词  
-PK_SPEECH_TEMPLATE = """
+PK_SPEECH_STATE_TEMPLATE = """
 现在是狼人杀游戏的PK阶段，由于投票平票，你进入了PK环节。
 当前存活的玩家有：{alive_players}
 
 {context}
 
-这是你为自己辩护的最后机会！请发表一段有力的陈述来证明自己的清白，说服其他玩家不要投票给你。
+"""
+PK_SPEECH_GUIDANCE_TEMPLATE = """这是你为自己辩护的最后机会！请发表一段有力的陈述来证明自己的清白，说服其他玩家不要投票给你。
 
 请考虑以下要点：
 1. 强调自己对好人阵营的贡献
@@ -389,18 +417,21 @@ PK_SPEECH_TEMPLATE = """
 
 {role_inner_guidance}
 
-请发表一段简洁有力的PK陈述（不超过100字）：
 """
+PK_SPEECH_REPLY_TEMPLATE = """请发表一段简洁有力的PK陈述（不超过100字）：
+"""
+PK_SPEECH_TEMPLATE = PK_SPEECH_STATE_TEMPLATE + PK_SPEECH_GUIDANCE_TEMPLATE + PK_SPEECH_REPLY_TEMPLATE
 
 # 重新投票提示词
-REVOTE_TEMPLATE = """
+REVOTE_STATE_TEMPLATE = """
 现在是狼人杀游戏的重新投票阶段，你需要在PK候选人中选择一个投票。
-当前存活的玩家有：{alive_characters}
+当前存活的玩家有：{alive_players}
 PK候选人：{targets}
 
 {context}
 
-请仔细分析刚才的PK发言，并做出你的最终投票决定。
+"""
+REVOTE_GUIDANCE_TEMPLATE = """请仔细分析刚才的PK发言，并做出你的最终投票决定。
 
 请考虑以下因素：
 1. 谁的PK陈述更有说服力？
@@ -410,8 +441,10 @@ PK候选人：{targets}
 
 {role_inner_guidance}
 
-请只回复你要投票的玩家姓名，不要有任何其他内容。
 """
+REVOTE_REPLY_TEMPLATE = """请只回复你要投票的玩家姓名，不要有任何其他内容。
+"""
+REVOTE_TEMPLATE = REVOTE_STATE_TEMPLATE + REVOTE_GUIDANCE_TEMPLATE + REVOTE_REPLY_TEMPLATE
 
 # 统一策略指导模板
 UNIFIED_STRATEGY_GUIDANCE = """
@@ -435,4 +468,17 @@ UNIFIED_STRATEGY_GUIDANCE = """
 3. **信息价值**：每次行动都要考虑对阵营的价值
 4. **局势评估**：时刻评估当前局势，调整策略
 5. **风险控制**：避免不必要的风险，保护关键角色
-"""
\ No newline at end of file
+"""
+# 记忆整理提示词
+MEMORY_SUMMARY_TEMPLATE = """
+你是狼人杀游戏中的{name}，下面是你之前的记忆摘要和一批更早的记忆，请把它们整理成一份新的记忆摘要。
+
+之前的记忆摘要：
+{previous_summary}
+
+需要整理的记忆：
+{memories}
+
+请保留对后续推理有用的关键事实：谁声称了什么身份、谁投票给了谁、谁被处决或死亡、你的查验或行动结果、你对各玩家的主要怀疑。
+去掉重复和无关的细节，用第一人称书写，不超过{max_chars}字，只输出摘要内容：
+"""
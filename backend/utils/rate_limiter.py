@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+模型服务限流器
+按(服务商, 模型)共享令牌桶和并发上限，所有角色、所有对局的调用都经过同一个限流器，
+排队的调用在不同对局之间轮转放行，避免某一局占满配额
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+
+def _parse_limit(value):
+    """
+    解析限流配置
+
+    Args:
+        value (str): "每秒请求数:最大并发数"，任一项为0表示不限制，如"10:8"
+
+    Returns:
+        tuple: (rps, max_in_flight)
+    """
+    rps, _, max_in_flight = value.partition(":")
+    return float(rps or 0), int(max_in_flight or 0)
+
+
+class RateLimiter:
+    """单个(服务商, 模型)的令牌桶加并发上限"""
+
+    def __init__(self, rps=0, max_in_flight=0, burst=None):
+        """
+        初始化限流器
+
+        Args:
+            rps (float, optional): 每秒允许发起的请求数，0表示不限制. 默认为0.
+            max_in_flight (int, optional): 同时进行的最大请求数，0表示不限制. 默认为0.
+            burst (int, optional): 令牌桶容量. 默认为max(1, rps).
+        """
+        self.condition = threading.Condition()
+        self.configure(rps, max_in_flight, burst)
+        self.tokens = self.burst
+        self.last_refill = time.monotonic()
+        self.in_flight = 0
+        # 按对局排队的等待者，OrderedDict的顺序即轮转顺序
+        self.waiters = OrderedDict()
+        self.stats = {"acquired": 0, "total_wait": 0.0, "max_wait": 0.0, "peak_in_flight": 0, "per_game": {}}
+
+    def configure(self, rps=0, max_in_flight=0, burst=None):
+        """
+        更新限流参数
+
+        Args:
+            rps (float): 每秒请求数
+            max_in_flight (int): 最大并发数
+            burst (int, optional): 令牌桶容量
+        """
+        with self.condition:
+            self.rps = rps
+            self.max_in_flight = max_in_flight
+            self.burst = burst or max(1, rps)
+            self.condition.notify_all()
+
+    def _refill(self, now):
+        """按经过的时间补充令牌（调用方需持有锁）"""
+        if self.rps:
+            self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rps)
+        self.last_refill = now
+
+    def _next_game(self):
+        """获取轮到放行的对局（调用方需持有锁）"""
+        return next(iter(self.waiters), None)
+
+    def acquire(self, game_id=None):
+        """
+        获取一个调用配额，必要时阻塞等待
+
+        Args:
+            game_id (str, optional): 对局ID，用于在对局之间公平调度. 默认为None.
+
+        Returns:
+            float: 排队等待的秒数
+        """
+        ticket = object()
+        start = time.monotonic()
+        with self.condition:
+            self.waiters.setdefault(game_id, deque()).append(ticket)
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                queue = self.waiters.get(game_id)
+                my_turn = self._next_game() == game_id and queue[0] is ticket
+                has_slot = not self.max_in_flight or self.in_flight < self.max_in_flight
+                has_token = not self.rps or self.tokens >= 1
+
+                if my_turn and has_slot and has_token:
+                    break
+
+                timeout = None
+                if my_turn and has_slot and not has_token:
+                    timeout = (1 - self.tokens) / self.rps
+                self.condition.wait(timeout)
+
+            # 放行后把本局移到队尾，下一个配额轮到其他对局
+            queue.popleft()
+            del self.waiters[game_id]
+            if queue:
+                self.waiters[game_id] = queue
+
+            if self.rps:
+                self.tokens -= 1
+            self.in_flight += 1
+
+            waited = time.monotonic() - start
+            self.stats["acquired"] += 1
+            self.stats["total_wait"] += waited
+            self.stats["max_wait"] = max(self.stats["max_wait"], waited)
+            self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.in_flight)
+            game_stats = self.stats["per_game"].setdefault(str(game_id), {"acquired": 0, "total_wait": 0.0})
+            game_stats["acquired"] += 1
+            game_stats["total_wait"] += waited
+            self.condition.notify_all()
+            return waited
+
+    def release(self):
+        """归还并发配额"""
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    @contextmanager
+    def slot(self, game_id=None):
+        """
+        以上下文管理器形式占用一个调用配额
+
+        Args:
+            game_id (str, optional): 对局ID. 默认为None.
+        """
+        self.acquire(game_id)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def get_stats(self):
+        """
+        获取限流统计
+
+        Returns:
+            dict: 放行次数、排队时间、当前排队数和并发数
+        """
+        with self.condition:
+            acquired = self.stats["acquired"]
+            return {
+                "rps": self.rps,
+                "max_in_flight": self.max_in_flight,
+                "acquired": acquired,
+                "average_wait": self.stats["total_wait"] / acquired if acquired else 0,
+                "max_wait": self.stats["max_wait"],
+                "waiting": sum(len(queue) for queue in self.waiters.values()),
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.stats["peak_in_flight"],
+                "per_game": {game: dict(stats) for game, stats in self.stats["per_game"].items()}
+            }
+
+
+class RateLimiterRegistry:
+    """限流器注册表，单例模式，同一(服务商, 模型)在进程内共享一个限流器"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(RateLimiterRegistry, cls).__new__(cls)
+            cls._instance._init()
+        return cls._instance
+
+    def _init(self):
+        """初始化注册表"""
+        self.lock = threading.Lock()
+        self.limiters = {}
+        self.overrides = {}
+
+    def _default_limit(self, provider):
+        """
+        读取服务商的默认限流配置：AI_RATE_LIMIT_<服务商>，否则AI_RATE_LIMIT，均未设置时不限制
+
+        Args:
+            provider (str): 服务商名称
+
+        Returns:
+            tuple: (rps, max_in_flight)
+        """
+        value = os.getenv(f"AI_RATE_LIMIT_{provider.upper()}") or os.getenv("AI_RATE_LIMIT", "0:0")
+        return _parse_limit(value)
+
+    def get(self, provider, model):
+        """
+        获取(服务商, 模型)对应的限流器
+
+        Args:
+            provider (str): 服务商名称，如"dashscope"、"deepseek"、"ark"
+            model (str): 模型名称
+
+        Returns:
+            RateLimiter: 限流器
+        """
+        key = (provider, model)
+        with self.lock:
+            limiter = self.limiters.get(key)
+            if limiter is None:
+                rps, max_in_flight = self.overrides.get(key) or self.overrides.get((provider, None)) or self._default_limit(provider)
+                limiter = RateLimiter(rps, max_in_flight)
+                self.limiters[key] = limiter
+            return limiter
+
+    def configure(self, provider, model=None, rps=0, max_in_flight=0):
+        """
+        设置限流参数，model为None时对该服务商的所有模型生效
+
+        Args:
+            provider (str): 服务商名称
+            model (str, optional): 模型名称. 默认为None.
+            rps (float, optional): 每秒请求数. 默认为0.
+            max_in_flight (int, optional): 最大并发数. 默认为0.
+        """
+        with self.lock:
+            self.overrides[(provider, model)] = (rps, max_in_flight)
+            limiters = [limiter for (p, m), limiter in self.limiters.items()
+                        if p == provider and (model is None or m == model)]
+        for limiter in limiters:
+            limiter.configure(rps, max_in_flight)
+
+    def get_stats(self):
+        """
+        获取所有限流器的统计
+
+        Returns:
+            dict: 以"服务商/模型"为键的统计
+        """
+        with self.lock:
+            limiters = dict(self.limiters)
+        return {f"{provider}/{model}": limiter.get_stats() for (provider, model), limiter in limiters.items()}
+
+    def reset(self):
+        """清空所有限流器和配置"""
+        with self.lock:
+            self.limiters.clear()
+            self.overrides.clear()
+
+
+# 全局实例
+rate_limiter_registry = RateLimiterRegistry()
+
+
+def _reset_after_fork():
+    """子进程重新创建锁和限流器，父进程的等待队列在子进程中没有意义"""
+    rate_limiter_registry.lock = threading.Lock()
+    rate_limiter_registry.limiters = {}
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
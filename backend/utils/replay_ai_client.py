@@ -0,0 +1,355 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+AI调用录制与回放客户端
+RecordingAIClient包装任意AIClient，把每次逻辑调用的提示词、最终结果和耗时追加写入JSONL文件
+（容错策略内部的重试和对冲请求不单独录制）；ReplayAIClient读取该文件，按角色调用顺序或提示词哈希
+返回录制的响应，不经过重试和对冲，用于离线复现对局
+"""
+
+import os
+import json
+import time
+import hashlib
+import builtins
+import importlib
+import threading
+from collections import defaultdict, deque
+
+from backend.utils.ai_client import AIClient, get_ai_client
+
+# 同一录制文件的写入锁，多个角色的客户端共享一个文件
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+
+def _get_file_lock(path):
+    """
+    获取录制文件对应的写入锁
+
+    Args:
+        path (str): 录制文件路径
+
+    Returns:
+        threading.Lock: 写入锁
+    """
+    key = os.path.abspath(path)
+    with _file_locks_guard:
+        lock = _file_locks.get(key)
+        if lock is None:
+            lock = threading.Lock()
+            _file_locks[key] = lock
+        return lock
+
+
+def prompt_hash(system_prompt, prompt):
+    """
+    计算提示词哈希，用于按内容匹配录制的响应
+
+    Args:
+        system_prompt (str): 系统提示词
+        prompt (str): 用户提示词
+
+    Returns:
+        str: SHA-256十六进制摘要
+    """
+    payload = json.dumps([system_prompt, prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _character_key(character):
+    """获取角色在录制文件中的标识"""
+    return character.name if character else ""
+
+
+class RecordedError(Exception):
+    """无法按原类型重建的录制错误，保留原类型名和HTTP状态码"""
+
+    def __init__(self, message, error_type=None, status_code=None):
+        super().__init__(message)
+        self.error_type = error_type
+        self.status_code = status_code
+
+
+def _error_type(error):
+    """获取异常类型的完整名称"""
+    cls = type(error)
+    return cls.__qualname__ if cls.__module__ == "builtins" else f"{cls.__module__}.{cls.__qualname__}"
+
+
+def recorded_error(record):
+    """
+    按录制的类型重建调用失败时的异常
+
+    Args:
+        record (dict): 录制记录
+
+    Returns:
+        Exception: 与录制时同类型的异常；类型不可导入或构造参数不兼容时返回RecordedError
+    """
+    message = record["error"]
+    error_type = record.get("error_type")
+    status_code = record.get("status_code")
+    cls = None
+    if error_type:
+        module_name, _, name = error_type.rpartition(".")
+        try:
+            cls = getattr(importlib.import_module(module_name) if module_name else builtins, name)
+        except (ImportError, AttributeError):
+            cls = None
+    error = None
+    if isinstance(cls, type) and issubclass(cls, Exception):
+        try:
+            error = cls(message)
+        except Exception:
+            error = None
+    if error is None:
+        return RecordedError(message, error_type, status_code)
+    if status_code is not None:
+        try:
+            error.status_code = status_code
+        except AttributeError:
+            pass
+    return error
+
+
+class RecordingAIClient(AIClient):
+    """录制AI客户端，包装真实客户端并记录每次调用"""
+
+    def __init__(self, client, path):
+        """
+        初始化录制客户端
+
+        Args:
+            client (AIClient): 被包装的AI客户端
+            path (str): 录制文件路径，以追加方式写入
+        """
+        super().__init__()
+        self.client = client
+        self.path = path
+        self.model_name = client.model_name
+        self.service_name = client.service_name
+        self.provider = client.provider
+        self.fallback_text = client.fallback_text
+        self.temperature = client.temperature
+        self.context_window = client.context_window
+        self.max_output_tokens = client.max_output_tokens
+        self.lock = _get_file_lock(path)
+        self.sequences = defaultdict(int)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def output_tokens(self, call_type):
+        """输出token上限与被包装的客户端一致"""
+        return self.client.output_tokens(call_type)
+
+    def context_budget(self):
+        """上下文预算与被包装的客户端一致，录制时组装的提示词与不录制时相同"""
+        return self.client.context_budget()
+
+    def _send_request(self, system_prompt, prompt, call_type, character=None):
+        """单次请求交给被包装的客户端"""
+        return self.client._send_request(system_prompt, prompt, call_type, character)
+
+    def _send_stream_request(self, system_prompt, prompt, call_type, character=None):
+        """单次流式请求交给被包装的客户端"""
+        return self.client._send_stream_request(system_prompt, prompt, call_type, character)
+
+    def _request_with_policy(self, system_prompt, prompt, call_type, character=None, on_delta=None):
+        """
+        按容错策略完成一次逻辑调用并录制最终结果；重试和对冲产生的中间尝试不录制，
+        失败的调用同样录制（含异常类型）以便回放时复现兜底逻辑
+
+        Returns:
+            str: 最终采用的响应
+        """
+        start = time.time()
+        response, error = None, None
+        try:
+            response = super()._request_with_policy(system_prompt, prompt, call_type, character, on_delta)
+            return response
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._write(character, system_prompt, prompt, call_type, response, error, time.time() - start)
+
+    def _write(self, character, system_prompt, prompt, call_type, response, error, latency):
+        """追加一条录制记录"""
+        key = _character_key(character)
+        with self.lock:
+            record = {
+                "character": key,
+                "seq": self.sequences[key],
+                "call_type": call_type,
+                "model": self.model_name,
+                "hash": prompt_hash(system_prompt, prompt),
+                "prompt": prompt,
+                "response": response,
+                "error": str(error) if error else None,
+                "error_type": _error_type(error) if error else None,
+                "status_code": getattr(error, "status_code", None) if error else None,
+                "latency": round(latency, 4)
+            }
+            self.sequences[key] += 1
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class ReplayLog:
+    """录制文件的内存索引，多个回放客户端共享，保证每条记录只被回放一次"""
+
+    def __init__(self, path):
+        """
+        加载录制文件
+
+        Args:
+            path (str): 录制文件路径
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.by_character = defaultdict(deque)
+        self.by_hash = defaultdict(deque)
+
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                self.by_character[record["character"]].append(record)
+                self.by_hash[record["hash"]].append(record)
+
+    def next_record(self, system_prompt, prompt, character, match):
+        """
+        取出下一条匹配的录制记录
+
+        Args:
+            system_prompt (str): 系统提示词
+            prompt (str): 用户提示词
+            character (Character): 角色对象
+            match (str): 匹配方式
+
+        Returns:
+            dict: 录制记录，没有匹配时返回None
+        """
+        with self.lock:
+            if match == "hash":
+                records = self.by_hash.get(prompt_hash(system_prompt, prompt))
+            else:
+                records = self.by_character.get(_character_key(character))
+            if not records:
+                return None
+            record = records.popleft()
+            # 同一条记录不能被另一种索引再次取出
+            other = self.by_character[record["character"]] if match == "hash" else self.by_hash[record["hash"]]
+            try:
+                other.remove(record)
+            except ValueError:
+                pass
+            return record
+
+
+class ReplayAIClient(AIClient):
+    """回放AI客户端，从录制文件返回响应，不访问网络"""
+
+    def __init__(self, log, match="sequence", honor_latency=False, model_name="replay"):
+        """
+        初始化回放客户端
+
+        Args:
+            log (str|ReplayLog): 录制文件路径或已加载的录制索引
+            match (str, optional): 匹配方式，"sequence"按角色的调用顺序，"hash"按提示词哈希. 默认为"sequence".
+            honor_latency (bool, optional): 是否按录制的耗时等待后再返回. 默认为False.
+            model_name (str, optional): 模型名称. 默认为"replay".
+        """
+        super().__init__()
+        if match not in ("sequence", "hash"):
+            raise ValueError(f"未知的匹配方式: {match}")
+
+        self.log = log if isinstance(log, ReplayLog) else ReplayLog(log)
+        self.match = match
+        self.honor_latency = honor_latency
+        self.model_name = model_name
+        self.service_name = "回放"
+        self.provider = "replay"
+
+    def _send_request(self, system_prompt, prompt, call_type, character=None):
+        """
+        返回录制的响应
+
+        Args:
+            system_prompt (str): 系统提示词
+            prompt (str): 用户提示词
+            call_type (str): 调用类型
+            character (Character, optional): 角色对象. 默认为None.
+
+        Returns:
+            str: 录制的响应；录制时失败的调用按原异常类型再次抛出
+        """
+        record = self.log.next_record(system_prompt, prompt, character, self.match)
+        if record is None:
+            raise Exception(f"录制文件中没有匹配的调用: 角色={_character_key(character)}，类型={call_type}")
+
+        if self.match == "sequence" and record["call_type"] != call_type:
+            self.logger.warning("replay.mismatch", "回放警告: {character}第{seq}次调用类型不一致，录制为{recorded}，当前为{call_type}",
+                                character=record["character"], seq=record["seq"], recorded=record["call_type"], call_type=call_type)
+
+        if self.honor_latency:
+            time.sleep(record["latency"])
+
+        if record["error"]:
+            raise recorded_error(record)
+        return record["response"]
+
+    def _request_with_policy(self, system_prompt, prompt, call_type, character=None, on_delta=None):
+        """
+        直接返回录制的最终结果，不经过限流、重试和对冲：录制时这些已经发生过，
+        再次重试会多取录制记录，使之后按顺序匹配的调用错位
+
+        Returns:
+            str: 录制的响应
+        """
+        response = self._send_request(system_prompt, prompt, call_type, character)
+        if on_delta and response:
+            on_delta(response)
+        return response
+
+
+def get_recording_ai_client_factory(path, client_factory=None):
+    """
+    获取录制客户端工厂，可直接传给GameEngine.load_characters
+
+    Args:
+        path (str): 录制文件路径
+        client_factory (callable, optional): 创建被包装客户端的函数. 默认为get_ai_client.
+
+    Returns:
+        callable: 根据模型名称创建录制客户端的函数
+    """
+    client_factory = client_factory or get_ai_client
+
+    def factory(model_name):
+        client = client_factory(model_name)
+        return RecordingAIClient(client, path) if client else None
+
+    return factory
+
+
+def get_replay_ai_client_factory(path, match="sequence", honor_latency=False):
+    """
+    获取回放客户端工厂，每个角色一个回放客户端，共享同一份录制索引
+
+    Args:
+        path (str): 录制文件路径
+        match (str, optional): 匹配方式. 默认为"sequence".
+        honor_latency (bool, optional): 是否按录制耗时等待. 默认为False.
+
+    Returns:
+        callable: 根据模型名称返回回放客户端的函数
+    """
+    log = ReplayLog(path)
+    return lambda model_name: ReplayAIClient(log, match, honor_latency, model_name)
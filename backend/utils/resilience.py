@@ -0,0 +1,333 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+模型调用容错策略
+对临时性错误进行带随机抖动的指数退避重试；调用耗时超过近期P95时发起对冲请求；
+按服务商熔断，服务不可用时快速失败而不是让每次调用都等待超时
+"""
+
+import os
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+import openai
+
+# 视为临时性错误的HTTP状态码
+TRANSIENT_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开，调用被直接拒绝"""
+
+
+def is_transient_error(error):
+    """
+    判断错误是否值得重试
+
+    Args:
+        error (Exception): 调用抛出的异常
+
+    Returns:
+        bool: 网络错误、超时、限流和服务端错误返回True
+    """
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, openai.APIConnectionError)):
+        return True
+
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        response = getattr(error, "response", None)
+        status_code = getattr(response, "status_code", None)
+    return status_code in TRANSIENT_STATUS_CODES
+
+
+class CircuitBreaker:
+    """单个服务商的熔断器"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        """
+        初始化熔断器
+
+        Args:
+            failure_threshold (int, optional): 连续失败多少次后打开. 默认为5.
+            reset_timeout (float, optional): 打开后多少秒允许一次试探调用. 默认为30.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+
+    def allow(self):
+        """
+        判断当前是否允许发起调用
+
+        Returns:
+            bool: 是否允许
+        """
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self.trial_in_flight = False
+            if self.state == "half_open" and not self.trial_in_flight:
+                # 半开状态只放行一次试探调用
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        """调用成功，关闭熔断器"""
+        with self.lock:
+            self.state = "closed"
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        """调用失败，连续失败达到阈值或试探失败时打开熔断器"""
+        with self.lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.trial_in_flight = False
+
+
+class LatencyTracker:
+    """最近调用耗时的滑动窗口，用于计算对冲阈值"""
+
+    def __init__(self, window=200):
+        """
+        初始化耗时统计
+
+        Args:
+            window (int, optional): 保留的样本数. 默认为200.
+        """
+        self.lock = threading.Lock()
+        self.samples = deque(maxlen=window)
+
+    def add(self, latency):
+        """记录一次成功调用的耗时"""
+        with self.lock:
+            self.samples.append(latency)
+
+    def percentile(self, q, min_samples=1):
+        """
+        计算耗时分位数
+
+        Args:
+            q (float): 分位数，0-1之间
+            min_samples (int, optional): 样本不足时返回None. 默认为1.
+
+        Returns:
+            float: 分位数耗时（秒）
+        """
+        with self.lock:
+            if len(self.samples) < max(1, min_samples):
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ResiliencePolicy:
+    """模型调用容错策略，单例模式，熔断器和统计在进程内共享"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ResiliencePolicy, cls).__new__(cls)
+            cls._instance._init()
+        return cls._instance
+
+    def _init(self):
+        """初始化策略，默认从环境变量读取配置"""
+        self.lock = threading.Lock()
+        self.rng = random.Random()
+        self.max_retries = int(os.getenv("AI_MAX_RETRIES", "2"))
+        self.base_delay = float(os.getenv("AI_RETRY_BASE_DELAY", "0.5"))
+        self.max_delay = float(os.getenv("AI_RETRY_MAX_DELAY", "8"))
+        self.hedge = os.getenv("AI_HEDGE", "0") == "1"
+        self.hedge_min_samples = int(os.getenv("AI_HEDGE_MIN_SAMPLES", "20"))
+        self.failure_threshold = int(os.getenv("AI_BREAKER_THRESHOLD", "5"))
+        self.reset_timeout = float(os.getenv("AI_BREAKER_RESET", "30"))
+        self.breakers = {}
+        self.trackers = {}
+        self.stats = {}
+        self.executor = None
+
+    def configure(self, **options):
+        """
+        更新策略参数
+
+        Args:
+            **options: max_retries、base_delay、max_delay、hedge、hedge_min_samples、
+                failure_threshold、reset_timeout中的任意项
+        """
+        with self.lock:
+            for key, value in options.items():
+                if not hasattr(self, key):
+                    raise ValueError(f"未知的容错参数: {key}")
+                setattr(self, key, value)
+            for breaker in self.breakers.values():
+                breaker.failure_threshold = self.failure_threshold
+                breaker.reset_timeout = self.reset_timeout
+
+    def _get_breaker(self, provider):
+        with self.lock:
+            breaker = self.breakers.get(provider)
+            if breaker is None:
+                breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self.breakers[provider] = breaker
+            return breaker
+
+    def _get_tracker(self, provider, model):
+        with self.lock:
+            return self.trackers.setdefault((provider, model), LatencyTracker())
+
+    def _get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=int(os.getenv("AI_HEDGE_WORKERS", "32")), thread_name_prefix="ai-hedge")
+            return self.executor
+
+    def _count(self, provider, key):
+        with self.lock:
+            stats = self.stats.setdefault(provider, {
+                "calls": 0, "retried": 0, "hedged": 0, "hedge_wins": 0, "short_circuited": 0, "failed": 0
+            })
+            stats[key] += 1
+
+    def backoff_delay(self, attempt):
+        """
+        计算第attempt次重试前的等待时间（full jitter）
+
+        Args:
+            attempt (int): 重试序号，从0开始
+
+        Returns:
+            float: 等待秒数
+        """
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, provider, model, request, hedge=True):
+        """
+        按容错策略执行一次模型调用
+
+        Args:
+            provider (str): 服务商名称
+            model (str): 模型名称
+            request (callable): 无参函数，发起一次请求并返回响应文本
+            hedge (bool, optional): 是否允许对冲，流式调用会把增量推送给前端，不能重复发起. 默认为True.
+
+        Returns:
+            str: 模型响应，所有尝试都失败时抛出最后一个异常
+        """
+        breaker = self._get_breaker(provider)
+        tracker = self._get_tracker(provider, model)
+        self._count(provider, "calls")
+
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                self._count(provider, "short_circuited")
+                raise CircuitOpenError(f"{provider}服务熔断中，暂停调用")
+
+            try:
+                result = self._hedged(provider, tracker, request) if hedge else self._timed(tracker, request)
+                breaker.record_success()
+                return result
+            except Exception as e:
+                if not is_transient_error(e):
+                    # 非临时性错误（如响应格式错误）说明服务是可达的，不计入熔断
+                    breaker.record_success()
+                    self._count(provider, "failed")
+                    raise
+                breaker.record_failure()
+                if attempt >= self.max_retries:
+                    self._count(provider, "failed")
+                    raise
+
+            self._count(provider, "retried")
+            time.sleep(self.backoff_delay(attempt))
+            attempt += 1
+
+    def _timed(self, tracker, request):
+        """执行请求并记录成功调用的耗时"""
+        start = time.monotonic()
+        result = request()
+        tracker.add(time.monotonic() - start)
+        return result
+
+    def _hedged(self, provider, tracker, request):
+        """
+        执行请求；启用对冲且耗时超过P95时再发起一次相同请求，取先成功的结果
+        """
+        threshold = tracker.percentile(0.95, self.hedge_min_samples) if self.hedge else None
+        if threshold is None:
+            return self._timed(tracker, request)
+
+        executor = self._get_executor()
+        primary = executor.submit(self._timed, tracker, request)
+        done, _ = wait([primary], timeout=threshold)
+        if done:
+            return primary.result()
+
+        self._count(provider, "hedged")
+        hedge = executor.submit(self._timed, tracker, request)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if future is hedge:
+                    self._count(provider, "hedge_wins")
+                return result
+        raise error
+
+    def get_stats(self):
+        """
+        获取容错统计
+
+        Returns:
+            dict: 按服务商统计的调用、重试、对冲和熔断次数，以及熔断器状态
+        """
+        with self.lock:
+            stats = {provider: dict(values) for provider, values in self.stats.items()}
+            for provider, breaker in self.breakers.items():
+                stats.setdefault(provider, {})["breaker"] = breaker.state
+            return stats
+
+    def reset(self):
+        """清空熔断器、耗时统计和计数"""
+        with self.lock:
+            self.breakers.clear()
+            self.trackers.clear()
+            self.stats.clear()
+
+
+# 全局实例
+resilience_policy = ResiliencePolicy()
+
+
+def _reset_after_fork():
+    """子进程重新创建锁和对冲线程池"""
+    resilience_policy.lock = threading.Lock()
+    resilience_policy.executor = None
+    resilience_policy.breakers = {}
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+AI响应缓存
+以(系统提示词, 用户提示词, 模型, 温度)为键缓存模型响应，
+内存中使用LRU，可选的磁盘存储（SQLite）在进程重启后仍然有效
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def make_cache_key(system_prompt, user_prompt, model, temperature):
+    """
+    生成确定性的缓存键
+
+    Args:
+        system_prompt (str): 系统提示词
+        user_prompt (str): 用户提示词
+        model (str): 模型名称
+        temperature (float): 采样温度
+
+    Returns:
+        str: SHA-256十六进制摘要
+    """
+    payload = json.dumps([system_prompt, user_prompt, model, temperature], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """AI响应缓存，单例模式"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ResponseCache, cls).__new__(cls)
+            cls._instance._init()
+        return cls._instance
+
+    def _init(self):
+        """初始化缓存，默认从环境变量读取配置"""
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()
+        self.max_entries = int(os.getenv("AI_CACHE_MAX_ENTRIES", "10000"))
+        # 启用缓存的调用类型，"*"表示所有类型；为空时缓存关闭
+        call_types = os.getenv("AI_CACHE_CALL_TYPES", "")
+        self.call_types = {t.strip() for t in call_types.split(",") if t.strip()}
+        self.disk = None
+        self.disk_path = None
+        self.stats = {}
+
+        disk_path = os.getenv("AI_CACHE_PATH")
+        if disk_path:
+            self.open_disk(disk_path)
+
+    def configure(self, call_types=None, max_entries=None, disk_path=None):
+        """
+        更新缓存配置
+
+        Args:
+            call_types (iterable, optional): 启用缓存的调用类型，包含"*"时对所有类型生效
+            max_entries (int, optional): 内存中最多保存的条目数
+            disk_path (str, optional): SQLite文件路径，设置后启用磁盘缓存
+        """
+        with self.lock:
+            if call_types is not None:
+                self.call_types = set(call_types)
+            if max_entries is not None:
+                self.max_entries = max_entries
+                self._evict()
+        if disk_path:
+            self.open_disk(disk_path)
+
+    def open_disk(self, disk_path):
+        """
+        打开磁盘缓存
+
+        Args:
+            disk_path (str): SQLite文件路径
+        """
+        directory = os.path.dirname(disk_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self.lock:
+            if self.disk:
+                self.disk.close()
+            self.disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self.disk.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL)")
+            self.disk.commit()
+            self.disk_path = disk_path
+
+    def is_enabled(self, call_type):
+        """
+        判断调用类型是否启用缓存
+
+        Args:
+            call_type (str): 调用类型
+
+        Returns:
+            bool: 是否启用
+        """
+        return "*" in self.call_types or call_type in self.call_types
+
+    def get(self, key, call_type="general"):
+        """
+        查询缓存，先查内存再查磁盘
+
+        Args:
+            key (str): 缓存键
+            call_type (str): 调用类型，用于统计
+
+        Returns:
+            str: 缓存的响应，未命中时返回None
+        """
+        with self.lock:
+            stats = self.stats.setdefault(call_type, {"hits": 0, "misses": 0})
+            response = self.memory.get(key)
+            if response is not None:
+                self.memory.move_to_end(key)
+                stats["hits"] += 1
+                return response
+
+            if self.disk:
+                row = self.disk.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+                if row:
+                    response = row[0]
+                    self.memory[key] = response
+                    self._evict()
+                    stats["hits"] += 1
+                    return response
+
+            stats["misses"] += 1
+            return None
+
+    def put(self, key, response):
+        """
+        写入缓存
+
+        Args:
+            key (str): 缓存键
+            response (str): 模型响应
+        """
+        with self.lock:
+            self.memory[key] = response
+            self.memory.move_to_end(key)
+            self._evict()
+            if self.disk:
+                self.disk.execute("INSERT OR REPLACE INTO responses (key, response) VALUES (?, ?)", (key, response))
+                self.disk.commit()
+
+    def _evict(self):
+        """淘汰最久未使用的内存条目（调用方需持有锁）"""
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def get_stats(self):
+        """
+        获取命中统计
+
+        Returns:
+            dict: 按调用类型统计的命中/未命中次数，以及汇总
+        """
+        with self.lock:
+            per_type = {call_type: dict(stats) for call_type, stats in self.stats.items()}
+            hits = sum(s["hits"] for s in per_type.values())
+            misses = sum(s["misses"] for s in per_type.values())
+            return {
+                "hits": hits,
+                "misses": misses,
+                "entries": len(self.memory),
+                "per_call_type": per_type
+            }
+
+    def clear(self):
+        """清空内存缓存和统计（磁盘缓存保留）"""
+        with self.lock:
+            self.memory.clear()
+            self.stats.clear()
+
+# 全局实例
+response_cache = ResponseCache()
+
+
+def _reopen_disk_after_fork():
+    """SQLite连接不能跨进程使用，fork后在子进程中重新打开"""
+    response_cache.lock = threading.Lock()
+    if response_cache.disk_path:
+        response_cache.disk = None
+        response_cache.open_disk(response_cache.disk_path)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reopen_disk_after_fork)
@@ -0,0 +1,381 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+本地模拟大模型服务器
+实现阿里百炼（DashScope）、DeepSeek（OpenAI格式）和火山方舟（/api/v3）三种接口格式及其流式（SSE）输出，
+支持可配置的延迟分布、错误率和并发上限，用于在无网络环境下压测真实的AI客户端代码
+
+使用方法:
+    python -m backend.utils.stub_llm_server --port 8600 --latency lognormal:800:0.5 --error-rate 0.05
+    然后设置 DASHSCOPE_BASE_URL=http://127.0.0.1:8600
+             DEEPSEEK_BASE_URL=http://127.0.0.1:8600
+             ARK_BASE_URL=http://127.0.0.1:8600/api/v3
+"""
+
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend.utils.context_builder import estimate_tokens
+
+DASHSCOPE_PATH = "/api/v1/services/aigc/text-generation/generation"
+OPENAI_PATHS = ("/v1/chat/completions", "/chat/completions", "/api/v3/chat/completions")
+
+RESPONSES = [
+    "我认为昨晚的情况很可疑，我们需要仔细分析每个人的发言。",
+    "根据目前的信息，我更倾向于相信发言逻辑清晰的玩家。",
+    "我是好人，请大家相信我，我们应该把票集中起来。",
+    "这个人的发言前后矛盾，我怀疑他是狼人。"
+]
+
+
+def parse_latency(spec):
+    """
+    解析延迟分布配置
+
+    Args:
+        spec (str): 分布配置，单位为毫秒，支持以下格式:
+            "fixed:200"、"uniform:100:500"、"normal:300:50"、"lognormal:800:0.5"（中位数:sigma）
+
+    Returns:
+        callable: 接收random.Random并返回延迟秒数的函数
+    """
+    name, *params = spec.split(":")
+    values = [float(p) for p in params]
+    if name == "fixed" and len(values) == 1:
+        return lambda rng: values[0] / 1000
+    if name == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if name == "normal" and len(values) == 2:
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1])) / 1000
+    if name == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1]) / 1000
+    raise ValueError(f"无效的延迟分布: {spec}")
+
+
+class StubLLMServer:
+    """模拟大模型服务器，在后台线程中运行"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency="fixed:0", error_rate=0.0, max_concurrency=0, seed=None):
+        """
+        初始化模拟服务器
+
+        Args:
+            host (str, optional): 监听地址. 默认为"127.0.0.1".
+            port (int, optional): 监听端口，0表示自动分配. 默认为0.
+            latency (str, optional): 延迟分布配置，见parse_latency. 默认为"fixed:0".
+            error_rate (float, optional): 返回500错误的概率. 默认为0.
+            max_concurrency (int, optional): 最大并发请求数，超出时返回429，0表示不限制. 默认为0.
+            seed (int, optional): 随机种子. 默认为None.
+        """
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.max_concurrency = max_concurrency
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "throttled": 0, "in_flight": 0, "peak_in_flight": 0}
+        # 见过的系统提示词，用于模拟服务端的前缀缓存
+        self.prefixes = set()
+
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        """服务器根地址"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """在后台线程中启动服务器"""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """停止服务器"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _admit(self):
+        """
+        登记一个新请求，并决定该请求的处理方式
+
+        Returns:
+            tuple: (状态码或None, 延迟秒数)，状态码为None表示正常响应
+        """
+        with self.lock:
+            self.stats["requests"] += 1
+            if self.max_concurrency and self.stats["in_flight"] >= self.max_concurrency:
+                self.stats["throttled"] += 1
+                return 429, 0
+            self.stats["in_flight"] += 1
+            self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.stats["in_flight"])
+            delay = self.latency(self.rng)
+            if self.rng.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return 500, delay
+            return None, delay
+
+    def _release(self):
+        """请求处理完成"""
+        with self.lock:
+            self.stats["in_flight"] -= 1
+
+    def _make_handler(self):
+        """创建绑定到当前服务器实例的请求处理类"""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, body):
+                payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_events(self, events):
+                # 不声明长度，发送完所有事件后关闭连接
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                for event in events:
+                    self.wfile.write(f"data:{event}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._send_json(400, {"error": {"message": "invalid json"}})
+                    return
+
+                path = self.path.split("?")[0]
+                if path != DASHSCOPE_PATH and path not in OPENAI_PATHS:
+                    self._send_json(404, {"error": {"message": f"unknown path {path}"}})
+                    return
+
+                status, delay = server._admit()
+                if status == 429:
+                    self._send_json(429, {"error": {"message": "rate limit exceeded", "code": "Throttling"}})
+                    return
+
+                try:
+                    time.sleep(delay)
+                    if status == 500:
+                        self._send_json(500, {"error": {"message": "injected server error", "code": "InternalError"}})
+                    elif path == DASHSCOPE_PATH and self.headers.get("X-DashScope-SSE") == "enable":
+                        self._send_events(server.dashscope_stream(request))
+                    elif path != DASHSCOPE_PATH and request.get("stream"):
+                        self._send_events(server.openai_stream(request))
+                    elif path == DASHSCOPE_PATH:
+                        self._send_json(200, server.dashscope_response(request))
+                    else:
+                        self._send_json(200, server.openai_response(request))
+                finally:
+                    server._release()
+
+        return Handler
+
+    def _content(self, model):
+        """生成响应文本"""
+        with self.lock:
+            text = self.rng.choice(RESPONSES)
+        return f"{text}（{model}）"
+
+    def dashscope_response(self, request):
+        """
+        构造阿里百炼格式的响应
+
+        Args:
+            request (dict): 请求体
+
+        Returns:
+            dict: 响应体
+        """
+        model = request.get("model", "unknown")
+        content = self._content(model)
+        input_tokens, cached_tokens, output_tokens = self._usage(request, content)
+        return {
+            "request_id": str(uuid.uuid4()),
+            "output": {
+                "choices": [{
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content}
+                }]
+            },
+            "usage": {
+                "input_tokens": input_tokens, "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens}
+            }
+        }
+
+    def openai_response(self, request):
+        """
+        构造OpenAI格式（DeepSeek官方与火山方舟）的响应
+
+        Args:
+            request (dict): 请求体
+
+        Returns:
+            dict: 响应体
+        """
+        model = request.get("model", "unknown")
+        content = self._content(model)
+        prompt_tokens, cached_tokens, completion_tokens = self._usage(request, content)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content}
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens}
+            }
+        }
+
+    def _usage(self, request, content):
+        """
+        估算请求的token用量；系统提示词与之前的请求完全相同时按前缀缓存命中计入cached_tokens
+
+        Args:
+            request (dict): 请求体
+            content (str): 响应文本
+
+        Returns:
+            tuple: (输入token数, 缓存命中token数, 输出token数)
+        """
+        messages = request.get("messages") or request.get("input", {}).get("messages", [])
+        system = "".join(m.get("content", "") for m in messages if m.get("role") == "system")
+        prompt_tokens = estimate_tokens("".join(m.get("content", "") for m in messages))
+        with self.lock:
+            cached = estimate_tokens(system) if system and system in self.prefixes else 0
+            self.prefixes.add(system)
+        return prompt_tokens, cached, estimate_tokens(content)
+
+    def _chunks(self, model):
+        """把响应文本切分为流式输出的片段"""
+        text = self._content(model)
+        return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+    def dashscope_stream(self, request):
+        """
+        构造阿里百炼增量输出（incremental_output）格式的事件序列
+
+        Args:
+            request (dict): 请求体
+
+        Returns:
+            list: 每个事件的JSON文本
+        """
+        request_id = str(uuid.uuid4())
+        chunks = self._chunks(request.get("model", "unknown"))
+        return [
+            json.dumps({
+                "request_id": request_id,
+                "output": {
+                    "choices": [{
+                        "finish_reason": "stop" if i == len(chunks) - 1 else "null",
+                        "message": {"role": "assistant", "content": chunk}
+                    }]
+                }
+            }, ensure_ascii=False)
+            for i, chunk in enumerate(chunks)
+        ]
+
+    def openai_stream(self, request):
+        """
+        构造OpenAI格式的流式事件序列，以[DONE]结束
+
+        Args:
+            request (dict): 请求体
+
+        Returns:
+            list: 每个事件的JSON文本
+        """
+        model = request.get("model", "unknown")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        chunks = self._chunks(model)
+        events = [
+            json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "delta": {"role": "assistant", "content": chunk},
+                    "finish_reason": "stop" if i == len(chunks) - 1 else None
+                }]
+            }, ensure_ascii=False)
+            for i, chunk in enumerate(chunks)
+        ]
+        return events + ["[DONE]"]
+
+    def get_stats(self):
+        """
+        获取请求统计
+
+        Returns:
+            dict: 请求数、错误数、限流数和并发峰值
+        """
+        with self.lock:
+            return dict(self.stats)
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="本地模拟大模型服务器")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8600, help="监听端口")
+    parser.add_argument("--latency", default="fixed:0", help="延迟分布，如fixed:200、uniform:100:500、normal:300:50、lognormal:800:0.5（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回500错误的概率")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="最大并发请求数，超出时返回429")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    args = parser.parse_args()
+
+    server = StubLLMServer(args.host, args.port, args.latency, args.error_rate, args.max_concurrency, args.seed)
+    print(f"模拟大模型服务器已启动: {server.url}")
+    print(f"  DASHSCOPE_BASE_URL={server.url}")
+    print(f"  DEEPSEEK_BASE_URL={server.url}")
+    print(f"  ARK_BASE_URL={server.url}/api/v3")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print(f"服务器已停止，请求统计: {server.get_stats()}")
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批量对局运行器
+使用进程池并行运行大量无头游戏，并汇总每局结果，用于比较不同模型阵容
+"""
+
+import io
+import os
+import json
+import time
+import random
+import importlib
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from backend.utils.metrics import metrics, diff_snapshots, merge_snapshots, summarize_snapshot
+
+# 预置的AI客户端工厂，值为"模块:函数"形式，便于在子进程中按名称导入
+CLIENT_FACTORIES = {
+    "real": "backend.utils.ai_client:get_ai_client",
+    "mock": "backend.utils.mock_ai_client:get_mock_ai_client"
+}
+
+
+def resolve_client_factory(factory):
+    """
+    解析AI客户端工厂
+
+    Args:
+        factory (str|callable): 预置名称（"real"/"mock"）、"模块:函数"字符串或可调用对象
+
+    Returns:
+        callable: 根据模型名称创建AI客户端的函数
+    """
+    if callable(factory):
+        return factory
+
+    spec = CLIENT_FACTORIES.get(factory, factory)
+    if ":" not in spec:
+        raise ValueError(f"无效的AI客户端工厂: {factory}")
+
+    module_name, func_name = spec.split(":", 1)
+    module = importlib.import_module(module_name)
+    return getattr(module, func_name)
+
+
+def load_roster(roster):
+    """
+    加载角色阵容
+
+    Args:
+        roster (str|list): characters.json格式的文件路径，或角色字典列表
+
+    Returns:
+        list: 角色字典列表
+    """
+    if isinstance(roster, str):
+        with open(roster, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return list(roster)
+
+
+def play_single_game(game_index, roster, client_factory="mock", seed=None, roster_index=0, quiet=True):
+    """
+    在当前进程中运行一局无头游戏
+
+    Args:
+        game_index (int): 对局编号
+        roster (list): 角色字典列表
+        client_factory (str|callable): AI客户端工厂
+        seed (int, optional): 随机种子，保证同一局可复现. 默认为None.
+        roster_index (int, optional): 使用的阵容编号. 默认为0.
+        quiet (bool, optional): 是否屏蔽游戏过程中的打印输出. 默认为True.
+
+    Returns:
+        dict: 对局结果
+    """
+    # 延迟导入，保证子进程只加载需要的模块
+    from backend.models.game_engine import GameEngine
+
+    if seed is not None:
+        random.seed(seed)
+
+    start = time.time()
+    result = {
+        "index": game_index,
+        "seed": seed,
+        "roster": roster_index,
+        "status": "success"
+    }
+
+    output = io.StringIO() if quiet else None
+    # 同一进程会连续运行多局，按前后快照的差值统计本局的耗时
+    metrics_before = metrics.snapshot()
+    try:
+        with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+            engine = GameEngine(headless=True)
+            if not engine.load_characters(roster, resolve_client_factory(client_factory)):
+                raise ValueError("加载角色阵容失败")
+            # 静默时日志在入队之前丢弃，省去格式化和写入的开销
+            engine.set_log_quiet(quiet)
+            engine.run_headless()
+        result.update(engine.get_game_summary())
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+
+    result["duration"] = time.time() - start
+    result["metrics"] = diff_snapshots(metrics.snapshot(), metrics_before)
+    return result
+
+
+def aggregate_results(results):
+    """
+    汇总多局游戏结果
+
+    Args:
+        results (list): play_single_game返回的结果列表
+
+    Returns:
+        dict: 汇总报告
+    """
+    finished = [r for r in results if r["status"] == "success"]
+    report = {
+        "games": len(results),
+        "finished": len(finished),
+        "errors": len(results) - len(finished),
+        "winners": {"villager": 0, "werewolf": 0, "none": 0},
+        "average_days": 0,
+        "average_duration": 0,
+        "ai_calls": {"total": 0, "success": 0, "error": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0},
+        "per_model": {},
+        "per_roster": {},
+        "latency": {}
+    }
+    if not finished:
+        return report
+
+    for result in finished:
+        winner = result.get("winner") or "none"
+        report["winners"][winner] += 1
+
+        roster_stats = report["per_roster"].setdefault(str(result["roster"]), {
+            "games": 0, "villager_wins": 0, "werewolf_wins": 0
+        })
+        roster_stats["games"] += 1
+        if winner in ("villager", "werewolf"):
+            roster_stats[f"{winner}_wins"] += 1
+
+        for character in result["characters"]:
+            camp = "werewolf" if character["role"] == "werewolf" else "villager"
+            model_stats = report["per_model"].setdefault(character["model"], {
+                "appearances": 0, "wins": 0, "deaths": 0,
+                "werewolf": {"appearances": 0, "wins": 0},
+                "villager": {"appearances": 0, "wins": 0},
+                "ai_calls": 0, "ai_errors": 0
+            })
+            model_stats["appearances"] += 1
+            model_stats[camp]["appearances"] += 1
+            if winner == camp:
+                model_stats["wins"] += 1
+                model_stats[camp]["wins"] += 1
+            if not character["alive"]:
+                model_stats["deaths"] += 1
+
+        for model, stats in result["ai_calls"].items():
+            for key in report["ai_calls"]:
+                report["ai_calls"][key] += stats.get(key, 0)
+            if model in report["per_model"]:
+                report["per_model"][model]["ai_calls"] += stats.get("total", 0)
+                report["per_model"][model]["ai_errors"] += stats.get("error", 0)
+
+    report["average_days"] = sum(r["days"] for r in finished) / len(finished)
+    report["average_duration"] = sum(r["duration"] for r in finished) / len(finished)
+    for model_stats in report["per_model"].values():
+        model_stats["win_rate"] = model_stats["wins"] / model_stats["appearances"]
+    report["latency"] = summarize_snapshot(merge_snapshots(r.get("metrics") for r in finished))
+
+    return report
+
+
+def run_tournament(rosters, games, client_factory="mock", workers=None, base_seed=0, quiet=True):
+    """
+    使用进程池并行运行多局游戏
+
+    Args:
+        rosters (list): 阵容列表，每个元素为文件路径或角色字典列表；第i局使用第i % len(rosters)个阵容
+        games (int): 对局数量
+        client_factory (str|callable): AI客户端工厂，可调用对象必须能被pickle（模块级函数）
+        workers (int, optional): 进程数量. 默认为CPU核数.
+        base_seed (int, optional): 基础随机种子，第i局使用base_seed + i. 默认为0.
+        quiet (bool, optional): 是否屏蔽子进程中的打印输出. 默认为True.
+
+    Returns:
+        dict: 包含汇总报告和每局结果的字典
+    """
+    loaded_rosters = [load_roster(roster) for roster in rosters]
+    if not loaded_rosters:
+        raise ValueError("至少需要一个角色阵容")
+
+    workers = workers or os.cpu_count() or 1
+    start = time.time()
+    results = []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for game_index in range(games):
+            roster_index = game_index % len(loaded_rosters)
+            futures[executor.submit(
+                play_single_game,
+                game_index,
+                loaded_rosters[roster_index],
+                client_factory,
+                base_seed + game_index,
+                roster_index,
+                quiet
+            )] = (game_index, roster_index)
+
+        for future in as_completed(futures):
+            game_index, roster_index = futures[future]
+            try:
+                results.append(future.result())
+            except Exception as e:
+                # 子进程崩溃或参数无法序列化时只记录该局失败，保留其他已完成的结果
+                results.append({
+                    "index": game_index,
+                    "seed": base_seed + game_index,
+                    "roster": roster_index,
+                    "status": "error",
+                    "error": f"{type(e).__name__}: {str(e)}",
+                    "duration": 0
+                })
+
+    results.sort(key=lambda r: r["index"])
+    report = aggregate_results(results)
+    report["workers"] = workers
+    report["wall_time"] = time.time() - start
+
+    return {"report": report, "results": results}
@@ -3,20 +3,164 @@
 
 """
 语音合成客户端
-使用阿里百炼平台的CosyVoice模型为游戏角色生成语音
+使用阿里百炼平台的CosyVoice模型为游戏角色生成语音，合成结果按内容哈希缓存在磁盘上；
+生成发言后即可提交到后台线程池预合成，前端收到voice_play时直接按缓存地址获取音频；
+合成使用流式接口，音频片段到达后即可转发给正在等待的请求，首个片段的延迟与发言长度无关
+
+环境变量:
+    VOICE_FORMAT: 输出格式，mp3、opus、wav，或CosyVoice的AudioFormat成员名（选择采样率和码率），默认为mp3
+    VOICE_PRESYNTH_WORKERS: 预合成线程数，默认为2
+    VOICE_WAIT_TIMEOUT: 合成一段语音或等待下一个音频片段的最长秒数，默认为30
 """
 
 import os
-import uuid
-import hashlib
-from datetime import datetime
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import dashscope
-from dashscope.audio.tts_v2 import SpeechSynthesizer
+from dashscope.audio.tts_v2 import SpeechSynthesizer, ResultCallback, AudioFormat
+from backend.utils.audio_cache import AudioCache, MIMETYPES, audio_key
+from backend.utils.logger import get_logger
+from backend.utils.metrics import metrics
 
 # 加载环境变量
 load_dotenv()
 
+logger = get_logger()
+
+# 输出格式简写 -> AudioFormat成员名；wav用于不支持压缩格式的旧客户端
+VOICE_FORMAT_ALIASES = {
+    "mp3": "MP3_22050HZ_MONO_256KBPS",
+    "opus": "OGG_OPUS_24KHZ_MONO_32KBPS",
+    "wav": "WAV_22050HZ_MONO_16BIT",
+}
+
+# 编码格式 -> 缓存文件扩展名
+FORMAT_EXTENSIONS = {
+    "mp3": "mp3",
+    "opus": "ogg",
+    "wav": "wav",
+}
+
+
+def resolve_audio_format(name):
+    """
+    解析输出格式
+
+    Args:
+        name (str): mp3、opus、wav或AudioFormat成员名，如OGG_OPUS_16KHZ_MONO_16KBPS
+
+    Returns:
+        AudioFormat: CosyVoice输出格式
+
+    Raises:
+        ValueError: 未知格式或浏览器不能直接播放的格式（如pcm）
+    """
+    member = getattr(AudioFormat, VOICE_FORMAT_ALIASES.get(name.lower(), name.upper()), None)
+    if member is None or member.format not in FORMAT_EXTENSIONS:
+        raise ValueError(f"不支持的语音格式: {name}")
+    return member
+
+
+class AudioStreamError(Exception):
+    """语音合成失败或等待音频片段超时，已经产出的片段不是完整的音频"""
+
+
+class AudioStream:
+    """正在合成的一段语音：合成线程追加音频片段，其他调用方可以等待完整结果，也可以从头跟随读取"""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.audio = None
+        self.condition = threading.Condition()
+
+    def append(self, chunk):
+        """追加一个音频片段"""
+        with self.condition:
+            self.chunks.append(chunk)
+            self.condition.notify_all()
+
+    def finish(self, audio):
+        """
+        结束合成
+
+        Args:
+            audio (bytes): 完整音频，失败时为None
+        """
+        with self.condition:
+            self.done = True
+            self.audio = audio
+            self.condition.notify_all()
+
+    def result(self, timeout=None):
+        """
+        等待合成结束
+
+        Args:
+            timeout (float, optional): 最长等待秒数. 默认为None（一直等待）.
+
+        Returns:
+            bytes: 完整音频，失败或超时时返回None
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.done, timeout)
+            return self.audio
+
+    def follow(self, timeout=None):
+        """
+        从第一个片段开始依次产出音频片段，直到合成结束
+
+        Args:
+            timeout (float, optional): 等待下一个片段的最长秒数. 默认为None.
+
+        Yields:
+            bytes: 音频片段
+
+        Raises:
+            AudioStreamError: 合成失败或等待下一个片段超时，调用方应中断传输而不是当作完整音频结束
+        """
+        index = 0
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: index < len(self.chunks) or self.done, timeout)
+                chunks = self.chunks[index:]
+                done = self.done
+                failed = done and self.audio is None
+            if not chunks and not done:
+                logger.warning("voice.stream", "等待音频片段超时")
+                raise AudioStreamError("等待音频片段超时")
+            index += len(chunks)
+            yield from chunks
+            if failed:
+                raise AudioStreamError("语音合成失败")
+            if done:
+                return
+
+
+class StreamCallback(ResultCallback):
+    """把流式合成返回的音频片段写入AudioStream"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.completed = threading.Event()
+        self.first_chunk_at = None
+        self.error = None
+
+    def on_data(self, data):
+        if self.first_chunk_at is None:
+            self.first_chunk_at = time.perf_counter()
+        self.stream.append(data)
+
+    def on_complete(self):
+        self.completed.set()
+
+    def on_error(self, message):
+        self.error = message
+        self.completed.set()
+
+
 class VoiceClient:
     """语音合成客户端"""
 
@@ -42,97 +186,306 @@ class VoiceClient:
             "吴天天": "longxiaochun_v2"    # 暂时使用系统音色
         }
         
-        # 确保音频文件夹存在
-        self.audio_dir = "/Users/rogerchang/狼人杀模拟器/data/audio"
-        os.makedirs(self.audio_dir, exist_ok=True)
+        self.model = "cosyvoice-v2"
+        self.audio_format = resolve_audio_format(os.getenv("VOICE_FORMAT", "mp3"))
+        # 输出格式名 -> 合成次数和音频字节数，用于比较不同格式每段语音的大小
+        self.byte_stats = {}
+
+        # 音频缓存，目录由AUDIO_DIR环境变量配置
+        self.cache = AudioCache()
+        self.audio_dir = self.cache.audio_dir
+
+        # 预合成线程池；pending记录正在合成的语音（AudioStream），同一个键同时只合成一次
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("VOICE_PRESYNTH_WORKERS", "2")),
+            thread_name_prefix="voice-synth"
+        )
+        self.wait_timeout = float(os.getenv("VOICE_WAIT_TIMEOUT", "30"))
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+
+    def prepare_text(self, text):
+        """
+        截断过长的文本（CosyVoice限制2000字符）
+
+        Args:
+            text (str): 要合成的文本
 
-    def synthesize_speech(self, text, character_name):
+        Returns:
+            str: 实际合成的文本
+        """
+        if len(text) > 2000:
+            return text[:1900] + "..."
+        return text
+
+    def speech_key(self, text, character_name, audio_format=None):
+        """
+        计算一段语音的缓存键
+
+        Args:
+            text (str): 要合成的文本
+            character_name (str): 角色名称
+            audio_format (str, optional): 输出格式. 默认为VOICE_FORMAT配置的格式.
+
+        Returns:
+            str: 缓存键，扩展名对应输出格式
         """
-        合成语音，返回音频数据
+        return self._prepare(text, character_name, audio_format)[3]
+
+    def _prepare(self, text, character_name, audio_format=None):
+        """
+        确定一段语音实际合成的文本、音色、输出格式和缓存键
+
+        Returns:
+            tuple: (文本, 音色, AudioFormat, 缓存键)
+        """
+        voice = self.get_character_voice(character_name)
+        text = self.prepare_text(text)
+        output = resolve_audio_format(audio_format) if audio_format else self.audio_format
+        key = audio_key(text, voice, self.model, output.name, FORMAT_EXTENSIONS[output.format])
+        return text, voice, output, key
+
+    def mimetype(self, audio_format=None):
+        """
+        获取输出格式的mimetype
+
+        Args:
+            audio_format (str, optional): 输出格式. 默认为VOICE_FORMAT配置的格式.
+
+        Returns:
+            str: mimetype
+        """
+        output = resolve_audio_format(audio_format) if audio_format else self.audio_format
+        return MIMETYPES[FORMAT_EXTENSIONS[output.format]]
+
+    def synthesize_speech(self, text, character_name, audio_format=None):
+        """
+        合成语音，返回音频数据；相同文本、音色、模型和格式的语音直接读取缓存，正在预合成时等待其结果
         
         Args:
             text (str): 要合成的文本
             character_name (str): 角色名称
+            audio_format (str, optional): 输出格式. 默认为VOICE_FORMAT配置的格式.
             
         Returns:
             bytes: 音频数据，失败时返回None
         """
         try:
-            # 获取音色
-            voice = self.voice_mapping.get(character_name, "longxiang")
-            
-            # 文本长度检查（CosyVoice限制2000字符）
-            if len(text) > 2000:
-                text = text[:1900] + "..."
-                
-            print(f"正在为{character_name}合成语音: {text[:50]}...")
-            
-            # 调用CosyVoice API - 使用官方推荐的方式
-            synthesizer = SpeechSynthesizer(model='cosyvoice-v2', voice=voice)
-            audio = synthesizer.call(text)
-            
+            # 获取音色、输出格式和缓存键
+            text, voice, output, key = self._prepare(text, character_name, audio_format)
+            audio = self.cache.get(key)
             if audio:
-                print(f"语音合成成功，角色: {character_name}")
+                logger.debug("voice.cache", "语音缓存命中，角色: {character}", character=character_name, key=key)
                 return audio
-            else:
-                print(f"语音合成失败，无音频数据")
-                return None
-                
+
+            stream, owner = self._claim(key)
+            if owner:
+                return self._render(stream, key, text, voice, output, character_name)
+            return stream.result(self.wait_timeout)
+
         except Exception as e:
-            print(f"语音合成失败: {str(e)}")
+            logger.error("voice.synthesize", f"语音合成失败: {str(e)}")
             return None
 
-    def get_character_voice(self, character_name):
+    def stream_speech(self, text, character_name, audio_format=None):
         """
-        获取角色对应的音色
-        
+        流式合成语音，音频片段到达后立即产出；已缓存时一次产出完整音频
+
         Args:
+            text (str): 要合成的文本
             character_name (str): 角色名称
-            
+            audio_format (str, optional): 输出格式. 默认为VOICE_FORMAT配置的格式.
+
+        Yields:
+            bytes: 音频片段
+
+        Raises:
+            AudioStreamError: 合成失败或超时，已经产出的片段不完整
+        """
+        text, voice, output, key = self._prepare(text, character_name, audio_format)
+        audio = self.cache.get(key)
+        if audio:
+            yield audio
+            return
+        stream, owner = self._claim(key)
+        if owner:
+            # 单独的线程合成，不在预合成线程池中排队
+            threading.Thread(
+                target=self._render, args=(stream, key, text, voice, output, character_name),
+                name="voice-stream", daemon=True
+            ).start()
+        yield from stream.follow(self.wait_timeout)
+
+    def presynthesize(self, text, character_name):
+        """
+        以配置的输出格式提交后台预合成，已缓存或正在合成时不重复提交
+
+        Args:
+            text (str): 要合成的文本
+            character_name (str): 角色名称
+
         Returns:
-            str: 音色名称
+            str: 缓存键，可用audio_url转换为音频地址
         """
-        return self.voice_mapping.get(character_name, "longxiang")
+        text, voice, output, key = self._prepare(text, character_name)
+        if key in self.cache:
+            return key
+        stream, owner = self._claim(key)
+        if owner:
+            self.executor.submit(self._render, stream, key, text, voice, output, character_name)
+        return key
 
-    def cleanup_old_audio(self, max_files=100):
+    def get_audio(self, key):
         """
-        清理旧的音频文件，保持文件数量在合理范围
-        
+        按缓存键获取完整音频，正在合成时等待合成完成
+
+        Args:
+            key (str): 缓存键
+
+        Returns:
+            bytes: 音频数据，未缓存且没有在合成时返回None
+        """
+        audio = self.cache.get(key)
+        if audio:
+            return audio
+        with self.pending_lock:
+            stream = self.pending.get(key)
+        if stream is None:
+            return None
+        return stream.result(self.wait_timeout)
+
+    def stream_audio(self, key):
+        """
+        按缓存键获取音频片段，正在合成时从第一个片段开始跟随读取
+
+        Args:
+            key (str): 缓存键
+
+        Returns:
+            tuple: (音频片段迭代器, 是否为已缓存的完整音频)；未缓存且没有在合成时返回(None, False)。
+                正在合成时迭代器在合成失败或超时时抛出AudioStreamError
+        """
+        audio = self.cache.get(key)
+        if audio:
+            return iter([audio]), True
+        with self.pending_lock:
+            stream = self.pending.get(key)
+        if stream is None:
+            return None, False
+        return stream.follow(self.wait_timeout), False
+
+    def audio_url(self, key):
+        """
+        获取缓存音频的访问地址
+
         Args:
-            max_files (int): 最大保留文件数
+            key (str): 缓存键
+
+        Returns:
+            str: 音频地址
+        """
+        return f"/api/voice/audio/{key}"
+
+    def _claim(self, key):
         """
+        登记一次合成；已有同一个键在合成时返回它的AudioStream
+
+        Returns:
+            tuple: (AudioStream, 是否由调用方负责合成)
+        """
+        with self.pending_lock:
+            stream = self.pending.get(key)
+            if stream is not None:
+                return stream, False
+            stream = AudioStream()
+            self.pending[key] = stream
+            return stream, True
+
+    def _render(self, stream, key, text, voice, output, character_name):
+        """
+        调用流式语音合成，片段写入AudioStream，完成后写入缓存
+
+        Returns:
+            bytes: 音频数据，失败时返回None
+        """
+        audio = None
+        start = time.perf_counter()
         try:
-            if not os.path.exists(self.audio_dir):
-                return
-                
-            files = [f for f in os.listdir(self.audio_dir) if f.endswith('.wav')]
-            
-            if len(files) <= max_files:
-                return
-                
-            # 按修改时间排序，删除最旧的文件
-            files_with_time = []
-            for f in files:
-                file_path = os.path.join(self.audio_dir, f)
-                try:
-                    mtime = os.path.getmtime(file_path)
-                    files_with_time.append((mtime, file_path))
-                except OSError:
-                    continue
-                    
-            files_with_time.sort()
+            # 登记之前可能已有其他调用方合成完成
+            audio = self.cache.get(key)
+            if audio:
+                stream.append(audio)
+                return audio
+
+            logger.info("voice.synthesize", "正在为{character}合成语音: {text:.50}...", character=character_name, text=text)
             
-            # 删除最旧的文件
-            files_to_delete = len(files_with_time) - max_files
-            for i in range(files_to_delete):
+            # 调用CosyVoice流式接口，设置回调后call立即返回，音频片段通过回调到达
+            callback = StreamCallback(stream)
+            synthesizer = SpeechSynthesizer(model=self.model, voice=voice, format=output, callback=callback)
+            synthesizer.call(text)
+            if not callback.completed.wait(self.wait_timeout):
+                raise TimeoutError("语音合成超时")
+            if callback.error:
+                raise RuntimeError(callback.error)
+            if callback.first_chunk_at is not None:
+                metrics.observe("werewolf_tts_seconds", callback.first_chunk_at - start, stage="first_chunk")
+            metrics.observe("werewolf_tts_seconds", time.perf_counter() - start, stage="total")
+
+            audio = b"".join(stream.chunks)
+            if audio:
+                logger.info("voice.synthesize", "语音合成成功，角色: {character}，{size}字节", character=character_name,
+                            size=len(audio), audio_format=output.name)
+                self._record_bytes(output, len(audio))
                 try:
-                    os.remove(files_with_time[i][1])
-                    print(f"清理旧音频文件: {files_with_time[i][1]}")
-                except OSError:
-                    continue
-                    
+                    self.cache.put(key, audio)
+                except OSError as e:
+                    logger.warning("voice.cache", f"写入语音缓存失败: {str(e)}")
+            else:
+                logger.warning("voice.synthesize", "语音合成失败，无音频数据", character=character_name)
+                audio = None
+            return audio
+
         except Exception as e:
-            print(f"清理音频文件失败: {str(e)}")
+            logger.error("voice.synthesize", f"语音合成失败: {str(e)}")
+            audio = None
+            return None
+        finally:
+            with self.pending_lock:
+                self.pending.pop(key, None)
+            stream.finish(audio)
+
+    def _record_bytes(self, output, size):
+        """记录一次合成的音频大小"""
+        with self.pending_lock:
+            stats = self.byte_stats.setdefault(output.name, {"speeches": 0, "bytes": 0})
+            stats["speeches"] += 1
+            stats["bytes"] += size
+
+    def get_stats(self):
+        """
+        获取语音统计
+
+        Returns:
+            dict: 当前输出格式、各格式每段语音的平均字节数，以及缓存统计
+        """
+        with self.pending_lock:
+            formats = {
+                name: {**stats, "bytes_per_speech": round(stats["bytes"] / stats["speeches"])}
+                for name, stats in self.byte_stats.items()
+            }
+        return {"audio_format": self.audio_format.name, "formats": formats, "cache": self.cache.get_stats()}
+
+    def get_character_voice(self, character_name):
+        """
+        获取角色对应的音色
+        
+        Args:
+            character_name (str): 角色名称
+            
+        Returns:
+            str: 音色名称
+        """
+        return self.voice_mapping.get(character_name, "longxiang")
 
 # 全局语音客户端实例
 voice_client = VoiceClient()
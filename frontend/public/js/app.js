@@ -4,7 +4,12 @@ const gameState = {
     phase: '',
     day: 0,
     characters: [],
-    logs: []
+    logs: [],
+    // 已应用的最近一次game_update序号，-1表示尚未收到快照
+    seq: -1,
+    resyncing: false,
+    // 正在流式生成的发言，speech_id -> {character, text}
+    streamingSpeeches: {}
 };
 
 // DOM元素
@@ -21,8 +26,13 @@ const elements = {
     gameLogs: document.getElementById('gameLogs')
 };
 
-// Socket.io连接
-const socket = io('http://localhost:5003');
+// 多局模式：通过 ?game=<游戏ID> 访问注册表中的指定游戏，否则使用单局接口
+const gameId = new URLSearchParams(window.location.search).get('game');
+const gameApiBase = gameId ? `/api/games/${gameId}` : '/api/game';
+const memoryApiBase = gameId ? `/api/games/${gameId}/character/memory` : '/api/character/memory';
+
+// Socket.io连接：连接时带上游戏ID，服务端把连接加入该局的房间（未指定时为单局模式的房间）并只向本连接发送完整状态
+const socket = io('http://localhost:5003', { query: gameId ? { game: gameId } : {} });
 
 // 事件监听
 socket.on('connect', () => {
@@ -37,12 +47,12 @@ socket.on('disconnect', () => {
 
 socket.on('game_state', (data) => {
     console.log('收到游戏状态:', data);
-    updateGameState(data);
+    applySnapshot(data);
 });
 
 socket.on('game_update', (data) => {
     console.log('收到游戏更新:', data);
-    updateGameState(data);
+    applyGameDelta(data);
 });
 
 socket.on('model_call', (data) => {
@@ -50,9 +60,13 @@ socket.on('model_call', (data) => {
     addModelCallRecord(data.character, data.call_type, data.status_text, data.status);
 });
 
+socket.on('speech_delta', (data) => {
+    handleSpeechDelta(data);
+});
+
 socket.on('voice_play', (data) => {
     console.log('收到语音播放请求:', data);
-    playCharacterVoice(data.character, data.text);
+    playCharacterVoice(data.character, data.text, data.audio_url, data.audio_mimetype);
 });
 
 socket.on('error', (data) => {
@@ -62,7 +76,7 @@ socket.on('error', (data) => {
 
 // 按钮事件
 elements.startBtn.addEventListener('click', () => {
-    fetch('/api/game/start', {
+    fetch(`${gameApiBase}/start`, {
         method: 'POST'
     })
     .then(response => response.json())
@@ -81,7 +95,7 @@ elements.startBtn.addEventListener('click', () => {
 });
 
 elements.pauseBtn.addEventListener('click', () => {
-    fetch('/api/game/pause', {
+    fetch(`${gameApiBase}/pause`, {
         method: 'POST'
     })
     .then(response => response.json())
@@ -100,7 +114,7 @@ elements.pauseBtn.addEventListener('click', () => {
 });
 
 elements.resumeBtn.addEventListener('click', () => {
-    fetch('/api/game/resume', {
+    fetch(`${gameApiBase}/resume`, {
         method: 'POST'
     })
     .then(response => response.json())
@@ -119,7 +133,7 @@ elements.resumeBtn.addEventListener('click', () => {
 });
 
 elements.resetBtn.addEventListener('click', () => {
-    fetch('/api/game/reset', {
+    fetch(`${gameApiBase}/reset`, {
         method: 'POST'
     })
     .then(response => response.json())
@@ -169,6 +183,85 @@ function updateGameState(data) {
     }
 }
 
+// 是否属于当前页面的游戏；单局模式不指定游戏ID，接收单局房间的所有推送
+function isCurrentGame(data) {
+    return !gameId || data.game_id === gameId;
+}
+
+// 应用完整的游戏状态快照
+function applySnapshot(data) {
+    if (!isCurrentGame(data)) {
+        return;
+    }
+    if (data.seq !== undefined) {
+        gameState.seq = data.seq;
+    }
+    updateGameState(data);
+}
+
+// 应用增量游戏更新，序号不连续时重新获取快照
+function applyGameDelta(data) {
+    if (!isCurrentGame(data) || gameState.resyncing || data.seq <= gameState.seq) {
+        return;
+    }
+    if (gameState.seq < 0 || data.seq !== gameState.seq + 1) {
+        resyncGameState();
+        return;
+    }
+    gameState.seq = data.seq;
+
+    updateGameState({
+        status: data.status,
+        phase: data.phase,
+        current_day: data.current_day,
+        characters: data.characters
+    });
+
+    if (data.character_changes && data.character_changes.length) {
+        data.character_changes.forEach(changed => {
+            const index = gameState.characters.findIndex(c => c.id === changed.id);
+            if (index >= 0) {
+                gameState.characters[index] = changed;
+            } else {
+                gameState.characters.push(changed);
+            }
+        });
+        renderCharacters();
+    }
+
+    if (data.log_offset < gameState.logs.length) {
+        // 游戏重置或与快照重叠：截断后整体重绘
+        gameState.logs = gameState.logs.slice(0, data.log_offset).concat(data.new_logs);
+        renderLogs();
+    } else if (data.log_offset === gameState.logs.length) {
+        gameState.logs = gameState.logs.concat(data.new_logs);
+        appendLogs(data.new_logs);
+    } else {
+        resyncGameState();
+    }
+}
+
+// 丢失增量更新后从状态接口获取快照
+function resyncGameState() {
+    if (gameState.resyncing) {
+        return;
+    }
+    gameState.resyncing = true;
+    fetch(`${gameApiBase}/state`)
+        .then(response => response.json())
+        .then(data => {
+            if (data.status === 'success') {
+                applySnapshot(data.data);
+            }
+        })
+        .catch(error => {
+            console.error('重新同步游戏状态失败:', error);
+        })
+        .finally(() => {
+            gameState.resyncing = false;
+        });
+}
+
 // 添加模型调用记录
 function addModelCallRecord(character, callType, statusText, status) {
     const timestamp = new Date().toLocaleTimeString();
@@ -234,52 +327,130 @@ function renderLogs() {
     elements.gameLogs.innerHTML = '';
 
     gameState.logs.forEach(log => {
-        const entry = document.createElement('div');
-        entry.className = 'log-entry';
+        elements.gameLogs.appendChild(createLogEntry(log));
+    });
 
-        const time = document.createElement('div');
-        time.className = 'log-time';
-        time.textContent = `[${log.timestamp}] [${log.day}天-${log.phase}]`;
+    // 日志重新渲染后补上仍在生成中的发言
+    Object.keys(gameState.streamingSpeeches).forEach(speechId => {
+        renderStreamingSpeech(speechId);
+    });
 
-        const content = document.createElement('div');
-        content.style.display = 'flex';
-        content.style.alignItems = 'center';
-        content.style.justifyContent = 'space-between';
+    // 滚动到底部
+    elements.gameLogs.scrollTop = elements.gameLogs.scrollHeight;
+}
 
-        const messageContainer = document.createElement('div');
-        messageContainer.style.flex = '1';
+// 追加新日志，不重绘已有日志
+function appendLogs(logs) {
+    // 移除已生成完毕的流式发言，完整发言在日志中显示
+    let anchor = null;
+    elements.gameLogs.querySelectorAll('[data-speech-id]').forEach(entry => {
+        if (!gameState.streamingSpeeches[entry.dataset.speechId]) {
+            entry.remove();
+        } else if (!anchor) {
+            anchor = entry;
+        }
+    });
 
-        const source = document.createElement('span');
-        source.className = `log-source log-source-${getSourceClass(log.source)}`;
-        source.textContent = `${log.source}: `;
+    // 新日志插在仍在生成的发言之前
+    logs.forEach(log => {
+        elements.gameLogs.insertBefore(createLogEntry(log), anchor);
+    });
 
-        const message = document.createElement('span');
-        message.className = 'log-message';
-        message.textContent = log.message;
+    elements.gameLogs.scrollTop = elements.gameLogs.scrollHeight;
+}
+
+// 创建一条日志元素
+function createLogEntry(log) {
+    const entry = document.createElement('div');
+    entry.className = 'log-entry';
+
+    const time = document.createElement('div');
+    time.className = 'log-time';
+    time.textContent = `[${log.timestamp}] [${log.day}天-${log.phase}]`;
+
+    const content = document.createElement('div');
+    content.style.display = 'flex';
+    content.style.alignItems = 'center';
+    content.style.justifyContent = 'space-between';
+
+    const messageContainer = document.createElement('div');
+    messageContainer.style.flex = '1';
+
+    const source = document.createElement('span');
+    source.className = `log-source log-source-${getSourceClass(log.source)}`;
+    source.textContent = `${log.source}: `;
+
+    const message = document.createElement('span');
+    message.className = 'log-message';
+    message.textContent = log.message;
+
+    messageContainer.appendChild(source);
+    messageContainer.appendChild(message);
+
+    content.appendChild(messageContainer);
+
+    // 添加记忆按钮（只为非系统消息添加）
+    if (log.source !== '系统') {
+        const memoryBtn = document.createElement('button');
+        memoryBtn.className = 'memory-btn';
+        memoryBtn.textContent = '记忆';
+        // 传递完整的日志条目，而不是仅传递角色名称
+        memoryBtn.onclick = () => showSpeechMemory(log);
+        content.appendChild(memoryBtn);
+    }
 
-        messageContainer.appendChild(source);
-        messageContainer.appendChild(message);
+    entry.appendChild(time);
+    entry.appendChild(content);
 
-        content.appendChild(messageContainer);
+    return entry;
+}
 
-        // 添加记忆按钮（只为非系统消息添加）
-        if (log.source !== '系统') {
-            const memoryBtn = document.createElement('button');
-            memoryBtn.className = 'memory-btn';
-            memoryBtn.textContent = '记忆';
-            // 传递完整的日志条目，而不是仅传递角色名称
-            memoryBtn.onclick = () => showSpeechMemory(log);
-            content.appendChild(memoryBtn);
+// 处理流式发言的增量文本
+function handleSpeechDelta(data) {
+    if (!isCurrentGame(data)) {
+        return;
+    }
+    if (data.done) {
+        // 完整发言会随后续的game_update写入日志
+        delete gameState.streamingSpeeches[data.speech_id];
+        const entry = document.getElementById(data.speech_id);
+        if (entry) {
+            entry.classList.remove('streaming');
         }
+        return;
+    }
+
+    const speech = gameState.streamingSpeeches[data.speech_id] || { character: data.character, text: '' };
+    speech.text += data.delta;
+    gameState.streamingSpeeches[data.speech_id] = speech;
+    renderStreamingSpeech(data.speech_id);
+    elements.gameLogs.scrollTop = elements.gameLogs.scrollHeight;
+}
+
+// 渲染正在生成的发言
+function renderStreamingSpeech(speechId) {
+    const speech = gameState.streamingSpeeches[speechId];
+    let entry = document.getElementById(speechId);
+
+    if (!entry) {
+        entry = document.createElement('div');
+        entry.id = speechId;
+        entry.dataset.speechId = speechId;
+        entry.className = 'log-entry streaming';
 
-        entry.appendChild(time);
-        entry.appendChild(content);
+        const source = document.createElement('span');
+        source.className = `log-source log-source-${getSourceClass(speech.character)}`;
+        source.textContent = `${speech.character}: `;
+
+        const message = document.createElement('span');
+        message.className = 'log-message';
 
+        entry.appendChild(source);
+        entry.appendChild(message);
         elements.gameLogs.appendChild(entry);
-    });
+    }
 
-    // 滚动到底部
-    elements.gameLogs.scrollTop = elements.gameLogs.scrollHeight;
+    entry.querySelector('.log-message').textContent = speech.text;
 }
 
 // 显示特定发言的记忆
@@ -288,7 +459,7 @@ async function showSpeechMemory(logEntry) {
         // 检查是否有AI调用记录ID
         if (logEntry.ai_call_ids && logEntry.ai_call_ids.length > 0) {
             // 调用新的API获取特定发言的AI调用记录
-            const response = await fetch(`/api/character/memory/speech/${encodeURIComponent(logEntry.source)}`, {
+            const response = await fetch(`${memoryApiBase}/speech/${encodeURIComponent(logEntry.source)}`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
@@ -317,7 +488,7 @@ async function showSpeechMemory(logEntry) {
 // 显示角色记忆
 async function showCharacterMemory(characterName) {
     try {
-        const response = await fetch(`/api/character/memory/${encodeURIComponent(characterName)}`);
+        const response = await fetch(`${memoryApiBase}/${encodeURIComponent(characterName)}`);
         const data = await response.json();
 
         if (data.status === 'success') {
@@ -630,6 +801,7 @@ function getCallTypeText(callType) {
         'vote_reason': '投票理由',
         'hunter_skill': '猎人技能',
         'hunter_skill_reason': '猎人技能理由',
+        'memory_summary': '记忆整理',
         'general': '一般调用'
     };
     return typeMap[callType] || callType;
@@ -660,11 +832,11 @@ function escapeHtml(text) {
 
 // 初始化：获取当前游戏状态
 function initializeGame() {
-    fetch('/api/game/state')
+    fetch(`${gameApiBase}/state`)
         .then(response => response.json())
         .then(data => {
             if (data.status === 'success') {
-                updateGameState(data.data);
+                applySnapshot(data.data);
             } else {
                 addModelCallRecord('系统', '状态查询', `获取游戏状态失败: ${data.message}`, 'error');
             }
@@ -724,8 +896,8 @@ class VoiceQueueManager {
     }
     
     // 添加语音到队列
-    addToQueue(character, text) {
-        this.queue.push({ character, text });
+    addToQueue(character, text, audioUrl = null, audioMimetype = null) {
+        this.queue.push({ character, text, audioUrl, audioMimetype });
         console.log(`语音已加入队列: ${character} - ${text.substring(0, 30)}...`);
         
         // 如果当前没有播放，开始播放
@@ -741,72 +913,118 @@ class VoiceQueueManager {
         }
         
         this.isPlaying = true;
-        const { character, text } = this.queue.shift();
+        const { character, text, audioUrl, audioMimetype } = this.queue.shift();
         
         try {
             console.log(`开始播放队列中的语音: ${character} - ${text.substring(0, 50)}...`);
             
-            // 调用语音合成API
-            const response = await fetch('/api/voice/synthesize', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    text: text,
-                    character: character
-                })
-            });
+            // 浏览器不支持服务端配置的压缩格式（如旧版浏览器不支持Opus）时，改用WAV格式合成
+            const playable = !audioMimetype || new Audio().canPlayType(audioMimetype) !== '';
             
-            if (!response.ok) {
-                throw new Error(`语音合成失败: ${response.status}`);
+            // 预合成的音频地址直接作为音频源，浏览器边下载边播放；获取失败时改用语音合成API
+            let played = false;
+            if (audioUrl && playable) {
+                played = await this.playSource(character, audioUrl).catch((error) => {
+                    console.warn(`${character}的预合成语音获取失败，改用语音合成:`, error);
+                    return false;
+                });
+            }
+            if (!played) {
+                await this.playSynthesized(character, text, playable ? null : 'wav');
             }
             
-            // 获取音频数据
-            const audioBlob = await response.blob();
-            const audioUrl = URL.createObjectURL(audioBlob);
+            // 发送语音播放完成确认到后端
+            this.sendVoiceCompletion(character, text);
             
-            // 创建音频对象
-            const audio = new Audio(audioUrl);
+        } catch (error) {
+            console.error(`为${character}生成/播放语音失败:`, error);
+        } finally {
+            this.currentAudio = null;
+            this.isPlaying = false;
+            
+            // 播放下一段语音
+            this.processQueue();
+        }
+    }
+    
+    // 播放一个音频地址，播放完成时返回true
+    playSource(character, src) {
+        return new Promise((resolve, reject) => {
+            const audio = new Audio(src);
             this.currentAudio = audio;
             
             audio.onloadeddata = () => {
                 console.log(`开始播放${character}的语音`);
             };
-            
             audio.onended = () => {
                 console.log(`${character}的语音播放完成`);
-                URL.revokeObjectURL(audioUrl); // 释放内存
-                this.currentAudio = null;
-                this.isPlaying = false;
-                
-                // 发送语音播放完成确认到后端
-                this.sendVoiceCompletion(character, text);
-                
-                // 播放下一段语音
-                this.processQueue();
+                resolve(true);
             };
-            
-            audio.onerror = (error) => {
-                console.error(`${character}的语音播放失败:`, error);
-                URL.revokeObjectURL(audioUrl);
-                this.currentAudio = null;
-                this.isPlaying = false;
-                
-                // 播放下一段语音
-                this.processQueue();
+            audio.onerror = () => {
+                reject(new Error(`${character}的语音播放失败`));
             };
-            
-            // 播放音频
-            await audio.play();
-            
-        } catch (error) {
-            console.error(`为${character}生成/播放语音失败:`, error);
-            this.isPlaying = false;
-            
-            // 播放下一段语音
-            this.processQueue();
+            audio.play().catch(reject);
+        });
+    }
+    
+    // 调用语音合成API并播放：浏览器支持该音频格式的MSE时边接收边播放，否则接收完整音频后播放
+    async playSynthesized(character, text, format = null) {
+        const response = await fetch('/api/voice/synthesize', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                text: text,
+                character: character,
+                stream: true,
+                ...(format ? { format: format } : {})
+            })
+        });
+        
+        if (!response.ok) {
+            throw new Error(`语音合成失败: ${response.status}`);
         }
+        
+        const mimeType = (response.headers.get('Content-Type') || '').split(';')[0];
+        const streaming = window.MediaSource && response.body && MediaSource.isTypeSupported(mimeType);
+        const src = streaming
+            ? this.createStreamingSource(response, mimeType)
+            : URL.createObjectURL(await response.blob());
+        
+        try {
+            await this.playSource(character, src);
+        } finally {
+            URL.revokeObjectURL(src); // 释放内存
+        }
+    }
+    
+    // 把分块传输的响应接入MediaSource，返回可以直接播放的地址
+    createStreamingSource(response, mimeType) {
+        const mediaSource = new MediaSource();
+        const reader = response.body.getReader();
+        
+        mediaSource.addEventListener('sourceopen', async () => {
+            const sourceBuffer = mediaSource.addSourceBuffer(mimeType);
+            try {
+                while (true) {
+                    const { done, value } = await reader.read();
+                    if (done) {
+                        break;
+                    }
+                    sourceBuffer.appendBuffer(value);
+                    await new Promise((resolve) => sourceBuffer.addEventListener('updateend', resolve, { once: true }));
+                }
+                mediaSource.endOfStream();
+            } catch (error) {
+                console.error('语音流读取失败:', error);
+                if (mediaSource.readyState === 'open') {
+                    mediaSource.endOfStream('network');
+                }
+            }
+        }, { once: true });
+        
+        return URL.createObjectURL(mediaSource);
     }
     
     // 清空队列
@@ -835,6 +1053,7 @@ class VoiceQueueManager {
             socket.emit('voice_completed', {
                 character: character,
                 text: text,
+                game_id: gameId,
                 timestamp: Date.now()
             });
             console.log(`已发送语音完成确认: ${character}`);
@@ -848,7 +1067,7 @@ class VoiceQueueManager {
 const voiceQueueManager = new VoiceQueueManager();
 
 // 语音播放功能 - 现在使用队列管理
-async function playCharacterVoice(character, text) {
+async function playCharacterVoice(character, text, audioUrl = null, audioMimetype = null) {
     // 将语音添加到队列
-    voiceQueueManager.addToQueue(character, text);
+    voiceQueueManager.addToQueue(character, text, audioUrl, audioMimetype);
 }
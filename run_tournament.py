@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+狼人杀批量对局启动脚本
+
+示例:
+    python run_tournament.py --games 1000 --client mock
+    python run_tournament.py --games 50 --client real --roster config/qwen.json --roster config/deepseek.json
+"""
+
+import json
+import argparse
+from backend.utils.tournament_runner import run_tournament
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并行运行多局无头狼人杀游戏")
+    parser.add_argument("--games", type=int, default=100, help="对局数量")
+    parser.add_argument("--workers", type=int, default=None, help="进程数量，默认使用全部CPU核")
+    parser.add_argument("--roster", action="append", default=None,
+                        help="角色阵容文件（characters.json格式），可重复指定以轮换阵容")
+    parser.add_argument("--client", default="mock",
+                        help="AI客户端工厂：mock、real或'模块:函数'")
+    parser.add_argument("--seed", type=int, default=0, help="基础随机种子")
+    parser.add_argument("--output", default=None, help="将完整结果写入JSON文件")
+    args = parser.parse_args()
+
+    rosters = args.roster or ["config/characters.json"]
+    print(f"开始批量对局: {args.games}局, 阵容{len(rosters)}个, 客户端: {args.client}")
+
+    outcome = run_tournament(rosters, args.games, args.client, args.workers, args.seed)
+    report = outcome["report"]
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(outcome, f, ensure_ascii=False, indent=2)
+        print(f"完整结果已写入: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
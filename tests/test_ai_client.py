@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+AI客户端测试脚本
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.character import Character
+from backend.utils.http_pool import get_session
+from backend.utils.mock_ai_client import MockAIClient, get_mock_ai_client
+from backend.utils.resilience import resilience_policy
+
+
+def create_character():
+    """创建测试角色"""
+    character = Character(id=1, name="测试角色", gender="男", style="理性", model="mock", role="villager")
+    return character
+
+
+def test_session_shared_per_endpoint():
+    """同一端点的请求共享一个连接池"""
+    first = get_session("https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation")
+    second = get_session("https://dashscope.aliyuncs.com/other/path")
+    other = get_session("https://api.deepseek.com/v1/chat/completions")
+
+    assert first is second
+    assert first is not other
+
+
+def test_generate_response_async():
+    """异步接口返回结果并记录调用"""
+    client = get_mock_ai_client()
+    client.emit_status = False
+    character = create_character()
+
+    response = asyncio.run(client.generate_response_async("请发言", character, "public_speech"))
+
+    assert response
+    assert client.call_stats["success"] == 1
+    assert "latest_ai_call_id" in character.memory
+
+
+def test_background_call_keeps_latest_call_id():
+    """后台的记忆整理调用不覆盖游戏循环读取的latest_ai_call_id"""
+    client = get_mock_ai_client()
+    client.emit_status = False
+    character = create_character()
+
+    client.generate_response("请做决定", character, "inner_decision")
+    decision_call_id = character.memory["latest_ai_call_id"]
+    client.generate_response("请整理记忆", character, "memory_summary")
+
+    assert character.memory["latest_ai_call_id"] == decision_call_id
+    assert client.call_stats["total"] == 2
+
+
+class HedgedUsageAIClient(MockAIClient):
+    """每次请求都上报token用量；设置slow后下一次请求变慢，触发对冲"""
+
+    provider = "usage-test"
+
+    def __init__(self):
+        super().__init__()
+        self.attempts = 0
+        self.slow = False
+        self.lock = threading.Lock()
+
+    def _send_request(self, system_prompt, prompt, call_type, character=None):
+        with self.lock:
+            self.attempts += 1
+            slow, self.slow = self.slow, False
+        if slow:
+            time.sleep(0.5)
+        self._record_usage({"input_tokens": 10, "output_tokens": 5})
+        return "slow" if slow else "fast"
+
+
+def test_usage_counts_only_the_winning_attempt():
+    """对冲请求的两次尝试都返回用量时，只统计最终采用的一次"""
+    resilience_policy.configure(hedge=True, hedge_min_samples=5)
+    try:
+        client = HedgedUsageAIClient()
+        client.emit_status = False
+        for _ in range(5):
+            client.generate_response("预热")
+        client.slow = True
+        response = client.generate_response("请发言")
+        # 等待被丢弃的慢请求结束，它上报的用量不应计入
+        time.sleep(0.6)
+    finally:
+        resilience_policy._init()
+
+    assert response == "fast" and client.attempts == 7
+    assert client.token_stats == {"input_tokens": 60, "cached_tokens": 0, "output_tokens": 30}
+    assert client.call_stats == {"total": 6, "success": 6, "error": 0}
+
+
+if __name__ == "__main__":
+    test_session_shared_per_endpoint()
+    test_generate_response_async()
+    test_background_call_keeps_latest_call_id()
+    test_usage_counts_only_the_winning_attempt()
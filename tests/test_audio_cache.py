@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+语音音频缓存测试脚本
+验证按内容哈希命中缓存、按容量做LRU淘汰、重启后从目录恢复索引，以及重复的语音不再调用合成
+"""
+
+import os
+import sys
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils.audio_cache import AudioCache, audio_key
+
+
+class FakeSynthesizer:
+    """记录调用次数的假合成器，替代CosyVoice，通过回调返回音频"""
+
+    calls = []
+
+    def __init__(self, model, voice, format=None, callback=None):
+        self.model = model
+        self.voice = voice
+        self.callback = callback
+
+    def call(self, text):
+        FakeSynthesizer.calls.append((self.voice, text))
+        self.callback.on_data(f"{self.voice}:{text}".encode("utf-8"))
+        self.callback.on_complete()
+
+
+def test_key_depends_on_text_voice_and_model():
+    """文本、音色、模型、输出格式任一不同，键都不同；键以格式对应的扩展名结尾"""
+    fields = ("天亮了", "longxiaochun_v2", "cosyvoice-v2", "MP3_22050HZ_MONO_256KBPS", "mp3")
+    key = audio_key(*fields)
+    assert key == audio_key(*fields) and key.endswith(".mp3")
+    assert key != audio_key("天黑了", *fields[1:])
+    assert key != audio_key(fields[0], "longfei_v2", *fields[2:])
+    assert key != audio_key(*fields[:2], "cosyvoice-v1", *fields[3:])
+    assert key != audio_key(*fields[:3], "MP3_16000HZ_MONO_128KBPS", "mp3")
+
+
+def test_lru_eviction_without_rescan():
+    """超过容量时淘汰最久未使用的条目，读取会刷新使用顺序；重启后按文件恢复索引"""
+    with tempfile.TemporaryDirectory() as audio_dir:
+        cache = AudioCache(audio_dir, max_bytes=25)
+        cache.put("a.mp3", b"a" * 10)
+        cache.put("b.mp3", b"b" * 10)
+        assert cache.get("a.mp3") == b"a" * 10
+        cache.put("c.ogg", b"c" * 10)
+
+        assert "b.mp3" not in cache and "a.mp3" in cache and "c.ogg" in cache
+        assert not os.path.exists(cache.path("b.mp3"))
+        stats = cache.get_stats()
+        assert stats["bytes"] == 20 and stats["evictions"] == 1 and stats["hits"] == 1
+
+        restarted = AudioCache(audio_dir, max_bytes=25)
+        assert restarted.get_stats()["bytes"] == 20
+        assert restarted.get("c.ogg") == b"c" * 10
+        assert restarted.get("b.mp3") is None
+
+
+def test_voice_client_synthesizes_each_line_once():
+    """重复的播报直接读取缓存，不再调用语音合成"""
+    with tempfile.TemporaryDirectory() as audio_dir:
+        previous = {name: os.environ.get(name) for name in ("DASHSCOPE_API_KEY", "AUDIO_DIR")}
+        os.environ["DASHSCOPE_API_KEY"] = os.environ.get("DASHSCOPE_API_KEY") or "test"
+        os.environ["AUDIO_DIR"] = audio_dir
+        try:
+            from backend.utils import voice_client as voice_module
+            original = voice_module.SpeechSynthesizer
+            voice_module.SpeechSynthesizer = FakeSynthesizer
+            FakeSynthesizer.calls = []
+            try:
+                client = voice_module.VoiceClient()
+                first = client.synthesize_speech("天亮了", "系统")
+                second = client.synthesize_speech("天亮了", "系统")
+                other = client.synthesize_speech("天亮了", "张明盛")
+            finally:
+                voice_module.SpeechSynthesizer = original
+        finally:
+            for name, value in previous.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+    assert first == second and other != first
+    assert FakeSynthesizer.calls == [("longxiaochun_v2", "天亮了"), ("longfei_v2", "天亮了")]
+    assert client.speech_key("天亮了", "系统") == audio_key("天亮了", "longxiaochun_v2", "cosyvoice-v2", "MP3_22050HZ_MONO_256KBPS", "mp3")
+
+
+if __name__ == "__main__":
+    test_key_depends_on_text_voice_and_model()
+    test_lru_eviction_without_rescan()
+    test_voice_client_synthesizes_each_line_once()
+    print("语音音频缓存测试通过")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+上下文组装器测试脚本
+验证token估算、按优先级装入预算以及截断和丢弃报告
+"""
+
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.game_engine import GameEngine
+from backend.utils.context_builder import ContextBuilder, estimate_tokens, fit_text
+from backend.utils.mock_ai_client import get_mock_ai_client
+from backend.utils.prompt_layout import is_stable_layout, profile_text, role_description
+
+ROSTER = [
+    {"id": i + 1, "name": f"预算角色{i + 1}", "gender": "男", "style": "理性", "model": "mock"}
+    for i in range(8)
+]
+
+
+def test_estimate_and_fit_text():
+    """中文按字计数，英文约4个字符一个token，截断结果不超过预算"""
+    assert estimate_tokens("狼人杀") == 3
+    assert estimate_tokens("abcdefgh") == 2
+    assert fit_text("短文本", 10) == "短文本"
+
+    head = fit_text("一二三四五六七八九十", 5)
+    tail = fit_text("一二三四五六七八九十", 5, keep="tail")
+    assert head.startswith("一") and head.endswith("...") and estimate_tokens(head) <= 5
+    assert tail.endswith("十") and estimate_tokens(tail) <= 5
+
+
+def test_sections_packed_by_priority():
+    """必选部分总是保留，高优先级先装入，可截断的部分保留最近的行，输出保持添加顺序"""
+    history = "历史：\n" + "".join(f"第{i}条日志内容\n" for i in range(20))
+    builder = ContextBuilder(budget=60)
+    builder.add("profile", "角色信息\n", 100, required=True)
+    builder.add("notes", "可有可无的补充说明" * 5 + "\n", 10)
+    builder.add("history", history, 70, keep="tail", header="历史：\n")
+
+    context, report = builder.build()
+    assert context.startswith("角色信息\n历史：\n")
+    assert "第19条日志内容" in context and "第0条日志内容" not in context
+    assert report["truncated"] == ["history"] and report["dropped"] == ["notes"]
+    assert report["tokens"] <= 60
+
+
+def test_engine_context_respects_client_budget():
+    """角色上下文不超过其模型客户端的预算，并记录组装报告"""
+    engine = GameEngine()
+    engine.load_characters(ROSTER, lambda model: get_mock_ai_client())
+    engine.game.start_game()
+    character = engine.game.characters[0]
+    for i in range(40):
+        engine.game.log(f"预算角色{i % 8 + 1}", f"这是一段比较长的公开发言，编号{i}，用于填满上下文预算。")
+
+    full = engine.build_character_context(character)
+    assert engine.context_reports[character.name]["dropped"] == []
+
+    engine.ai_clients[character.id].context_window = engine.ai_clients[character.id].max_output_tokens + 300
+    bounded = engine.build_character_context(character)
+    report = engine.context_reports[character.name]
+    assert len(bounded) < len(full)
+    # 稳定前缀布局下角色信息放在系统提示词中，预算扣除这部分占用
+    static_tokens = estimate_tokens(profile_text(character.name, character.gender, character.style) + role_description(character.role))
+    assert report["budget"] == (300 - static_tokens if is_stable_layout() else 300)
+    assert report["tokens"] <= report["budget"]
+    assert "history" in report["truncated"]
+    assert engine.get_game_summary()["context"]["built"] == 2
+
+
+if __name__ == "__main__":
+    test_estimate_and_fit_text()
+    test_sections_packed_by_priority()
+    test_engine_context_respects_client_budget()
+    print("上下文组装器测试通过")
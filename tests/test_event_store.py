@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+共享事件存储测试脚本
+验证角色观察记录由共享事件和私有观察按顺序合并而成
+"""
+
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.game import Game
+from backend.models.character import Character
+
+
+def make_game(count=3):
+    """创建包含若干角色的游戏"""
+    game = Game()
+    for i in range(count):
+        game.add_character(Character(id=i + 1, name=f"事件角色{i + 1}", gender="男", style="理性", model="mock"))
+    return game
+
+
+def test_broadcast_is_stored_once_and_merged_in_order():
+    """共享事件只保存一份，发起者和不在场的角色看不到，与私有观察按发生顺序合并"""
+    game = make_game()
+    a, b, c = game.characters
+
+    b.add_observation("私有1", 1, "night")
+    game.events.broadcast("A说：你好", 1, "discussion", [a, b], actor=a)
+    b.add_observation("私有2", 1, "vote")
+    game.events.broadcast("投票结果", 1, "vote_result", [a, b])
+
+    assert len(game.events) == 2
+    assert [o["event"] for o in b.get_observations()] == ["私有1", "A说：你好", "私有2", "投票结果"]
+    assert [o["event"] for o in a.get_observations()] == ["投票结果"]
+    assert c.get_observations() == []
+    assert [o["event"] for o in b.get_recent_observations(2)] == ["私有2", "投票结果"]
+    # 同一事件在所有观察者中是同一个对象
+    assert a.get_observations()[0] is b.get_observations()[-1]
+
+
+def test_equal_audiences_share_one_set():
+    """相同的可见角色集合复用同一个对象"""
+    game = make_game()
+    for i in range(5):
+        game.events.broadcast(f"事件{i}", 1, "discussion", game.characters)
+
+    assert all(audience is game.events.audiences[0] for audience in game.events.audiences)
+
+
+if __name__ == "__main__":
+    test_broadcast_is_stored_once_and_merged_in_order()
+    test_equal_audiences_share_one_set()
+    print("共享事件存储测试通过")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+游戏注册表测试脚本
+"""
+
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.game import GameStatus
+from backend.models.game_registry import GameRegistry
+from backend.utils.mock_ai_client import get_mock_ai_client
+from backend.utils.ai_call_manager import ai_call_manager
+
+ROSTER = [
+    {"id": i + 1, "name": f"注册表角色{i + 1}", "gender": "男", "style": "理性", "model": "mock"}
+    for i in range(8)
+]
+
+
+def wait_until_finished(engines, timeout=30):
+    """等待所有游戏结束"""
+    deadline = time.time() + timeout
+    while not all(engine.finished_at for engine in engines):
+        assert time.time() < deadline, "等待游戏结束超时"
+        time.sleep(0.05)
+
+
+def test_registry_runs_games_on_bounded_pool():
+    """多局游戏在有界线程池中并行运行，彼此独立"""
+    registry = GameRegistry(max_workers=2, ttl=60)
+    try:
+        engines = [registry.create_game(ROSTER, get_mock_ai_client, headless=True) for _ in range(3)]
+        assert len({engine.game.id for engine in engines}) == 3
+        assert all(engine.room == engine.game.id for engine in engines)
+
+        for engine in engines:
+            assert engine.start_game()
+        wait_until_finished(engines)
+
+        games = registry.list_games()
+        assert [g["id"] for g in games] == [engine.game.id for engine in engines]
+        assert all(g["status"] == GameStatus.FINISHED.value for g in games)
+        assert registry.get_stats()["by_status"] == {"finished": 3}
+
+        # 同名角色的AI调用记录按游戏区分，不会混到其他牌桌
+        call_ids = [
+            {
+                record["call_id"]
+                for data in ROSTER
+                for record in ai_call_manager.get_all_ai_calls(data["name"], game_id=engine.room)
+            }
+            for engine in engines
+        ]
+        assert all(call_ids)
+        assert not call_ids[0] & call_ids[1] and not call_ids[1] & call_ids[2] and not call_ids[0] & call_ids[2]
+    finally:
+        registry.shutdown()
+
+
+def test_registry_evicts_and_deletes_games():
+    """结束超过TTL的游戏被清理，删除不存在的游戏返回False"""
+    registry = GameRegistry(max_workers=1, ttl=10)
+    try:
+        finished = registry.create_game(ROSTER, get_mock_ai_client, headless=True)
+        waiting = registry.create_game(ROSTER, get_mock_ai_client, headless=True)
+        finished.finished_at = time.time() - 11
+        record = {"call_id": "registry-call"}
+        for engine in (finished, waiting):
+            ai_call_manager.add_ai_call_record(ROSTER[0]["name"], record, game_id=engine.room)
+
+        assert registry.evict_expired() == [finished.game.id]
+        assert registry.get_game(finished.game.id) is None
+        assert registry.delete_game(waiting.game.id)
+        assert not registry.delete_game(waiting.game.id)
+        # 被清理和删除的游戏的AI调用记录一并释放
+        assert ai_call_manager.get_all_ai_calls(ROSTER[0]["name"], game_id=finished.room) == []
+        assert ai_call_manager.get_all_ai_calls(ROSTER[0]["name"], game_id=waiting.room) == []
+    finally:
+        registry.shutdown()
+
+
+if __name__ == "__main__":
+    test_registry_runs_games_on_bounded_pool()
+    test_registry_evicts_and_deletes_games()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+增量游戏更新测试脚本
+验证game_update只携带新增日志和变化的角色，并且按序应用增量可以还原完整快照
+"""
+
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.game_engine import GameEngine
+from backend.utils.mock_ai_client import get_mock_ai_client
+
+ROSTER = [
+    {"id": i + 1, "name": f"增量角色{i + 1}", "gender": "女", "style": "冷静", "model": "mock"}
+    for i in range(4)
+]
+
+
+class RecordingSocketIO:
+    """记录推送事件的SocketIO替身"""
+
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event, data, room=None):
+        self.events.append((event, data))
+
+    def updates(self):
+        return [data for event, data in self.events if event == "game_update"]
+
+
+def apply_delta(state, delta):
+    """按前端app.js的规则应用增量更新"""
+    assert delta["seq"] == state["seq"] + 1
+    state["seq"] = delta["seq"]
+    for key in ("status", "phase", "current_day", "winner"):
+        state[key] = delta[key]
+    if "characters" in delta:
+        state["characters"] = list(delta["characters"])
+    for changed in delta.get("character_changes", []):
+        index = [c["id"] for c in state["characters"]].index(changed["id"])
+        state["characters"][index] = changed
+    state["logs"] = state["logs"][:delta["log_offset"]] + delta["new_logs"]
+
+
+def test_updates_carry_only_new_logs_and_changed_characters():
+    """每次更新只包含上次推送之后的变化"""
+    socketio = RecordingSocketIO()
+    engine = GameEngine(socketio)
+    engine.load_characters(ROSTER, lambda model: get_mock_ai_client())
+
+    engine.game.log("系统", "第一条")
+    engine.emit_game_update("更新1")
+    engine.game.log("系统", "第二条")
+    engine.game.log("系统", "第三条")
+    engine.game.characters[1].alive = False
+    engine.emit_game_update("更新2")
+    engine.emit_game_update("更新3")
+
+    first, second, third = socketio.updates()
+    assert [u["seq"] for u in (first, second, third)] == [1, 2, 3]
+    assert "logs" not in second
+    assert len(first["characters"]) == len(ROSTER)
+    assert [log["message"] for log in second["new_logs"]] == ["第二条", "第三条"]
+    assert second["log_offset"] == 1
+    assert [c["id"] for c in second["character_changes"]] == [2]
+    assert third["new_logs"] == [] and third["character_changes"] == []
+
+    snapshot = engine.get_game_state()
+    assert snapshot["seq"] == 3
+    # 增量和快照都带游戏ID，客户端据此丢弃其他游戏的推送
+    assert {u["game_id"] for u in (first, second, third)} == {snapshot["game_id"]} == {engine.game.id}
+
+
+def test_deltas_reconstruct_snapshot_across_reset():
+    """从快照出发按序应用增量，结果与最新快照一致，游戏重置后同样成立"""
+    socketio = RecordingSocketIO()
+    engine = GameEngine(socketio)
+    engine.load_characters(ROSTER, lambda model: get_mock_ai_client())
+    engine.game.log("系统", "开局前")
+
+    state = engine.get_game_state()
+    for i in range(3):
+        engine.game.log("系统", f"第{i}条")
+        engine.emit_game_update(f"更新{i}")
+    engine.reset_game()
+    engine.game.log("系统", "重置后")
+    engine.emit_game_update("重置后更新")
+
+    updates = socketio.updates()
+    assert updates[-2]["log_offset"] == 0 and updates[-2]["characters"] == []
+    for delta in updates:
+        apply_delta(state, delta)
+
+    snapshot = engine.get_game_state()
+    for key in ("seq", "status", "phase", "current_day", "characters", "logs"):
+        assert state[key] == snapshot[key], key
+
+
+if __name__ == "__main__":
+    test_updates_carry_only_new_logs_and_changed_characters()
+    test_deltas_reconstruct_snapshot_across_reset()
+    print("增量游戏更新测试通过")
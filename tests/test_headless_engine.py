@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+无头模式测试脚本
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import threading
+import subprocess
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.game import GamePhase, GameStatus
+from backend.models.game_engine import GameEngine
+from backend.models.character import Character
+from backend.utils.mock_ai_client import MockAIClient, get_mock_ai_client
+
+
+class SlowMockAIClient(MockAIClient):
+    """每次调用固定延迟的模拟客户端，记录同时进行中的调用数量"""
+
+    lock = threading.Lock()
+    in_flight = 0
+    peak_in_flight = 0
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+
+    def generate_response(self, prompt, character=None, call_type="general", action_type=None, on_delta=None):
+        with SlowMockAIClient.lock:
+            SlowMockAIClient.in_flight += 1
+            SlowMockAIClient.peak_in_flight = max(SlowMockAIClient.peak_in_flight, SlowMockAIClient.in_flight)
+        try:
+            time.sleep(self.delay)
+            return super().generate_response(prompt, character, call_type, action_type, on_delta)
+        finally:
+            with SlowMockAIClient.lock:
+                SlowMockAIClient.in_flight -= 1
+
+
+def create_headless_engine():
+    """创建使用模拟AI客户端的无头游戏引擎"""
+    engine = GameEngine(headless=True)
+    for i in range(8):
+        character = Character(
+            id=i + 1,
+            name=f"测试角色{i + 1}",
+            gender="男" if i % 2 == 0 else "女",
+            style="理性",
+            model="mock"
+        )
+        engine.game.add_character(character)
+        engine.ai_clients[character.id] = get_mock_ai_client()
+    return engine
+
+
+def test_headless_game_runs_to_completion():
+    """无头模式应在没有任何等待的情况下跑完整局游戏"""
+    random.seed(42)
+    engine = create_headless_engine()
+
+    start = time.time()
+    game = engine.run_headless()
+    elapsed = time.time() - start
+
+    print(f"无头模式完成一局游戏，耗时{elapsed:.2f}秒，共{game.current_day}天")
+    assert game.phase == GamePhase.END
+    assert game.status == GameStatus.FINISHED
+    assert not engine.running
+    assert elapsed < 10
+    for client in engine.ai_clients.values():
+        assert client.emit_status is False
+
+
+def test_headless_engine_has_no_socketio():
+    """无头模式下忽略传入的SocketIO实例"""
+    engine = GameEngine(socketio=object(), headless=True)
+    assert engine.socketio is None
+
+
+def test_game_engine_does_not_import_voice_client():
+    """导入游戏引擎不应加载语音客户端（在独立进程中检查，不受测试顺序影响）"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.check_output(
+        [sys.executable, "-c",
+         "import sys; import backend.models.game_engine; "
+         "print('backend.utils.voice_client' in sys.modules)"],
+        cwd=root
+    )
+    assert output.decode().strip().splitlines()[-1] == "False"
+
+
+def test_vote_phase_calls_are_concurrent():
+    """投票阶段的AI调用应并发进行，结果按座位顺序应用"""
+    random.seed(1)
+    engine = create_headless_engine()
+    engine.game.start_game()
+    SlowMockAIClient.peak_in_flight = 0
+    for character in engine.game.characters:
+        engine.ai_clients[character.id] = SlowMockAIClient(0.05)
+        engine.ai_clients[character.id].emit_status = False
+
+    engine.handle_vote_phase()
+
+    vote_logs = [log for log in engine.game.logs if log["message"].startswith("投票给了")]
+    assert SlowMockAIClient.peak_in_flight > 1
+    assert [log["source"] for log in vote_logs] == [c.name for c in engine.game.characters]
+
+
+def test_seer_check_overlaps_werewolf_phase():
+    """预言家的查验在狼人行动时已经发起，结果在预言家阶段应用"""
+    random.seed(3)
+    engine = create_headless_engine()
+    engine.game.start_game()
+    SlowMockAIClient.peak_in_flight = 0
+    for character in engine.game.characters:
+        engine.ai_clients[character.id] = SlowMockAIClient(0.05)
+        engine.ai_clients[character.id].emit_status = False
+
+    engine.handle_werewolf_phase()
+    assert engine.pending_seer_check is not None
+    assert not [log for log in engine.game.logs if log["message"].startswith("预言家查验了")]
+    engine.handle_seer_phase()
+
+    seer = engine.game.get_character_by_role("seer")
+    check_logs = [log for log in engine.game.logs if log["message"].startswith("预言家查验了")]
+    assert SlowMockAIClient.peak_in_flight > 1
+    assert engine.pending_seer_check is None
+    assert [log["source"] for log in check_logs] == [seer.name]
+    assert len(check_logs[0]["ai_call_ids"]) == 1
+
+
+def test_discussion_uses_prefetched_speeches():
+    """讨论阶段在语音播放期间预生成下一位的发言；播放期间日志有新内容时重新生成"""
+    random.seed(2)
+    engine = create_headless_engine()
+    engine.game.start_game()
+    for ai_client in engine.ai_clients.values():
+        ai_client.emit_status = False
+
+    asyncio.run(engine.handle_discussion_phase())
+    speakers = len(engine.game.get_alive_characters())
+    assert engine.discussion_stats == {"prefetched": speakers - 1, "prefetch_hits": speakers - 1, "prefetch_stale": 0}
+
+    async def voice_with_interruption(character_name):
+        engine.game.log("系统", f"{character_name}的语音播放期间有新消息")
+
+    engine.discussion_stats = {"prefetched": 0, "prefetch_hits": 0, "prefetch_stale": 0}
+    engine.headless = False
+    engine.wait_for_voice_completion = voice_with_interruption
+    asyncio.run(engine.handle_discussion_phase())
+
+    speeches = [log for log in engine.game.logs if log.get("message_type") == "public_statement"]
+    assert engine.discussion_stats["prefetch_stale"] == speakers - 1
+    assert len(speeches) == speakers * 2
+    assert all(len(log["ai_call_ids"]) == 2 for log in speeches)
+
+
+if __name__ == "__main__":
+    test_headless_game_runs_to_completion()
+    test_headless_engine_has_no_socketio()
+    test_game_engine_does_not_import_voice_client()
+    test_vote_phase_calls_are_concurrent()
+    test_seer_check_overlaps_werewolf_phase()
+    test_discussion_uses_prefetched_speeches()
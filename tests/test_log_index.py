@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+日志受众索引测试脚本
+验证按索引读取的可见日志与逐条过滤的结果一致
+"""
+
+import os
+import sys
+import random
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.game import Game
+from backend.models.character import Character
+
+ROLES = ["werewolf", "werewolf", "seer", "witch", "guard", "villager"]
+
+
+def brute_force_visible(logs, character, window):
+    """按原有规则逐条过滤最近window条日志"""
+    visible = []
+    for log in logs[-window:]:
+        phase, source = log["phase"], log["source"]
+        if log["is_public"]:
+            visible.append(log)
+        elif character.role == "werewolf" and phase == "werewolf":
+            visible.append(log)
+        elif character.role in ("seer", "witch", "guard") and phase == character.role and source == character.name:
+            visible.append(log)
+    return visible
+
+
+def build_game(seed, count):
+    """生成包含各类公开和私有日志的游戏"""
+    rng = random.Random(seed)
+    game = Game()
+    for i, role in enumerate(ROLES):
+        character = Character(id=i + 1, name=f"索引角色{i + 1}", gender="男", style="理性", model="mock")
+        character.role = role
+        game.add_character(character)
+
+    for i in range(count):
+        source = rng.choice(game.characters).name
+        if rng.random() < 0.5:
+            game.log(rng.choice(["系统", source]), f"公开消息{i}", rng.choice(["discussion", "vote", "dawn"]))
+        else:
+            game.log(source, f"私有行动{i}", rng.choice(["werewolf", "seer", "witch", "guard"]), False, "action")
+    return game
+
+
+def test_indexed_windows_match_filtering():
+    """各身份、各窗口大小下索引读取与逐条过滤结果一致"""
+    game = build_game(seed=7, count=300)
+    for character in game.characters:
+        for window in (1, 15, 60, 1000):
+            assert game.get_visible_logs(character, window) == brute_force_visible(game.logs, character, window)
+
+
+def test_digest_index_keeps_key_public_messages():
+    """公开摘要只包含关键系统消息和讨论、投票阶段的发言"""
+    game = Game()
+    game.log("系统", "第1天，天亮了", "dawn")
+    game.log("系统", "角色身份已分配")
+    game.log("张三", "我是好人", "discussion")
+    game.log("张三", "夜里的私有行动", "werewolf", False)
+    game.log("李四", "PK发言", "pk")
+
+    digest = game.get_visible_logs(audiences=["digest"])
+    assert [log["message"] for log in digest] == ["第1天，天亮了", "我是好人"]
+
+
+if __name__ == "__main__":
+    test_indexed_windows_match_filtering()
+    test_digest_index_keeps_key_public_messages()
+    print("日志受众索引测试通过")
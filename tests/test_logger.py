@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+结构化日志测试脚本
+验证日志在后台线程中格式化写入、级别过滤、采样、对局上下文，以及无头模式下静默
+"""
+
+import io
+import os
+import sys
+import json
+import random
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.game_engine import GameEngine
+from backend.utils.logger import structured_logger, get_logger
+from backend.utils.mock_ai_client import get_mock_ai_client
+
+ROSTER = [
+    {"id": i + 1, "name": f"日志角色{i + 1}", "gender": "男", "style": "理性", "model": "mock"}
+    for i in range(8)
+]
+
+
+CONFIG_FIELDS = ("level", "format", "quiet", "sample_rates", "stream")
+
+
+def capture(**config):
+    """把日志输出到内存中，返回输出缓冲区和原配置"""
+    structured_logger.flush()
+    previous = {field: getattr(structured_logger, field) for field in CONFIG_FIELDS}
+    output = io.StringIO()
+    structured_logger.configure(stream=output, **config)
+    return output, previous
+
+
+def restore(previous):
+    """恢复原配置"""
+    structured_logger.flush()
+    for field, value in previous.items():
+        setattr(structured_logger, field, value)
+
+
+def test_records_are_formatted_in_background():
+    """日志按级别过滤，消息模板在写入时才格式化，JSON格式包含上下文和字段"""
+    output, previous = capture(level="info", format="json", sample_rates={})
+    try:
+        logger = get_logger(game_id="g1")
+        logger.debug("test.debug", "不应输出")
+        logger.info("test.event", "{character}说：{message:.4}", character="甲", message="一二三四五六")
+        structured_logger.flush()
+    finally:
+        restore(previous)
+
+    lines = output.getvalue().splitlines()
+    assert len(lines) == 1
+    record = json.loads(lines[0])
+    assert record["event"] == "test.event" and record["game_id"] == "g1"
+    assert record["msg"] == "甲说：一二三四" and record["message"] == "一二三四五六"
+
+
+def test_sampling_and_quiet():
+    """采样按计数保留固定比例；静默的日志器和全局静默都不输出"""
+    output, previous = capture(level="info", format="text", sample_rates={"test.sampled": 0.25})
+    try:
+        logger = get_logger()
+        for i in range(8):
+            logger.info("test.sampled", "第{index}条", index=i)
+        quiet_logger = get_logger(game_id="quiet")
+        quiet_logger.quiet = True
+        quiet_logger.error("test.quiet", "不应输出")
+        structured_logger.configure(quiet=True)
+        logger.error("test.quiet", "不应输出")
+        structured_logger.flush()
+    finally:
+        restore(previous)
+
+    lines = output.getvalue().splitlines()
+    assert len(lines) == 2 and "第3条" in lines[0] and "第7条" in lines[1]
+
+
+def test_headless_game_is_quiet():
+    """无头对局的日志器都是静默的，日志在入队之前丢弃"""
+    output, previous = capture(level="debug", format="text", sample_rates={})
+    try:
+        random.seed(5)
+        engine = GameEngine(headless=True)
+        engine.load_characters(ROSTER, get_mock_ai_client)
+        engine.run_headless()
+        structured_logger.flush()
+    finally:
+        restore(previous)
+
+    assert engine.game.logger.quiet
+    assert all(client.logger.quiet for client in engine.ai_clients.values())
+    assert "game_id=" + engine.game.id not in output.getvalue()
+
+
+if __name__ == "__main__":
+    test_records_are_formatted_in_background()
+    test_sampling_and_quiet()
+    test_headless_game_is_quiet()
+    print("结构化日志测试通过")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+角色记忆整理测试脚本
+验证最近记忆有上限，移出窗口的记忆被整理进摘要并出现在记忆摘要中
+"""
+
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.game import Game
+from backend.models.character import Character, MEMORY_WINDOW
+from backend.utils.memory_summarizer import MemorySummarizer
+from backend.utils.mock_ai_client import get_mock_ai_client
+
+
+class FailingAIClient:
+    """总是调用失败的AI客户端"""
+
+    def generate_response(self, prompt, character=None, call_type="general", action_type=None, on_delta=None, fallback=True):
+        raise ConnectionError("模型不可用")
+
+
+def make_character():
+    """创建加入游戏的角色"""
+    game = Game()
+    character = Character(id=1, name="记忆角色", gender="女", style="冷静", model="mock")
+    other = Character(id=2, name="旁观者", gender="男", style="理性", model="mock")
+    game.add_character(character)
+    game.add_character(other)
+    return game, character, other
+
+
+def test_recent_memory_is_bounded():
+    """最近记忆不超过窗口，溢出的条目和过旧的共享事件进入待整理队列"""
+    game, character, other = make_character()
+    for i in range(MEMORY_WINDOW + 3):
+        character.add_statement(f"发言{i}", 1, "discussion")
+        game.events.broadcast(f"旁观者说：{i}", 1, "discussion", [character, other], actor=other)
+
+    assert len(character.memory["statements"]) == MEMORY_WINDOW
+    assert len(character.get_recent_statements()) == 3
+    # 提示词读取整个窗口：仍在窗口内的最早发言和共享事件都出现在记忆摘要中，移出窗口的进入待整理队列
+    memory_summary = character.get_memory_summary()
+    assert "发言3'" in memory_summary and "旁观者说：3" in memory_summary
+    assert "发言2'" not in memory_summary and "旁观者说：2\n" not in memory_summary
+    assert character.take_compaction_batch(min_items=100) == []
+
+    lines = character.take_compaction_batch()
+    assert len(lines) == 6
+    assert "旁观者说：0" in lines[0] and "发言0" in lines[3]
+    assert character.take_compaction_batch() == []
+
+
+def test_summary_is_built_and_used_in_prompts():
+    """整理结果写入摘要并出现在记忆摘要中，模型不可用时保留截断的原文"""
+    game, character, other = make_character()
+    for i in range(MEMORY_WINDOW + 2):
+        character.add_observation(f"观察{i}", 1, "night")
+
+    summarizer = MemorySummarizer(batch_size=2, max_chars=50)
+    assert summarizer.maybe_compact(character, get_mock_ai_client())
+    assert character.memory["summary"]
+    assert "更早的记忆摘要" in character.get_memory_summary()
+
+    character.memory["summary"] = ""
+    for i in range(2):
+        character.add_observation(f"新观察{i}", 2, "night")
+    assert summarizer.maybe_compact(character, FailingAIClient())
+    assert "观察" in character.memory["summary"] and len(character.memory["summary"]) <= 50
+    assert summarizer.get_stats() == {"compactions": 2, "failures": 1, "items": 4}
+
+
+if __name__ == "__main__":
+    test_recent_memory_is_bounded()
+    test_summary_is_built_and_used_in_prompts()
+    print("角色记忆整理测试通过")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+耗时指标测试脚本
+验证直方图的Prometheus输出、快照相减与合并，以及游戏和批量对局中的耗时统计
+"""
+
+import os
+import sys
+import random
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.character import Character
+from backend.models.game_engine import GameEngine
+from backend.utils.metrics import MetricsRegistry, metrics, diff_snapshots, merge_snapshots, summarize_snapshot
+from backend.utils.mock_ai_client import get_mock_ai_client
+from backend.utils.tournament_runner import play_single_game, aggregate_results
+
+ROSTER = [
+    {"id": i + 1, "name": f"指标角色{i + 1}", "gender": "男", "style": "理性", "model": "mock"}
+    for i in range(8)
+]
+
+
+def test_histograms_render_as_prometheus():
+    """直方图按标签分组，桶计数累计输出，快照可以相减、合并和汇总"""
+    registry = MetricsRegistry()
+    assert registry is metrics
+    before = registry.snapshot()
+
+    registry.observe("werewolf_test_seconds", 0.003, stage="a")
+    registry.observe("werewolf_test_seconds", 0.2, stage="a")
+    registry.observe("werewolf_test_seconds", 500, stage="a")
+    with registry.timer("werewolf_test_seconds", stage="b"):
+        pass
+
+    text = registry.render_prometheus()
+    assert "# TYPE werewolf_test_seconds histogram" in text
+    assert 'werewolf_test_seconds_bucket{stage="a",le="0.005"} 1' in text
+    assert 'werewolf_test_seconds_bucket{stage="a",le="0.25"} 2' in text
+    assert 'werewolf_test_seconds_bucket{stage="a",le="+Inf"} 3' in text
+    assert 'werewolf_test_seconds_count{stage="b"} 1' in text
+
+    delta = diff_snapshots(registry.snapshot(), before)
+    series = delta["werewolf_test_seconds"]['stage="a"']
+    assert series["count"] == 3
+    merged = merge_snapshots([delta, delta])
+    summary = summarize_snapshot(merged)["werewolf_test_seconds"]['stage="a"']
+    assert summary["count"] == 6 and 0.1 < summary["p50"] <= 0.25
+    assert summary["p95"] == 120.0
+
+
+def test_game_records_phase_and_call_latency():
+    """完整对局记录每个阶段和每次AI调用的耗时"""
+    random.seed(3)
+    engine = GameEngine(headless=True)
+    engine.load_characters(ROSTER, get_mock_ai_client)
+    before = metrics.snapshot()
+    engine.run_headless()
+    delta = diff_snapshots(metrics.snapshot(), before)
+
+    phases = {s["labels"]["phase"] for s in delta["werewolf_phase_seconds"].values()}
+    assert {"night", "werewolf", "discussion", "vote"} <= phases
+    stages = {(s["labels"]["call_type"], s["labels"]["stage"]) for s in delta["werewolf_ai_call_seconds"].values()}
+    assert ("vote", "queue") in stages and ("vote", "total") in stages
+
+
+def test_tournament_report_includes_latency():
+    """批量对局的每局结果只包含本局的耗时，汇总报告给出各指标的分位数"""
+    results = [play_single_game(i, ROSTER, "mock", seed=i) for i in range(2)]
+    per_game = [sum(s["count"] for s in r["metrics"]["werewolf_phase_seconds"].values()) for r in results]
+
+    report = aggregate_results(results)
+    phase_latency = report["latency"]["werewolf_phase_seconds"]
+    assert sum(s["count"] for s in phase_latency.values()) == sum(per_game)
+    assert all(s["p95"] >= s["p50"] for s in phase_latency.values())
+
+
+if __name__ == "__main__":
+    test_histograms_render_as_prometheus()
+    test_game_records_phase_and_call_latency()
+    test_tournament_report_includes_latency()
+    print("耗时指标测试通过")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+提示词布局测试脚本
+验证稳定前缀布局下系统提示词逐字节相同、易变内容只在用户提示词中，以及缓存命中token数的统计
+"""
+
+import os
+import sys
+import random
+from collections import defaultdict
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.character import Character
+from backend.models.game_engine import GameEngine
+from backend.utils import prompt_layout
+from backend.utils.ai_client import QwenClient, parse_usage
+from backend.utils.mock_ai_client import MockAIClient
+from backend.utils.prompt_templates import VOTE_TEMPLATE, ROLE_VOTE_GUIDANCE
+from backend.utils.stub_llm_server import StubLLMServer
+
+
+class RecordingMockAIClient(MockAIClient):
+    """记录每次请求的系统提示词和用户提示词的模拟客户端"""
+
+    def __init__(self, requests):
+        super().__init__()
+        self.requests = requests
+
+    def _send_request(self, system_prompt, prompt, call_type, character=None):
+        self.requests.append((character.name if character else None, call_type, system_prompt, prompt))
+        return super()._send_request(system_prompt, prompt, call_type, character)
+
+
+def use_layout(layout):
+    """切换提示词布局并返回原布局"""
+    previous = prompt_layout.PROMPT_LAYOUT
+    prompt_layout.PROMPT_LAYOUT = layout
+    return previous
+
+
+def test_legacy_layout_keeps_full_template():
+    """legacy布局生成的提示词与原有完整模板一致"""
+    character = Character(id=1, name="旧布局", gender="男", style="理性", model="mock")
+    character.role = "seer"
+    fields = {"day": 2, "alive_players": "甲, 乙", "targets": "乙", "context": "上下文"}
+    previous = use_layout("legacy")
+    try:
+        prompt = prompt_layout.render_prompt("vote", character, **fields)
+    finally:
+        use_layout(previous)
+    assert prompt == VOTE_TEMPLATE.format(role_specific_guidance=ROLE_VOTE_GUIDANCE["seer"], **fields)
+
+
+def test_stable_layout_keeps_system_prefix_identical():
+    """整局游戏中同一角色同一调用类型的系统提示词逐字节相同，固定指导不出现在用户提示词中"""
+    random.seed(7)
+    previous = use_layout("stable")
+    try:
+        requests = []
+        engine = GameEngine(headless=True)
+        for i in range(8):
+            character = Character(id=i + 1, name=f"布局角色{i + 1}", gender="女", style="冷静", model="mock")
+            engine.game.add_character(character)
+            engine.ai_clients[character.id] = RecordingMockAIClient(requests)
+        engine.run_headless()
+    finally:
+        use_layout(previous)
+
+    system_prompts = defaultdict(set)
+    for name, call_type, system_prompt, prompt in requests:
+        system_prompts[(name, call_type)].add(system_prompt)
+        if call_type in prompt_layout.PROMPT_SECTIONS:
+            assert "你的角色信息" not in prompt and "策略指导" not in prompt
+    assert any(call_type == "vote" for _, call_type in system_prompts)
+    assert all(len(prompts) == 1 for prompts in system_prompts.values())
+
+
+def test_cached_tokens_are_reported():
+    """解析各服务商的缓存命中字段；系统提示词相同的第二次请求命中模拟服务器的前缀缓存"""
+    assert parse_usage({"input_tokens": 100, "output_tokens": 20, "prompt_tokens_details": {"cached_tokens": 64}}) == \
+        {"input_tokens": 100, "cached_tokens": 64, "output_tokens": 20}
+    assert parse_usage({"prompt_tokens": 80, "completion_tokens": 5, "prompt_cache_hit_tokens": 32})["cached_tokens"] == 32
+    assert parse_usage(None) is None
+
+    previous_key = os.environ.get("DASHSCOPE_API_KEY")
+    os.environ["DASHSCOPE_API_KEY"] = "test"
+    try:
+        character = Character(id=1, name="缓存角色", gender="男", style="理性", model="qwen-plus")
+        character.role = "villager"
+        with StubLLMServer(seed=3) as server:
+            client = QwenClient("qwen-plus", base_url=server.url)
+            client.emit_status = False
+            client.generate_response("第1天的局面", character, "vote")
+            assert client.token_stats["cached_tokens"] == 0
+            client.generate_response("第2天的局面", character, "vote")
+    finally:
+        if previous_key is None:
+            os.environ.pop("DASHSCOPE_API_KEY", None)
+        else:
+            os.environ["DASHSCOPE_API_KEY"] = previous_key
+
+    stats = client.token_stats
+    assert 0 < stats["cached_tokens"] < stats["input_tokens"] and stats["output_tokens"] > 0
+
+
+if __name__ == "__main__":
+    test_legacy_layout_keeps_full_template()
+    test_stable_layout_keeps_system_prefix_identical()
+    test_cached_tokens_are_reported()
+    print("提示词布局测试通过")
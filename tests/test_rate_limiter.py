@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+模型服务限流器测试脚本
+"""
+
+import os
+import sys
+import time
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils.rate_limiter import RateLimiter, rate_limiter_registry
+
+
+def wait_for_waiters(limiter, count):
+    """等待指定数量的调用进入排队"""
+    deadline = time.time() + 5
+    while limiter.get_stats()["waiting"] < count:
+        assert time.time() < deadline, "等待排队超时"
+        time.sleep(0.01)
+
+
+def test_games_are_served_round_robin():
+    """排队的调用在对局之间轮转放行"""
+    limiter = RateLimiter(max_in_flight=1)
+    limiter.acquire("holder")
+    order = []
+
+    def call(game_id):
+        with limiter.slot(game_id):
+            order.append(game_id)
+
+    threads = []
+    for game_id in ["A", "A", "A", "A", "B", "B"]:
+        thread = threading.Thread(target=call, args=(game_id,))
+        thread.start()
+        threads.append(thread)
+        wait_for_waiters(limiter, len(threads))
+
+    limiter.release()
+    for thread in threads:
+        thread.join()
+
+    stats = limiter.get_stats()
+    assert order == ["A", "B", "A", "B", "A", "A"]
+    assert stats["peak_in_flight"] == 1
+    assert stats["per_game"]["A"]["acquired"] == 4
+
+
+def test_rps_limit_spaces_out_calls():
+    """令牌桶限制每秒请求数"""
+    limiter = RateLimiter(rps=50, burst=1)
+    start = time.monotonic()
+    for _ in range(6):
+        with limiter.slot():
+            pass
+
+    assert time.monotonic() - start >= 0.09
+    assert limiter.get_stats()["max_wait"] > 0
+
+
+def test_registry_shares_limiter_per_provider_model():
+    """同一服务商和模型共享限流器，配置对已创建的限流器立即生效"""
+    rate_limiter_registry.reset()
+    try:
+        first = rate_limiter_registry.get("dashscope", "qwen-plus")
+        assert rate_limiter_registry.get("dashscope", "qwen-plus") is first
+        assert rate_limiter_registry.get("dashscope", "deepseek-v3") is not first
+
+        rate_limiter_registry.configure("dashscope", rps=5, max_in_flight=2)
+        assert first.max_in_flight == 2
+        assert rate_limiter_registry.get("dashscope", "qwen-max").rps == 5
+    finally:
+        rate_limiter_registry.reset()
+
+
+if __name__ == "__main__":
+    test_games_are_served_round_robin()
+    test_rps_limit_spaces_out_calls()
+    test_registry_shares_limiter_per_provider_model()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+紧凑记录类型测试脚本
+验证记录兼容原字典的读取方式，并且序列化结果与原格式一致
+"""
+
+import os
+import sys
+import json
+import pickle
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.game import Game
+from backend.models.records import Decision, AICallRecord, to_dicts
+
+
+def test_records_read_like_dicts():
+    """记录支持按键读取、get和in，未知字段按字典语义处理"""
+    decision = Decision("vote", "张三", "发言矛盾", 2, "vote")
+
+    assert decision["type"] == "vote" and decision["target"] == "张三"
+    assert decision.get("missing", "默认") == "默认"
+    assert "reason" in decision and "created_at" not in decision
+    assert len(decision["timestamp"]) == len("2025-01-01 00:00:00")
+    try:
+        decision["missing"]
+        assert False, "未知字段应抛出KeyError"
+    except KeyError:
+        pass
+    assert not hasattr(decision, "__dict__")
+
+
+def test_serialized_records_keep_original_format():
+    """序列化后的日志和AI调用记录字段与原字典格式一致，并且可以pickle"""
+    game = Game()
+    game.log("张三", "我是好人", "discussion", True, "public_statement", ["call-1"])
+    log = json.loads(json.dumps(game.to_dict()["logs"], ensure_ascii=False))[0]
+    assert list(log) == ["timestamp", "day", "phase", "source", "message", "is_public", "message_type", "ai_call_ids"]
+    assert log["ai_call_ids"] == ["call-1"]
+
+    record = AICallRecord(call_id="1", model="mock", call_type="vote", action_type=None, system_prompt="系统",
+                          user_prompt="用户", output="输出", character="张三", role="seer", status="success", cached=False)
+    data = to_dicts([record])[0]
+    assert data["input"] == {"system_prompt": "系统", "user_prompt": "用户"}
+    assert "system_prompt" not in data
+
+    restored = pickle.loads(pickle.dumps(game.logs))
+    assert restored == game.logs
+
+
+if __name__ == "__main__":
+    test_records_read_like_dicts()
+    test_serialized_records_keep_original_format()
+    print("紧凑记录类型测试通过")
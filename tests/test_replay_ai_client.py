@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+录制与回放AI客户端测试脚本
+"""
+
+import os
+import sys
+import json
+import random
+import tempfile
+
+import requests
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.game_engine import GameEngine
+from backend.utils.mock_ai_client import MockAIClient, get_mock_ai_client
+from backend.utils.resilience import resilience_policy
+from backend.utils.replay_ai_client import (
+    RecordingAIClient,
+    ReplayAIClient,
+    get_recording_ai_client_factory,
+    get_replay_ai_client_factory
+)
+
+ROSTER = [
+    {"id": i + 1, "name": f"回放角色{i + 1}", "gender": "女", "style": "冷静", "model": "mock"}
+    for i in range(8)
+]
+
+
+def play(client_factory, seed):
+    """运行一局无头游戏，加载完角色后再设置随机种子，使引擎自身的随机序列与AI客户端无关"""
+    engine = GameEngine(headless=True)
+    assert engine.load_characters(ROSTER, client_factory)
+    random.seed(seed)
+    engine.run_headless()
+    return engine.get_game_summary()
+
+
+def test_replay_reproduces_recorded_game():
+    """回放录制文件得到与录制时完全相同的对局"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "game.jsonl")
+        recorded = play(get_recording_ai_client_factory(path, get_mock_ai_client), seed=11)
+        replayed = play(get_replay_ai_client_factory(path), seed=11)
+
+        assert recorded["winner"] == replayed["winner"]
+        assert recorded["deaths"] == replayed["deaths"]
+        assert replayed["ai_calls"]["mock"]["error"] == 0
+        assert replayed["ai_calls"]["mock"]["total"] == recorded["ai_calls"]["mock"]["total"]
+
+
+def test_replay_by_prompt_hash():
+    """按提示词哈希匹配，录制时失败的调用回放时返回兜底发言"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "calls.jsonl")
+        recorder = get_recording_ai_client_factory(path, get_mock_ai_client)("mock")
+        recorder.emit_status = False
+        first = recorder.generate_response("第一个问题")
+        recorder.client._send_request = lambda *args: None
+        recorder.generate_response("第二个问题")
+
+        replay = ReplayAIClient(path, match="hash")
+        replay.emit_status = False
+        second = replay.generate_response("第二个问题")
+
+        assert replay.generate_response("第一个问题") == first
+        assert second.startswith("这是某角色的回应")
+        assert replay.call_stats == {"total": 2, "success": 1, "error": 1}
+
+
+class FlakyAIClient(MockAIClient):
+    """第一次请求返回429，之后按提示词返回固定答案"""
+
+    def __init__(self):
+        super().__init__()
+        self.attempts = 0
+
+    def _send_request(self, system_prompt, prompt, call_type, character=None):
+        self.attempts += 1
+        if self.attempts == 1:
+            response = requests.Response()
+            response.status_code = 429
+            raise requests.HTTPError("HTTP 429", response=response)
+        return f"answer-{prompt}"
+
+
+def test_retries_are_recorded_once():
+    """录制时被重试的临时性错误不写入录制文件，回放按顺序得到每次逻辑调用的最终结果"""
+    resilience_policy.configure(base_delay=0)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "retry.jsonl")
+            recorder = RecordingAIClient(FlakyAIClient(), path)
+            recorder.emit_status = False
+            recorded = [recorder.generate_response("q1"), recorder.generate_response("q2")]
+            with open(path, encoding="utf-8") as f:
+                records = [json.loads(line) for line in f]
+
+            replay = ReplayAIClient(path)
+            replay.emit_status = False
+            replayed = [replay.generate_response("q1"), replay.generate_response("q2")]
+    finally:
+        resilience_policy._init()
+
+    assert recorder.client.attempts == 3 and len(records) == 2
+    assert recorded == replayed == ["answer-q1", "answer-q2"]
+
+
+def test_recorded_errors_keep_their_type():
+    """回放时按录制的异常类型和状态码重新抛出"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "errors.jsonl")
+        recorder = RecordingAIClient(MockAIClient(), path)
+        recorder.emit_status = False
+
+        def fail(*args):
+            raise ValueError("响应格式错误")
+
+        recorder.client._send_request = fail
+        recorder.generate_response("问题")
+
+        replay = ReplayAIClient(path)
+        try:
+            replay._request_with_policy("", "问题", "general")
+        except ValueError as e:
+            assert str(e) == "响应格式错误"
+        else:
+            raise AssertionError("应抛出录制的ValueError")
+
+
+class SmallContextAIClient(MockAIClient):
+    """上下文窗口较小、内心决策输出更短的模拟客户端"""
+
+    context_window = 2048
+    max_output_tokens = 800
+
+    def output_tokens(self, call_type):
+        return 300 if call_type == "inner_decision" else self.max_output_tokens
+
+
+def test_recording_keeps_context_budget():
+    """录制客户端的上下文预算和输出上限与被包装的客户端一致"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        client = SmallContextAIClient()
+        recorder = RecordingAIClient(client, os.path.join(tmp_dir, "budget.jsonl"))
+
+        assert recorder.context_budget() == client.context_budget() == 2048 - 800
+        assert recorder.output_tokens("inner_decision") == 300
+        assert recorder.output_tokens("public_speech") == 800
+        assert recorder.context_window == 2048 and recorder.max_output_tokens == 800
+
+
+if __name__ == "__main__":
+    test_replay_reproduces_recorded_game()
+    test_replay_by_prompt_hash()
+    test_retries_are_recorded_once()
+    test_recorded_errors_keep_their_type()
+    test_recording_keeps_context_budget()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+模型调用容错策略测试脚本
+"""
+
+import os
+import sys
+import time
+
+import requests
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils.resilience import ResiliencePolicy, CircuitOpenError, is_transient_error
+
+
+def http_error(status_code):
+    """构造带状态码的HTTP错误"""
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.HTTPError(f"HTTP {status_code}", response=response)
+
+
+def make_policy(**options):
+    """创建一个参数独立的容错策略"""
+    policy = ResiliencePolicy()
+    policy.reset()
+    policy.configure(max_retries=2, base_delay=0, hedge=False, failure_threshold=3, reset_timeout=30.0)
+    policy.configure(**options)
+    return policy
+
+
+def restore_defaults(policy):
+    """恢复环境变量中的默认配置并清空状态"""
+    policy._init()
+
+
+def test_transient_errors_are_retried():
+    """临时性错误重试后成功，非临时性错误不重试"""
+    policy = make_policy()
+    failures = [http_error(503), http_error(429)]
+
+    def flaky():
+        if failures:
+            raise failures.pop(0)
+        return "ok"
+
+    assert is_transient_error(http_error(500))
+    assert not is_transient_error(http_error(401))
+    assert policy.call("test", "model", flaky) == "ok"
+    assert policy.get_stats()["test"]["retried"] == 2
+
+    calls = []
+
+    def bad_request():
+        calls.append(1)
+        raise http_error(400)
+
+    try:
+        policy.call("test", "model", bad_request)
+        assert False, "应当抛出异常"
+    except requests.HTTPError:
+        pass
+    assert len(calls) == 1
+    restore_defaults(policy)
+
+
+def test_circuit_breaker_fails_fast():
+    """连续失败后熔断，熔断期间不再发起请求"""
+    policy = make_policy(max_retries=0)
+    calls = []
+
+    def outage():
+        calls.append(1)
+        raise requests.ConnectionError("down")
+
+    for _ in range(5):
+        try:
+            policy.call("down", "model", outage)
+        except (requests.ConnectionError, CircuitOpenError):
+            pass
+
+    stats = policy.get_stats()["down"]
+    assert len(calls) == 3
+    assert stats["short_circuited"] == 2
+    assert stats["breaker"] == "open"
+    restore_defaults(policy)
+
+
+def test_slow_call_is_hedged():
+    """耗时超过P95的调用发起对冲请求，返回先完成的结果"""
+    policy = make_policy(hedge=True, hedge_min_samples=5)
+    for _ in range(5):
+        policy.call("slow", "model", lambda: "warm")
+
+    attempts = []
+
+    def sometimes_slow():
+        attempts.append(1)
+        if len(attempts) == 1:
+            time.sleep(0.5)
+            return "slow"
+        return "fast"
+
+    assert policy.call("slow", "model", sometimes_slow) == "fast"
+    stats = policy.get_stats()["slow"]
+    assert stats["hedged"] == 1
+    assert stats["hedge_wins"] == 1
+    restore_defaults(policy)
+
+
+if __name__ == "__main__":
+    test_transient_errors_are_retried()
+    test_circuit_breaker_fails_fast()
+    test_slow_call_is_hedged()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+AI响应缓存测试脚本
+"""
+
+import os
+import sys
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.character import Character
+from backend.utils.mock_ai_client import get_mock_ai_client
+from backend.utils.ai_call_manager import ai_call_manager
+from backend.utils.response_cache import ResponseCache, response_cache, make_cache_key
+
+
+def create_character():
+    """创建测试角色"""
+    return Character(id=1, name="缓存测试角色", gender="女", style="活泼", model="mock", role="villager")
+
+
+def reset_cache(call_types=(), max_entries=10000):
+    """恢复缓存的默认状态"""
+    response_cache.clear()
+    if response_cache.disk:
+        response_cache.disk.close()
+    response_cache.disk = None
+    response_cache.disk_path = None
+    response_cache.configure(call_types=call_types, max_entries=max_entries)
+
+
+def test_cache_key_is_deterministic():
+    """相同输入生成相同的键，温度不同则键不同"""
+    first = make_cache_key("系统", "用户", "qwen-plus", 0.7)
+    second = make_cache_key("系统", "用户", "qwen-plus", 0.7)
+    other = make_cache_key("系统", "用户", "qwen-plus", 0.0)
+
+    assert first == second
+    assert first != other
+
+
+def test_lru_eviction():
+    """超过容量时淘汰最久未使用的条目"""
+    reset_cache(call_types=["*"], max_entries=2)
+    try:
+        response_cache.put("a", "A")
+        response_cache.put("b", "B")
+        assert response_cache.get("a") == "A"
+        response_cache.put("c", "C")
+
+        assert response_cache.get("b") is None
+        assert response_cache.get("a") == "A"
+        assert response_cache.get("c") == "C"
+    finally:
+        reset_cache()
+
+
+def test_disk_cache_survives_memory_clear():
+    """内存清空后仍能从磁盘命中"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        reset_cache(call_types=["*"])
+        try:
+            response_cache.configure(disk_path=os.path.join(tmp_dir, "cache.sqlite3"))
+            response_cache.put("key", "磁盘中的响应")
+            response_cache.clear()
+
+            assert response_cache.get("key") == "磁盘中的响应"
+            assert ResponseCache() is response_cache
+        finally:
+            reset_cache()
+
+
+def test_client_uses_cache_for_enabled_call_types():
+    """启用缓存的调用类型第二次命中缓存，并且仍然记录AI调用"""
+    reset_cache(call_types=["inner_decision"])
+    try:
+        client = get_mock_ai_client()
+        client.emit_status = False
+        character = create_character()
+
+        first = client.generate_response("请做决定", character, "inner_decision")
+        first_call_id = character.memory["latest_ai_call_id"]
+        second = client.generate_response("请做决定", character, "inner_decision")
+        second_call_id = character.memory["latest_ai_call_id"]
+        client.generate_response("请发言", character, "public_speech")
+
+        stats = response_cache.get_stats()
+        assert first == second
+        assert stats["per_call_type"]["inner_decision"] == {"hits": 1, "misses": 1}
+        assert "public_speech" not in stats["per_call_type"]
+        assert client.call_stats["total"] == 3
+        records = ai_call_manager.get_ai_calls_by_ids(character.name, [first_call_id, second_call_id], game_id=client.room)
+        assert [record["cached"] for record in records] == [False, True]
+    finally:
+        reset_cache()
+
+
+if __name__ == "__main__":
+    test_cache_key_is_deterministic()
+    test_lru_eviction()
+    test_disk_cache_survives_memory_clear()
+    test_client_uses_cache_for_enabled_call_types()
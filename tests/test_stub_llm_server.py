@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+本地模拟大模型服务器测试脚本
+使用真实的AI客户端访问模拟服务器，验证三种接口格式的请求构建与响应解析
+"""
+
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils.ai_client import QwenClient, DeepseekClient, DoubaoClient
+from backend.utils.stub_llm_server import StubLLMServer
+from backend.utils.resilience import resilience_policy
+
+
+def set_env(**values):
+    """设置环境变量并返回原值，便于恢复"""
+    previous = {key: os.environ.get(key) for key in values}
+    for key, value in values.items():
+        if value is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = value
+    return previous
+
+
+def test_clients_parse_stub_responses():
+    """三种客户端都能解析模拟服务器的响应"""
+    previous = set_env(DASHSCOPE_API_KEY="test", QWEN_API_KEY=None, DEEPSEEK_API_KEY="test", ARK_API_KEY="test")
+    try:
+        with StubLLMServer(seed=1) as server:
+            clients = [
+                QwenClient("qwen-plus", base_url=server.url),
+                DeepseekClient("deepseek-v3", base_url=server.url),
+                DoubaoClient("doubao-seed-1-6-250615", base_url=f"{server.url}/api/v3")
+            ]
+            os.environ.pop("DASHSCOPE_API_KEY")
+            clients.append(DeepseekClient("deepseek-v3", base_url=server.url))
+
+            for client in clients:
+                client.emit_status = False
+                response = client.generate_response("请发言")
+                assert response.endswith(f"（{getattr(client, 'actual_model', client.model_name)}）"), response
+                assert client.call_stats["success"] == 1
+
+            assert clients[3].use_dashscope is False
+            assert server.get_stats()["requests"] == 4
+    finally:
+        set_env(**previous)
+
+
+def test_streaming_responses_are_delivered_in_pieces():
+    """三种客户端的流式输出逐段回调，拼接结果与最终响应一致"""
+    previous = set_env(DASHSCOPE_API_KEY="test", QWEN_API_KEY=None, DEEPSEEK_API_KEY="test", ARK_API_KEY="test")
+    try:
+        with StubLLMServer(seed=2) as server:
+            clients = [
+                QwenClient("qwen-plus", base_url=server.url),
+                DoubaoClient("doubao-seed-1-6-250615", base_url=f"{server.url}/api/v3")
+            ]
+            os.environ.pop("DASHSCOPE_API_KEY")
+            clients.append(DeepseekClient("deepseek-v3", base_url=server.url))
+
+            for client in clients:
+                client.emit_status = False
+                deltas = []
+                response = client.generate_response("请发言", call_type="public_speech", on_delta=deltas.append)
+
+                assert len(deltas) > 1
+                assert "".join(deltas) == response
+                assert client.call_stats["success"] == 1
+    finally:
+        set_env(**previous)
+
+
+def test_injected_errors_use_fallback():
+    """注入的服务器错误重试耗尽后走客户端的兜底逻辑"""
+    previous = set_env(DASHSCOPE_API_KEY="test")
+    resilience_policy.reset()
+    resilience_policy.configure(base_delay=0)
+    try:
+        with StubLLMServer(error_rate=1.0) as server:
+            client = QwenClient("qwen-plus", base_url=server.url)
+            client.emit_status = False
+            response = client.generate_response("请发言")
+
+            assert response.startswith("这是某角色的回应")
+            assert client.call_stats["error"] == 1
+            assert server.get_stats()["errors"] == 1 + resilience_policy.max_retries
+    finally:
+        resilience_policy.configure(base_delay=0.5)
+        resilience_policy.reset()
+        set_env(**previous)
+
+
+if __name__ == "__main__":
+    test_clients_parse_stub_responses()
+    test_streaming_responses_are_delivered_in_pieces()
+    test_injected_errors_use_fallback()
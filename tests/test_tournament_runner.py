@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批量对局运行器测试脚本
+"""
+
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils.tournament_runner import play_single_game, run_tournament
+
+ROSTER = [
+    {"id": i + 1, "name": f"测试角色{i + 1}", "gender": "男", "style": "理性",
+     "model": "qwen-plus" if i < 4 else "deepseek-v3"}
+    for i in range(8)
+]
+
+
+def test_single_game_is_reproducible():
+    """相同种子的对局结果应完全一致"""
+    first = play_single_game(0, ROSTER, "mock", seed=7)
+    second = play_single_game(0, ROSTER, "mock", seed=7)
+
+    assert first["status"] == "success"
+    assert first["winner"] in ("villager", "werewolf")
+    assert first["winner"] == second["winner"]
+    assert first["deaths"] == second["deaths"]
+    assert first["ai_calls"]["qwen-plus"]["total"] > 0
+
+
+def test_tournament_report():
+    """进程池批量对局应汇总所有结果"""
+    outcome = run_tournament([ROSTER], games=4, client_factory="mock", workers=2)
+    report = outcome["report"]
+
+    print(f"批量对局报告: {report}")
+    assert report["games"] == 4
+    assert report["finished"] == 4
+    assert sum(report["winners"].values()) == 4
+    assert report["per_model"]["qwen-plus"]["appearances"] == 16
+    assert [r["index"] for r in outcome["results"]] == [0, 1, 2, 3]
+
+
+def test_tournament_records_worker_failures():
+    """无法序列化的客户端工厂只导致对应对局失败，不会中断整个批量运行"""
+    outcome = run_tournament([ROSTER], games=2, client_factory=lambda model: None, workers=1)
+    report = outcome["report"]
+
+    assert report["games"] == 2
+    assert report["errors"] == 2
+    assert all(r["status"] == "error" for r in outcome["results"])
+
+
+if __name__ == "__main__":
+    test_single_game_is_reproducible()
+    test_tournament_report()
+    test_tournament_records_worker_failures()
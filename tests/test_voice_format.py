@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+语音输出格式测试脚本
+验证输出格式的配置与解析、不同格式分别缓存并使用对应的mimetype、WAV回退，以及每段语音字节数的统计
+"""
+
+import os
+import sys
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils.audio_cache import mimetype_for
+
+
+class SizedSynthesizer:
+    """按输出格式的码率返回一秒音频的假合成器，记录收到的格式"""
+
+    formats = []
+
+    def __init__(self, model, voice, format=None, callback=None):
+        self.format = format
+        self.callback = callback
+
+    def call(self, text):
+        SizedSynthesizer.formats.append(self.format.name)
+        if self.format.format == "wav":
+            size = self.format.sample_rate * 2
+        else:
+            size = self.format.bit_rate * 1000 // 8
+        self.callback.on_data(b"\x00" * size)
+        self.callback.on_complete()
+
+
+def create_client(audio_dir, voice_format):
+    """在临时目录中创建指定输出格式的语音客户端，返回客户端和语音模块"""
+    os.environ["DASHSCOPE_API_KEY"] = os.environ.get("DASHSCOPE_API_KEY") or "test"
+    os.environ["AUDIO_DIR"] = audio_dir
+    os.environ["VOICE_FORMAT"] = voice_format
+    from backend.utils import voice_client as voice_module
+    return voice_module.VoiceClient(), voice_module
+
+
+def test_formats_resolve_and_reject_pcm():
+    """简写和AudioFormat成员名都可以配置；浏览器不能直接播放的pcm和未知格式报错"""
+    from backend.utils.voice_client import resolve_audio_format
+    assert resolve_audio_format("opus").name == "OGG_OPUS_24KHZ_MONO_32KBPS"
+    assert resolve_audio_format("mp3_16000hz_mono_128kbps").bit_rate == 128
+    for name in ("pcm_16000hz_mono_16bit", "flac"):
+        try:
+            resolve_audio_format(name)
+        except ValueError:
+            continue
+        raise AssertionError(f"{name}不应被接受")
+
+
+def test_compressed_format_with_wav_fallback():
+    """配置为opus时预合成和合成都使用opus；旧客户端指定wav时单独合成并缓存，统计两种格式每段语音的字节数"""
+    names = ("DASHSCOPE_API_KEY", "AUDIO_DIR", "VOICE_FORMAT")
+    previous = {name: os.environ.get(name) for name in names}
+    with tempfile.TemporaryDirectory() as audio_dir:
+        try:
+            client, voice_module = create_client(audio_dir, "opus")
+            original = voice_module.SpeechSynthesizer
+            voice_module.SpeechSynthesizer = SizedSynthesizer
+            SizedSynthesizer.formats = []
+            try:
+                key = client.presynthesize("请大家投票", "系统")
+                compressed = client.get_audio(key)
+                fallback = client.synthesize_speech("请大家投票", "系统", "wav")
+                again = client.synthesize_speech("请大家投票", "系统", "wav")
+                client.executor.shutdown(wait=True)
+            finally:
+                voice_module.SpeechSynthesizer = original
+        finally:
+            for name, value in previous.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+    assert key.endswith(".ogg") and mimetype_for(key) == "audio/ogg"
+    assert client.mimetype() == "audio/ogg" and client.mimetype("wav") == "audio/wav"
+    assert client.speech_key("请大家投票", "系统", "wav").endswith(".wav")
+    assert SizedSynthesizer.formats == ["OGG_OPUS_24KHZ_MONO_32KBPS", "WAV_22050HZ_MONO_16BIT"]
+    assert again == fallback and len(compressed) * 10 < len(fallback)
+
+    stats = client.get_stats()
+    assert stats["audio_format"] == "OGG_OPUS_24KHZ_MONO_32KBPS"
+    assert stats["formats"]["OGG_OPUS_24KHZ_MONO_32KBPS"] == {"speeches": 1, "bytes": 4000, "bytes_per_speech": 4000}
+    assert stats["formats"]["WAV_22050HZ_MONO_16BIT"]["bytes_per_speech"] == 44100
+    assert stats["cache"]["entries"] == 2
+
+
+if __name__ == "__main__":
+    test_formats_resolve_and_reject_pcm()
+    test_compressed_format_with_wav_fallback()
+    print("语音输出格式测试通过")
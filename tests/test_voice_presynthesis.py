@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+语音预合成测试脚本
+验证发言生成后立即提交预合成、voice_play携带音频地址，以及同一段语音只合成一次
+"""
+
+import os
+import sys
+import random
+import asyncio
+import tempfile
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.game_engine import GameEngine
+from backend.utils.mock_ai_client import get_mock_ai_client
+
+ROSTER = [
+    {"id": i + 1, "name": f"语音角色{i + 1}", "gender": "女", "style": "冷静", "model": "mock"}
+    for i in range(8)
+]
+
+
+class RecordingSocketIO:
+    """记录推送事件的SocketIO替身"""
+
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event, data=None, room=None):
+        self.events.append((event, data))
+
+
+class RecordingSynthesizer:
+    """记录预合成请求的语音客户端替身"""
+
+    def __init__(self, events):
+        self.events = events
+        self.requests = []
+
+    def presynthesize(self, text, character_name):
+        self.requests.append((character_name, text))
+        self.events.append(("presynthesize", {"character": character_name, "text": text}))
+        return f"key{len(self.requests)}.mp3"
+
+    def audio_url(self, key):
+        return f"/api/voice/audio/{key}"
+
+
+class BlockingSynthesizer:
+    """阻塞到被放行才通过回调返回音频的假合成器，统计调用次数"""
+
+    calls = 0
+    release = threading.Event()
+
+    def __init__(self, model, voice, format=None, callback=None):
+        self.voice = voice
+        self.callback = callback
+
+    def call(self, text):
+        BlockingSynthesizer.calls += 1
+        BlockingSynthesizer.release.wait(5)
+        self.callback.on_data(f"{self.voice}:{text}".encode("utf-8"))
+        self.callback.on_complete()
+
+
+def test_speeches_are_presynthesized_before_voice_play():
+    """每条发言在voice_play之前已提交预合成，voice_play携带对应的音频地址"""
+    random.seed(4)
+    socketio = RecordingSocketIO()
+    engine = GameEngine(socketio=socketio)
+    engine.load_characters(ROSTER, get_mock_ai_client)
+    for ai_client in engine.ai_clients.values():
+        ai_client.emit_status = False
+    engine.voice_synthesizer = RecordingSynthesizer(socketio.events)
+    engine.game.start_game()
+
+    async def no_wait(character_name):
+        return None
+
+    engine.wait_for_voice_completion = no_wait
+    asyncio.run(engine.handle_discussion_phase())
+
+    voice_plays = [(i, data) for i, (event, data) in enumerate(socketio.events) if event == "voice_play"]
+    assert len(voice_plays) == len(engine.game.get_alive_characters())
+    for index, data in voice_plays:
+        assert data["audio_url"].startswith("/api/voice/audio/") and data["audio_mimetype"] == "audio/mpeg"
+        submitted = [i for i, (event, item) in enumerate(socketio.events)
+                     if event == "presynthesize" and item == {"character": data["character"], "text": data["text"]}]
+        assert submitted and submitted[0] < index
+
+
+def test_concurrent_requests_synthesize_once():
+    """预合成进行中时，合成请求和按地址获取都等待同一次合成"""
+    with tempfile.TemporaryDirectory() as audio_dir:
+        previous = {name: os.environ.get(name) for name in ("DASHSCOPE_API_KEY", "AUDIO_DIR")}
+        os.environ["DASHSCOPE_API_KEY"] = os.environ.get("DASHSCOPE_API_KEY") or "test"
+        os.environ["AUDIO_DIR"] = audio_dir
+        try:
+            from backend.utils import voice_client as voice_module
+            original = voice_module.SpeechSynthesizer
+            voice_module.SpeechSynthesizer = BlockingSynthesizer
+            BlockingSynthesizer.calls = 0
+            BlockingSynthesizer.release.clear()
+            try:
+                client = voice_module.VoiceClient()
+                key = client.presynthesize("平安夜，没有人死亡", "系统")
+                assert key == client.presynthesize("平安夜，没有人死亡", "系统")
+
+                results = []
+                waiter = threading.Thread(target=lambda: results.append(client.synthesize_speech("平安夜，没有人死亡", "系统")))
+                waiter.start()
+                BlockingSynthesizer.release.set()
+                audio = client.get_audio(key)
+                waiter.join(5)
+                client.executor.shutdown(wait=True)
+            finally:
+                voice_module.SpeechSynthesizer = original
+        finally:
+            for name, value in previous.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+    assert BlockingSynthesizer.calls == 1
+    assert audio == results[0] == "longxiaochun_v2:平安夜，没有人死亡".encode("utf-8")
+    assert client.audio_url(key) == f"/api/voice/audio/{key}" and not client.pending
+
+
+if __name__ == "__main__":
+    test_speeches_are_presynthesized_before_voice_play()
+    test_concurrent_requests_synthesize_once()
+    print("语音预合成测试通过")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+流式语音测试脚本
+验证合成服务的音频片段到达后立即转发、同一段语音的其他请求从头跟随读取，以及合成完成后写入缓存
+"""
+
+import os
+import sys
+import tempfile
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.utils.metrics import metrics, diff_snapshots
+
+
+class ChunkedSynthesizer:
+    """在后台线程中逐个返回音频片段的假合成器，每个片段之后等待放行"""
+
+    calls = 0
+    gates = []
+
+    def __init__(self, model, voice, format=None, callback=None):
+        self.callback = callback
+
+    def call(self, text):
+        ChunkedSynthesizer.calls += 1
+        threading.Thread(target=self.run, args=(text,), daemon=True).start()
+
+    def run(self, text):
+        for index, gate in enumerate(ChunkedSynthesizer.gates):
+            self.callback.on_data(f"[{index}:{text}]".encode("utf-8"))
+            gate.wait(5)
+        self.callback.on_complete()
+
+
+def test_chunks_are_forwarded_before_synthesis_finishes():
+    """第一个片段在合成结束前就能读到；跟随读取的请求拿到完整的片段序列；结束后命中缓存"""
+    with tempfile.TemporaryDirectory() as audio_dir:
+        previous = {name: os.environ.get(name) for name in ("DASHSCOPE_API_KEY", "AUDIO_DIR")}
+        os.environ["DASHSCOPE_API_KEY"] = os.environ.get("DASHSCOPE_API_KEY") or "test"
+        os.environ["AUDIO_DIR"] = audio_dir
+        try:
+            from backend.utils import voice_client as voice_module
+            original = voice_module.SpeechSynthesizer
+            voice_module.SpeechSynthesizer = ChunkedSynthesizer
+            ChunkedSynthesizer.calls = 0
+            ChunkedSynthesizer.gates = [threading.Event() for _ in range(3)]
+            before = metrics.snapshot()
+            try:
+                client = voice_module.VoiceClient()
+                chunks = client.stream_speech("我是预言家", "张明盛")
+                first = next(chunks)
+                key = client.speech_key("我是预言家", "张明盛")
+                follower, complete = client.stream_audio(key)
+                assert not complete
+                assert key in client.pending and key not in client.cache
+
+                for gate in ChunkedSynthesizer.gates:
+                    gate.set()
+                rest = list(chunks)
+                followed = list(follower)
+                cached = client.synthesize_speech("我是预言家", "张明盛")
+                assert client.stream_audio(key)[1]
+            finally:
+                voice_module.SpeechSynthesizer = original
+        finally:
+            for name, value in previous.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+    expected = [f"[{i}:我是预言家]".encode("utf-8") for i in range(3)]
+    assert [first] + rest == expected and followed == expected
+    assert cached == b"".join(expected) and ChunkedSynthesizer.calls == 1
+    stages = {s["labels"]["stage"] for s in diff_snapshots(metrics.snapshot(), before)["werewolf_tts_seconds"].values()}
+    assert stages == {"first_chunk", "total"}
+
+
+class FailingSynthesizer(ChunkedSynthesizer):
+    """返回一个片段后报错的假合成器"""
+
+    def run(self, text):
+        self.callback.on_data(b"partial")
+        self.callback.on_error("synthesis failed")
+
+
+def test_failed_synthesis_aborts_followers():
+    """合成失败时跟随读取的请求抛出异常，不会以截断的音频正常结束"""
+    with tempfile.TemporaryDirectory() as audio_dir:
+        previous = {name: os.environ.get(name) for name in ("DASHSCOPE_API_KEY", "AUDIO_DIR")}
+        os.environ["DASHSCOPE_API_KEY"] = os.environ.get("DASHSCOPE_API_KEY") or "test"
+        os.environ["AUDIO_DIR"] = audio_dir
+        try:
+            from backend.utils import voice_client as voice_module
+            original = voice_module.SpeechSynthesizer
+            voice_module.SpeechSynthesizer = FailingSynthesizer
+            try:
+                client = voice_module.VoiceClient()
+                received = []
+                try:
+                    for chunk in client.stream_speech("我是女巫", "张明盛"):
+                        received.append(chunk)
+                    aborted = False
+                except voice_module.AudioStreamError:
+                    aborted = True
+                key = client.speech_key("我是女巫", "张明盛")
+            finally:
+                voice_module.SpeechSynthesizer = original
+        finally:
+            for name, value in previous.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+    assert aborted and received == [b"partial"]
+    assert key not in client.cache and client.stream_audio(key) == (None, False)
+
+
+if __name__ == "__main__":
+    test_chunks_are_forwarded_before_synthesis_finishes()
+    test_failed_synthesis_aborts_followers()
+    print("流式语音测试通过")